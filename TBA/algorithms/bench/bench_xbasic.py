@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Timings for the algorithms in xbasic and xfast.
+
+Run this file directly; each line reports the per-element cost of a
+PyX algorithm read one element at a time, of the same algorithm read
+a batch at a time (through xbase.xresult), of its compiled version in
+xfast, and of its nearest itertools (or builtin) equivalent, best of
+several runs.  A second table compares a multi-input map pipeline
+with its columnar version in xcolumnar, and a third reports the memory
+and construction time of an algorithm object, against a copy of its
+class that keeps its state in a __dict__ (as the classes did before
+they declared __slots__).
+"""
+
+import sys, os, os.path, timeit, itertools, operator, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms import xbase, xbasic, xfast, xcolumnar, xsorted
+from TBA.algorithms.examples import xsoundex
+
+def best_of(func, repeat = 3):
+  return min(timeit.Timer(func).repeat(repeat, 1))
+
+def cases(data, module):
+  """Return (name, PyX version, itertools version) for each algorithm."""
+  xcat, xfilter, xmap, xmap_trim, xunique, xhead, xtail, xfill = \
+      [getattr(module, name) for name in ('xcat', 'xfilter', 'xmap', 'xmap_trim',
+                                          'xunique', 'xhead', 'xtail', 'xfill')]
+  half = len(data) // 2
+  return [
+    ('xcat', lambda: xcat(data, data),
+             lambda: itertools.chain(data, data)),
+    ('xfilter', lambda: xfilter(None, data),
+                lambda: filter(None, data)),
+    ('xmap', lambda: xmap(operator.neg, data),
+             lambda: map(operator.neg, data)),
+    ('xmap (2 inputs)', lambda: xmap(operator.add, data, data),
+                        lambda: itertools.starmap(operator.add,
+                            itertools.zip_longest(data, data))),
+    ('xmap_trim', lambda: xmap_trim(operator.add, data, data),
+                  lambda: map(operator.add, data, data)),
+    ('xunique', lambda: xunique(data),
+                lambda: (k for k, g in itertools.groupby(data))),
+    ('xhead', lambda: xhead(data, half),
+              lambda: itertools.islice(data, half)),
+    ('xtail', lambda: xtail(data, half),
+              lambda: itertools.islice(data, half, None)),
+    ('xfill', lambda: xfill(data, 2 * len(data), 0),
+              lambda: itertools.islice(itertools.chain(data,
+                  itertools.repeat(0)), 2 * len(data))),
+  ]
+
+def bench_overhead(total = 200000):
+  data = [i // 3 for i in range(1, total + 1)]
+  print('Per-element cost over %d elements (ns):' % total)
+  print('%-16s %10s %10s %10s %10s %8s' % ('algorithm', 'xbasic', 'batched', 'xfast',
+                                           'itertools', 'ratio'))
+  for (name, pyx, native), (name, fast, native) in zip(cases(data, xbasic), cases(data, xfast)):
+    n = len(list(native()))
+    t_pyx = best_of(lambda: [x for x in pyx()]) / n * 1e9
+    t_batch = best_of(lambda: xbase.xresult(pyx())) / n * 1e9
+    t_fast = best_of(lambda: [x for x in fast()]) / n * 1e9
+    t_native = best_of(lambda: [x for x in native()]) / n * 1e9
+    print('%-16s %10.1f %10.1f %10.1f %10.1f %7.1fx' % (name, t_pyx, t_batch, t_fast, t_native,
+                                                       t_pyx / t_native))
+
+def bench_columnar(total = 200000):
+  a = [float(i) for i in range(total)]
+  b = [float(i % 7) for i in range(total)]
+  print('Per-row cost of mapping and filtering 2 inputs over %d rows (ns):' % total)
+  print('%-16s %10s %10s %10s %8s' % ('pipeline', 'xbasic', 'batched', 'xcolumnar', 'ratio'))
+  for name, rows, columns in (
+      ('xmap_trim', lambda: xbasic.xmap_trim(operator.mul, a, b),
+                    lambda: xcolumnar.xmap_trim(operator.mul,
+                        xcolumnar.xto_columns(a, b))),
+      ('xfilter', lambda: xbasic.xfilter(None, xbasic.xmap_trim(operator.mul, a, b)),
+                  lambda: xcolumnar.xfilter(None, xcolumnar.xmap_trim(operator.mul,
+                      xcolumnar.xto_columns(a, b)))),
+      ('xhead', lambda: xbasic.xhead(xbasic.xmap_trim(operator.mul, a, b), total // 2),
+                lambda: xcolumnar.xhead(xcolumnar.xmap_trim(operator.mul,
+                    xcolumnar.xto_columns(a, b)), total // 2))):
+    t_rows = best_of(lambda: [x for x in rows()]) / total * 1e9
+    t_batch = best_of(lambda: xbase.xresult(rows())) / total * 1e9
+    t_columns = best_of(lambda: xbase.xresult(xcolumnar.xfrom_columns(columns(), 0))) \
+        / total * 1e9
+    print('%-16s %10.1f %10.1f %10.1f %7.1fx' % (name, t_rows, t_batch, t_columns,
+                                                t_rows / t_columns))
+
+def unslotted(cls):
+  """Return a copy of a class that keeps its state in a __dict__."""
+  namespace = {}
+  for base in reversed(cls.__mro__[:-1]):
+    for name, value in vars(base).items():
+      if name not in ('__slots__', '__dict__', '__weakref__') and \
+         type(value).__name__ != 'member_descriptor':
+        namespace[name] = value
+  return type(cls.__name__, (object,), namespace)
+
+def instance_bytes(make, n = 10000):
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  keep = [make() for i in range(n)]
+  size = tracemalloc.get_traced_memory()[0] - before
+  tracemalloc.stop()
+  # Do not count the list holding the instances
+  return (size - sys.getsizeof(keep)) / n
+
+def bench_instances(total = 100000):
+  print('Bytes per instance and instances per second (thousands):')
+  print('%-22s %10s %10s %10s %10s' % ('class', '__dict__', '__slots__', '__dict__',
+                                       '__slots__'))
+  data = [1, 2]
+  for cls, args in ((xbase.xsingle_buffer, (data,)), (xbasic.xcat, (data, data)),
+                    (xbasic.xmap, (abs, data)), (xbasic.xhead, (data, 1)),
+                    (xbasic.xfill, (data, 5, 0)), (xfast.xmap, (abs, data)),
+                    (xsorted.xmerge, (data, data)), (xsoundex.xsoundex, ('Tymczak',))):
+    old = unslotted(cls)
+    b_old = instance_bytes(lambda: old(*args))
+    b_new = instance_bytes(lambda: cls(*args))
+    t_old = total / best_of(lambda: [old(*args) for i in range(total)]) / 1000
+    t_new = total / best_of(lambda: [cls(*args) for i in range(total)]) / 1000
+    name = cls.__module__.split('.')[-1] + '.' + cls.__name__
+    print('%-22s %10.0f %10.0f %10.0f %10.0f' % (name, b_old, b_new, t_old, t_new))
+
+if __name__ == '__main__':
+  bench_overhead()
+  bench_columnar()
+  bench_instances()
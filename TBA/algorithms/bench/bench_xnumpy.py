@@ -0,0 +1,55 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Timings for the algorithms in xnumpy.
+
+Run this file directly; each line compares a pure-Python algorithm on
+lists with its xnumpy version on arrays, best of several runs.
+Requires NumPy.
+"""
+
+import sys, os, os.path, timeit, random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms import xsorted, xnumpy
+from TBA.algorithms.xnumpy import numpy
+
+def best_of(func, repeat = 3):
+  return min(timeit.Timer(func).repeat(repeat, 1))
+
+def bench_sets(total = 1000000):
+  rand = random.Random(1)
+  print('Set algorithms on sorted IDs out of %d:' % total)
+  print('%10s %10s %26s %10s %10s %8s' % ('input0', 'input1', 'algorithm', 'xsorted',
+                                         'xnumpy', 'speedup'))
+  for m, n in ((total // 2, total // 2), (total // 100, total // 2)):
+    x = sorted(rand.sample(range(total), m))
+    y = sorted(rand.sample(range(total), n))
+    a, b = numpy.array(x), numpy.array(y)
+    for name in ('xset_union', 'xset_intersection', 'xset_difference',
+                 'xset_symmetric_difference'):
+      slow = best_of(lambda: [z for z in getattr(xsorted, name)(x, y)])
+      fast = best_of(lambda: getattr(xnumpy, name)(a, b).array())
+      print('%10d %10d %26s %9.3fs %9.3fs %7.1fx' % (m, n, name, slow, fast, slow / fast))
+
+def bench_map(total = 1000000):
+  x = list(range(total))
+  a = numpy.array(x)
+  print('Mapping and filtering %d elements:' % total)
+  for name, slow, fast in (
+      ('xmap', lambda: [z for z in xnumpy.xmap(abs, x)],
+               lambda: xnumpy.xmap(numpy.absolute, a).array()),
+      ('xfilter', lambda: [z for z in xnumpy.xfilter(None, x)],
+                  lambda: xnumpy.xfilter(None, a).array())):
+    slow, fast = best_of(slow), best_of(fast)
+    print('%10s %9.3fs %9.3fs %7.1fx' % (name, slow, fast, slow / fast))
+
+if __name__ == '__main__':
+  if numpy is None:
+    print('NumPy is not installed.')
+  else:
+    bench_sets()
+    bench_map()
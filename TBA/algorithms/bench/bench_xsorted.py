@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Timings for the algorithms in xsorted.
+
+Run this file directly; each line reports the best of several runs.
+"""
+
+import sys, os, os.path, timeit, random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms import xbase, xsorted
+from TBA.algorithms.xsorted import xmerge, xmerge_many, xset_intersection, \
+    xset_difference, xsort
+
+def make_inputs(k, total):
+  """Return k sorted lists holding 'total' elements between them."""
+  return [list(range(i, total, k)) for i in range(k)]
+
+def merge_chain(inputs):
+  """Merge 'inputs' with a left-deep chain of binary xmerge objects."""
+  ret = inputs[0]
+  for input in inputs[1:]:
+    ret = xmerge(ret, input)
+  return ret
+
+def best_of(func, repeat = 3):
+  return min(timeit.Timer(func).repeat(repeat, 1))
+
+def bench_merge(total = 100000):
+  print('Merging %d elements:' % total)
+  print('%6s %14s %14s %14s %8s' % ('k', 'xmerge chain', 'xmerge_many', 'batched',
+                                     'speedup'))
+  for k in (2, 16, 256):
+    inputs = make_inputs(k, total)
+    chain = best_of(lambda: [x for x in merge_chain(inputs)])
+    many = best_of(lambda: [x for x in xmerge_many(*inputs)])
+    batched = best_of(lambda: xbase.xresult(xmerge_many(*inputs)))
+    print('%6d %13.3fs %13.3fs %13.3fs %7.1fx' % (k, chain, many, batched, chain / many))
+
+def bench_sparse_dense(total = 1000000):
+  dense = list(range(total))
+  print('Sparse input against %d dense elements:' % total)
+  print('%8s %14s %14s %14s' % ('sparse', 'algorithm', 'streaming', 'sequence'))
+  for m in (10, 1000, 100000):
+    sparse = list(range(0, total, total // m))
+    for algorithm in (xset_intersection, xset_difference):
+      streaming = best_of(lambda: [x for x in algorithm(iter(sparse), iter(dense))])
+      sequence = best_of(lambda: [x for x in algorithm(sparse, dense)])
+      print('%8d %14s %13.3fs %13.3fs' % (m, algorithm.__name__[5:], streaming, sequence))
+
+def bench_sort(total = 1000000):
+  rand = random.Random(1)
+  data = [rand.random() for i in range(total)]
+  print('Sorting %d elements:' % total)
+  print('%14s %10s' % ('max_memory', 'xsort'))
+  for max_memory in (xsorted.XSORT_MEMORY, 1 << 22, 1 << 20):
+    t = best_of(lambda: xbase.xresult(xsort(iter(data), max_memory = max_memory)))
+    print('%14d %9.3fs' % (max_memory, t))
+  print('%14s %9.3fs' % ('sorted()', best_of(lambda: sorted(data))))
+
+if __name__ == '__main__':
+  bench_merge()
+  bench_sparse_dense()
+  bench_sort()
@@ -4,64 +4,194 @@
 # All rights reserved.
 # See the file 'COPYRIGHT' for copyright and disclaimer information
 
-import unittest, sys, os, os.path
-sys.path.insert(0, os.path.join(*tuple([os.pardir] * 4)))
-sys.path.insert(0, os.pardir)
+import unittest, sys, os, os.path, random, string, tempfile
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 4)))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
 
 from TBA.algorithms.xbase import xresult
-from xsoundex import xsoundex
+from xsoundex import xsoundex, xunorthodox_soundex, soundex_many, unorthodox_soundex_many, \
+    xsoundex_names, xunorthodox_soundex_names, soundex_cache, soundex_index, numpy
+
+def random_names(count):
+  rand = random.Random(1)
+  chars = string.ascii_letters + " '-019hwHW"
+  names = ['', 'a', 'H', 'hh', 'b1b', 'bhb', 'bab', '1abc', 'Pfister']
+  for i in range(count):
+    names.append(''.join([rand.choice(chars) for j in range(rand.randint(0, 12))]))
+  return names
 
 class SoundexTestCase(unittest.TestCase):
   def test_known_results(self):
     # This is a bunch of results for soundex(..) posted on the
     #  Internet.  Used here as a test suite.
-    self.failUnless(xresult(xsoundex('Allricht'), '') == 'A-462')
-    self.failUnless(xresult(xsoundex('Ashcraft'), '') == 'A-261')
-    self.failUnless(xresult(xsoundex('Beadles'), '') == 'B-342')
-    self.failUnless(xresult(xsoundex('Callahan'), '') == 'C-450')
-    self.failUnless(xresult(xsoundex('Cook'), '') == 'C-200')
-    self.failUnless(xresult(xsoundex('Dances'), '') == 'D-522')
-    self.failUnless(xresult(xsoundex('Deusen'), '') == 'D-250')
-    self.failUnless(xresult(xsoundex('Devanter'), '') == 'D-153')
-    self.failUnless(xresult(xsoundex('De Vanter'), '') == 'D-153')
-    self.failUnless(xresult(xsoundex('Eberhard'), '') == 'E-166')
-    self.failUnless(xresult(xsoundex('Engebrethson'), '') == 'E-521')
-    self.failUnless(xresult(xsoundex('Gutierrez'), '') == 'G-362')
-    self.failUnless(xresult(xsoundex('Heimbach'), '') == 'H-512')
-    self.failUnless(xresult(xsoundex('Hanselmann'), '') == 'H-524')
-    self.failUnless(xresult(xsoundex('Henzelmann'), '') == 'H-524')
-    self.failUnless(xresult(xsoundex('Hildebrand'), '') == 'H-431')
-    self.failUnless(xresult(xsoundex('Jackson'), '') == 'J-250')
-    self.failUnless(xresult(xsoundex('Kavanagh'), '') == 'K-152')
-    self.failUnless(xresult(xsoundex('Kuhne'), '') == 'K-500')
-    self.failUnless(xresult(xsoundex('Lee'), '') == 'L-000')
-    self.failUnless(xresult(xsoundex('Lind'), '') == 'L-530')
-    self.failUnless(xresult(xsoundex('Lukaschowsky'), '') == 'L-222')
-    self.failUnless(xresult(xsoundex('McDonnell'), '') == 'M-235')
-    self.failUnless(xresult(xsoundex('McGee'), '') == 'M-200')
-    self.failUnless(xresult(xsoundex('OBrien'), '') == 'O-165')
-    self.failUnless(xresult(xsoundex('O\'Brien'), '') == 'O-165')
-    self.failUnless(xresult(xsoundex('Opnian'), '') == 'O-155')
-    self.failUnless(xresult(xsoundex('Oppenheimer'), '') == 'O-155')
-    self.failUnless(xresult(xsoundex('Pfister'), '') == 'P-236')
-    self.failUnless(xresult(xsoundex('Riedemanas'), '') == 'R-355')
-    self.failUnless(xresult(xsoundex('Sa'), '') == 'S-000')
-    self.failUnless(xresult(xsoundex('Schultz'), '') == 'S-432')
-    self.failUnless(xresult(xsoundex('Shinka'), '') == 'S-520')
-    self.failUnless(xresult(xsoundex('Sister'), '') == 'S-236')
-    self.failUnless(xresult(xsoundex('Smith'), '') == 'S-530')
-    self.failUnless(xresult(xsoundex('Smithe'), '') == 'S-530')
-    self.failUnless(xresult(xsoundex('Smyth'), '') == 'S-530')
-    self.failUnless(xresult(xsoundex('Smythe'), '') == 'S-530')
-    self.failUnless(xresult(xsoundex('Tymczak'), '') == 'T-522')
-    self.failUnless(xresult(xsoundex('VanDeusen'), '') == 'V-532')
-    self.failUnless(xresult(xsoundex('Van Deusen'), '') == 'V-532')
-    self.failUnless(xresult(xsoundex('VanDevanter'), '') == 'V-531')
-    self.failUnless(xresult(xsoundex('Van Devanter'), '') == 'V-531')
-    self.failUnless(xresult(xsoundex('Washington'), '') == 'W-252')
-    self.failUnless(xresult(xsoundex('Wolves'), '') == 'W-412')
-    self.failUnless(xresult(xsoundex('Zita'), '') == 'Z-300')
-    self.failUnless(xresult(xsoundex('Zitzmeinn'), '') == 'Z-325')
+    self.assertTrue(xresult(xsoundex('Allricht'), '') == 'A-462')
+    self.assertTrue(xresult(xsoundex('Ashcraft'), '') == 'A-261')
+    self.assertTrue(xresult(xsoundex('Beadles'), '') == 'B-342')
+    self.assertTrue(xresult(xsoundex('Callahan'), '') == 'C-450')
+    self.assertTrue(xresult(xsoundex('Cook'), '') == 'C-200')
+    self.assertTrue(xresult(xsoundex('Dances'), '') == 'D-522')
+    self.assertTrue(xresult(xsoundex('Deusen'), '') == 'D-250')
+    self.assertTrue(xresult(xsoundex('Devanter'), '') == 'D-153')
+    self.assertTrue(xresult(xsoundex('De Vanter'), '') == 'D-153')
+    self.assertTrue(xresult(xsoundex('Eberhard'), '') == 'E-166')
+    self.assertTrue(xresult(xsoundex('Engebrethson'), '') == 'E-521')
+    self.assertTrue(xresult(xsoundex('Gutierrez'), '') == 'G-362')
+    self.assertTrue(xresult(xsoundex('Heimbach'), '') == 'H-512')
+    self.assertTrue(xresult(xsoundex('Hanselmann'), '') == 'H-524')
+    self.assertTrue(xresult(xsoundex('Henzelmann'), '') == 'H-524')
+    self.assertTrue(xresult(xsoundex('Hildebrand'), '') == 'H-431')
+    self.assertTrue(xresult(xsoundex('Jackson'), '') == 'J-250')
+    self.assertTrue(xresult(xsoundex('Kavanagh'), '') == 'K-152')
+    self.assertTrue(xresult(xsoundex('Kuhne'), '') == 'K-500')
+    self.assertTrue(xresult(xsoundex('Lee'), '') == 'L-000')
+    self.assertTrue(xresult(xsoundex('Lind'), '') == 'L-530')
+    self.assertTrue(xresult(xsoundex('Lukaschowsky'), '') == 'L-222')
+    self.assertTrue(xresult(xsoundex('McDonnell'), '') == 'M-235')
+    self.assertTrue(xresult(xsoundex('McGee'), '') == 'M-200')
+    self.assertTrue(xresult(xsoundex('OBrien'), '') == 'O-165')
+    self.assertTrue(xresult(xsoundex('O\'Brien'), '') == 'O-165')
+    self.assertTrue(xresult(xsoundex('Opnian'), '') == 'O-155')
+    self.assertTrue(xresult(xsoundex('Oppenheimer'), '') == 'O-155')
+    self.assertTrue(xresult(xsoundex('Pfister'), '') == 'P-236')
+    self.assertTrue(xresult(xsoundex('Riedemanas'), '') == 'R-355')
+    self.assertTrue(xresult(xsoundex('Sa'), '') == 'S-000')
+    self.assertTrue(xresult(xsoundex('Schultz'), '') == 'S-432')
+    self.assertTrue(xresult(xsoundex('Shinka'), '') == 'S-520')
+    self.assertTrue(xresult(xsoundex('Sister'), '') == 'S-236')
+    self.assertTrue(xresult(xsoundex('Smith'), '') == 'S-530')
+    self.assertTrue(xresult(xsoundex('Smithe'), '') == 'S-530')
+    self.assertTrue(xresult(xsoundex('Smyth'), '') == 'S-530')
+    self.assertTrue(xresult(xsoundex('Smythe'), '') == 'S-530')
+    self.assertTrue(xresult(xsoundex('Tymczak'), '') == 'T-522')
+    self.assertTrue(xresult(xsoundex('VanDeusen'), '') == 'V-532')
+    self.assertTrue(xresult(xsoundex('Van Deusen'), '') == 'V-532')
+    self.assertTrue(xresult(xsoundex('VanDevanter'), '') == 'V-531')
+    self.assertTrue(xresult(xsoundex('Van Devanter'), '') == 'V-531')
+    self.assertTrue(xresult(xsoundex('Washington'), '') == 'W-252')
+    self.assertTrue(xresult(xsoundex('Wolves'), '') == 'W-412')
+    self.assertTrue(xresult(xsoundex('Zita'), '') == 'Z-300')
+    self.assertTrue(xresult(xsoundex('Zitzmeinn'), '') == 'Z-325')
+
+class ManyTestCase(unittest.TestCase):
+  def test_same_codes(self):
+    names = random_names(2000)
+    self.assertTrue(soundex_many(names) == [xresult(xsoundex(x), '') for x in names])
+    self.assertTrue(unorthodox_soundex_many(names) ==
+                    [xresult(xunorthodox_soundex(x), '') for x in names])
+
+  def test_streams(self):
+    names = random_names(100)
+    i = xsoundex_names(names)
+    self.assertTrue([next(i) for x in range(3)] + i.next_batch(1000) == soundex_many(names))
+    self.assertTrue(xresult(xunorthodox_soundex_names(names)) ==
+                    unorthodox_soundex_many(names))
+
+  @unittest.skipIf(numpy is None, 'NumPy is not installed')
+  def test_array(self):
+    names = random_names(2000)
+    result = soundex_many(numpy.array([x.encode('ascii') for x in names]))
+    self.assertTrue(result.tolist() == [x.encode('ascii') for x in soundex_many(names)])
+    result = unorthodox_soundex_many(numpy.array([x.encode('ascii') for x in names]))
+    self.assertTrue(result.tolist() ==
+                    [x.encode('ascii') for x in unorthodox_soundex_many(names)])
+
+class CacheTestCase(unittest.TestCase):
+  def test_same_codes(self):
+    names = random_names(500) * 2
+    codes = soundex_cache(100)
+    self.assertTrue(codes.many(names) == soundex_many(names))
+    self.assertTrue(codes.hits + codes.misses == len(names))
+    self.assertTrue(codes.misses - codes.evictions == len(codes) == 100)
+    codes = soundex_cache(None, unorthodox = 1)
+    self.assertTrue(codes.many(names) == unorthodox_soundex_many(names))
+    self.assertTrue(codes.evictions == 0 and len(codes) == len(set(names)))
+
+  def test_lru(self):
+    codes = soundex_cache(2)
+    for x in ('Lee', 'Smith', 'Lee', 'Jones', 'Lee', 'Smith'):
+      codes(x)
+    # 'Smith' was used less recently than 'Lee' when 'Jones' arrived
+    self.assertTrue((codes.hits, codes.misses, codes.evictions) == (2, 4, 2))
+    self.assertTrue(codes.hit_rate() == 2 / 6)
+    codes.clear()
+    self.assertTrue(len(codes) == 0 and codes.hits == 0 and codes.hit_rate() == 0)
+    codes = soundex_cache(0)
+    self.assertTrue(codes.many(['Lee', 'Lee']) == ['L-000', 'L-000'])
+    self.assertTrue((codes.hits, codes.misses, codes.evictions) == (0, 2, 2))
+
+  def test_normalize(self):
+    codes = soundex_cache(normalize = 1)
+    self.assertTrue(codes.many(['smith', 'SMITH', 'Smith']) == ['S-530'] * 3)
+    self.assertTrue(codes.hits == 2 and len(codes) == 1)
+    codes = soundex_cache()
+    self.assertTrue(codes.many(['smith', 'SMITH']) == ['S-530'] * 2 and codes.hits == 0)
+
+  def test_stream(self):
+    names = random_names(100) * 3
+    codes = soundex_cache(50)
+    i = xsoundex_names(names).set_cache(codes)
+    self.assertTrue([next(i)] + i.next_batch(1000) == soundex_many(names))
+    self.assertTrue(codes.hits + codes.misses == len(names))
+
+class IndexTestCase(unittest.TestCase):
+  def setUp(self):
+    fd, self.path = tempfile.mkstemp()
+    os.close(fd)
+
+  def tearDown(self):
+    os.remove(self.path)
+
+  def assertIndex(self, index, names):
+    # Compare every lookup with a scan of the names
+    self.assertTrue(len(index) == len(names))
+    for name in ['', 'Lee', 'Smith', 'Koch'] + list(names.values())[:50]:
+      for unorthodox, encode in ((0, soundex_many), (1, unorthodox_soundex_many)):
+        code = encode([name])[0]
+        expected = sorted([k for k, v in names.items() if encode([v])[0] == code])
+        self.assertTrue(index.candidates(name, unorthodox) == expected, (name, unorthodox))
+
+  def test_index(self):
+    rand = random.Random(2)
+    pool = random_names(300)
+    names = {}
+    index = soundex_index()
+    index.insert_many([(i, pool[i]) for i in range(100)])
+    names.update([(i, pool[i]) for i in range(100)])
+    self.assertIndex(index, names)
+    opened = []
+    for round in range(3):
+      for i in range(60):
+        id = rand.randrange(150)
+        if id in names and rand.random() < 0.5:
+          index.delete(id)
+          del names[id]
+        else:
+          index.insert(id, pool[id + round])
+          names[id] = pool[id + round]
+      self.assertTrue(all([x in index for x in names]))
+      self.assertTrue(not any([x in index for x in range(150) if x not in names]))
+      self.assertIndex(index, names)
+      # Saving over the file the index was opened from is allowed
+      index.save(self.path)
+      index = soundex_index(self.path)
+      opened.append(index)
+      self.assertIndex(index, names)
+    self.assertRaises(KeyError, index.delete, 1000)
+    for x in opened:
+      x.close()
+
+  def test_empty(self):
+    soundex_index().save(self.path)
+    index = soundex_index(self.path)
+    self.assertTrue(len(index) == 0 and index.candidates('Lee') == [])
+    index.insert(-5, 'Lee')
+    self.assertTrue(index.candidates('Lea') == [-5])
+    index.close()
+
+  def test_bad_file(self):
+    with open(self.path, 'wb') as file:
+      file.write(b'x' * 64)
+    self.assertRaises(ValueError, soundex_index, self.path)
 
 if __name__ == '__main__':
   try:
@@ -4,15 +4,54 @@
 
 """Soundex algorithm as an iterator adapter.
 
+xsoundex and xunorthodox_soundex encode one name, as a stream of
+characters.  To encode many names, soundex_many and
+unorthodox_soundex_many encode a whole list at once, with the same
+results; they work on whole strings (with str.translate and a regular
+expression) instead of one character at a time.  Given a NumPy array of
+byte strings, they encode every name at once in NumPy.  xsoundex_names
+and xunorthodox_soundex_names do the same for a stream of names.
+
+Real name columns repeat the same few thousand names over and over; a
+soundex_cache remembers the codes of the names it has seen most
+recently, and counts how often it finds them, so its size can be tuned.
+
+To match a name against a large list of reference names, a
+soundex_index maps each code to the IDs of the reference names with
+that code, for both kinds of code.  It can be saved to a file, which is
+then memory-mapped, so a large index is ready to use as soon as it is
+opened.
+
 Global Classes (each has its own __doc__):
   xsoundex -- Calculate standard soundex code.
   xunorthodox_soundex -- Calculate (IMHO) more useful soundex code.
+  xsoundex_names -- Calculate standard soundex codes of a stream of names.
+  xunorthodox_soundex_names -- Calculate (IMHO) more useful soundex codes
+    of a stream of names.
+  soundex_cache -- Calculate soundex codes, remembering recent names.
+  soundex_index -- Find the IDs of names with the same soundex code.
+
+Global Functions (each has its own __doc__):
+  soundex_many -- Calculate standard soundex codes of many names.
+  unorthodox_soundex_many -- Calculate (IMHO) more useful soundex codes
+    of many names.
 """  
 
-import string
 from TBA.algorithms.xcompatibility import *
-from TBA.algorithms.xbase import xbase
+from TBA.algorithms.xbase import xbase, xbatch, XBATCH_SIZE
 from TBA.algorithms.xbasic import xcat, xfill, xhead, xtail
+from array import array
+import bisect
+import collections
+import mmap
+import os
+import re
+import struct
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
 
 # Dictionary entries:
 #  <not present> -- the character acts as a separator
@@ -41,6 +80,136 @@ _soundex_dict = {
     'r':'6'
 }
 
+# The same codes for whole strings: str.translate maps each letter to
+#  its digit and deletes the skip characters.  Digits in the input are
+#  separators, so they are mapped to '-'; every other character is left
+#  as it is, and is a separator too, since only '1'-'6' are codes.  Then
+#  each run of equal digits (not broken by a separator) is one digit of
+#  the code.
+_soundex_table = str.maketrans(dict(
+    [(k, v != 'S' and v or None) for k, v in _soundex_dict.items()] +
+    [(c, '-') for c in '0123456789']))
+_soundex_runs = re.compile(r'([1-6])\1*')
+
+def _unorthodox_soundex(name):
+  return ''.join(_soundex_runs.findall(name.translate(_soundex_table)))
+
+def _soundex(name):
+  if not name:
+    return ''
+  digits = _unorthodox_soundex(name)
+  first = name[0]
+  if _soundex_dict.get(first, 'S') != 'S':
+    # The first digit is the code of the first character
+    digits = digits[1:]
+  return (first.upper() + '-' + digits)[:5].ljust(5, '0')
+
+# The codes for NumPy byte strings: 0 for a separator, 7 for a skip
+#  character, and 1-6 for a digit.
+if numpy is not None:
+  _soundex_lut = numpy.zeros(256, numpy.uint8)
+  for k, v in _soundex_dict.items():
+    _soundex_lut[ord(k)] = v == 'S' and 7 or int(v)
+
+def _xarray(names):
+  return numpy is not None and isinstance(names, numpy.ndarray) and \
+         names.dtype.kind == 'S' and names.ndim == 1
+
+def _soundex_digits(names):
+  """Return (chars, digits, counts) for a NumPy array of byte strings.
+
+  'chars' is the names as rows of bytes.  Row i of 'digits' starts with
+  the counts[i] digits of the unorthodox soundex code of name i, as
+  ASCII bytes.
+  """
+
+  n, width = len(names), names.dtype.itemsize
+  chars = numpy.ascontiguousarray(names).view(numpy.uint8).reshape(n, width)
+  codes = _soundex_lut[chars]
+  # The position of the last character at or before each position
+  #  that is not a skip character
+  last = numpy.where(codes != 7, numpy.arange(width), -1)
+  numpy.maximum.accumulate(last, axis = 1, out = last)
+  # The code before each position, skipping skip characters
+  prev = numpy.zeros_like(codes)
+  before = last[:, :-1]
+  prev[:, 1:] = numpy.where(before >= 0, numpy.take_along_axis(codes,
+                            numpy.maximum(before, 0), 1), 0)
+  keep = (codes >= 1) & (codes <= 6) & (codes != prev)
+  order = numpy.argsort(~keep, axis = 1, kind = 'stable')
+  digits = numpy.take_along_axis(codes, order, 1) + numpy.uint8(ord('0'))
+  return chars, digits, keep.sum(1)
+
+def _soundex_array(names):
+  n = len(names)
+  chars, digits, counts = _soundex_digits(names)
+  first = chars[:, 0]
+  coded = (_soundex_lut[first] >= 1) & (_soundex_lut[first] <= 6)
+  ret = numpy.full((n, 5), ord('0'), numpy.uint8)
+  ret[:, 0] = numpy.where((first >= ord('a')) & (first <= ord('z')), first - 32, first)
+  ret[:, 1] = ord('-')
+  rows = numpy.arange(n)
+  for i in range(3):
+    pos = coded + i
+    digit = digits[rows, numpy.minimum(pos, digits.shape[1] - 1)]
+    ret[:, 2 + i] = numpy.where(pos < counts, digit, ord('0'))
+  ret[names == b''] = 0
+  return ret.view('S5').reshape(n)
+
+def _unorthodox_soundex_array(names):
+  n = len(names)
+  chars, digits, counts = _soundex_digits(names)
+  digits[numpy.arange(digits.shape[1]) >= counts[:, None]] = 0
+  return digits.view('S%d' % digits.shape[1]).reshape(n)
+
+def soundex_many(names):
+  """Calculate standard soundex codes of many names.
+
+  Arguments:
+    names --
+      A sequence of strings, or a one-dimensional NumPy array of byte
+      strings.
+
+  Returns:
+    A list of the soundex codes of the names, as xsoundex calculates
+    them ('' for an empty name); or, for an array, an array of byte
+    strings.
+
+  Notes:
+    The bytes of an array are read as Latin-1 characters, but only
+    ASCII letters are uppercased.
+
+  Example:
+    >>> soundex_many(['Tymczak', 'Lee', ''])
+    ['T-522', 'L-000', '']
+  """
+
+  if _xarray(names):
+    return _soundex_array(names)
+  return list(map(_soundex, names))
+
+def unorthodox_soundex_many(names):
+  """Calculate (IMHO) more useful soundex codes of many names.
+
+  Arguments:
+    names --
+      A sequence of strings, or a one-dimensional NumPy array of byte
+      strings.
+
+  Returns:
+    A list of the codes of the names, as xunorthodox_soundex
+    calculates them (all the digits, not just the first three); or,
+    for an array, an array of byte strings.
+
+  Example:
+    >>> unorthodox_soundex_many(['Tymczak', 'Lee'])
+    ['3522', '4']
+  """
+
+  if _xarray(names):
+    return _unorthodox_soundex_array(names)
+  return list(map(_unorthodox_soundex, names))
+
 class xunorthodox_soundex (xbase):
   """Calculates (IMHO) more useful soundex code.
 
@@ -61,14 +230,16 @@ class xunorthodox_soundex (xbase):
       Returns self.
   """
 
+  __slots__ = ('__in', '__last_char')
+
   def __init__(self, input = None):
     self.__in = iter(input)
     self.__last_char = 'X'
 
-  def next(self):
+  def __next__(self):
     while (1):
       try:
-        new_char = _soundex_dict[self.__in.next()]
+        new_char = _soundex_dict[next(self.__in)]
       except KeyError:
         self.__last_char = 'X'
       else:
@@ -98,15 +269,17 @@ class xsoundex (xbase):
       Returns self.
   """
 
+  __slots__ = ('__in', '__me')
+
   def __init__(self, input):
     self.__in = iter(input)
     self.__me = None
 
-  def next(self):
+  def __next__(self):
     if self.__me is None:
       # We look at the first character; this determines how we
       #  calculate the rest of the code.
-      tmp_char = self.__in.next()
+      tmp_char = next(self.__in)
 
       # See if the first character is a skip or separator char
       try:
@@ -128,7 +301,7 @@ class xsoundex (xbase):
         source = xtail(source, 1)
       
       # Prepend the initial char (uppercased) and the dash
-      source = xcat(string.upper(tmp_char) + '-', source)
+      source = xcat(tmp_char.upper() + '-', source)
 
       # Make length exactly 5, filling with '0' as necessary
       source = xhead(xfill(source, 5, '0'), 5)
@@ -136,8 +309,427 @@ class xsoundex (xbase):
       # Save algorithm for future calls
       self.__me = source
 
-    return self.__me.next()
+    return next(self.__me)
+
+  def set_input(self, input):
+    self.__in = iter(input)
+    return self
+
+class soundex_cache:
+  """Calculate soundex codes, remembering recent names.
+
+  A soundex_cache is called with a name, and returns its code, as
+  soundex_many (or, if 'unorthodox' is true, unorthodox_soundex_many)
+  would.  It remembers the codes of the last 'size' different names it
+  was called with (all of them, if 'size' is None), and returns those
+  codes without calculating them again; when it is full, the name used
+  least recently is forgotten.
+
+  If 'normalize' is true, names are lowercased before they are looked
+  up, so names that differ only in case share one entry.  That does
+  not change the codes of ASCII names; other names are encoded as
+  their lowercase form.
+
+  Attributes:
+    hits -- The number of names whose codes were remembered.
+    misses -- The number of names whose codes were calculated.
+    evictions -- The number of names forgotten to make room.
+
+  Methods:
+    __init__(self, size = 10000, normalize = 0, unorthodox = 0)
+    __call__(self, name) --
+      Returns the code of a name.
+    many(self, names) --
+      Returns a list of the codes of names.
+    __len__(self) --
+      Returns the number of names remembered.
+    clear(self) --
+      Forgets every name, and sets the counts to 0.
+    hit_rate(self) --
+      Returns hits / (hits + misses), or 0 before the first call.
+
+  Example:
+    >>> codes = soundex_cache(2, normalize = 1)
+    >>> codes.many(['Lee', 'Smith', 'LEE', 'Jones', 'Smith'])
+    ['L-000', 'S-530', 'L-000', 'J-520', 'S-530']
+    >>> codes.hits, codes.misses, codes.evictions
+    (1, 4, 2)
+  """
+
+  __slots__ = ('__size', '__normalize', '__encode', '__codes', 'hits', 'misses',
+               'evictions')
+
+  def __init__(self, size = 10000, normalize = 0, unorthodox = 0):
+    self.__size = size
+    self.__normalize = normalize
+    self.__encode = unorthodox and _unorthodox_soundex or _soundex
+    self.__codes = collections.OrderedDict()
+    self.hits = self.misses = self.evictions = 0
+
+  def __call__(self, name):
+    if self.__normalize:
+      name = name.lower()
+    codes = self.__codes
+    try:
+      code = codes[name]
+    except KeyError:
+      self.misses += 1
+      code = codes[name] = self.__encode(name)
+      if self.__size is not None and len(codes) > self.__size:
+        codes.popitem(last = False)
+        self.evictions += 1
+      return code
+    codes.move_to_end(name)
+    self.hits += 1
+    return code
+
+  def many(self, names):
+    return list(map(self, names))
+
+  def __len__(self):
+    return len(self.__codes)
+
+  def clear(self):
+    self.__codes.clear()
+    self.hits = self.misses = self.evictions = 0
+
+  def hit_rate(self):
+    total = self.hits + self.misses
+    return total and self.hits / total or 0
+
+class _xnames (xbase):
+  """Base class for the algorithms that encode a stream of names.
+
+  Derived classes define encode(name) and encode_many(names).
+  """
+
+  __slots__ = ('__in', '__cache')
+
+  def __init__(self, input = None):
+    self.__in = iter(input)
+    self.__cache = None
+
+  def __next__(self):
+    if self.__cache is not None:
+      return self.__cache(next(self.__in))
+    return self.encode(next(self.__in))
 
   def set_input(self, input):
     self.__in = iter(input)
     return self
+
+  def set_cache(self, cache):
+    self.__cache = cache
+    return self
+
+  def describe(self):
+    return (self.__class__.__name__, (self.__in,), {'cache': self.__cache})
+
+  def next_batch(self, n = XBATCH_SIZE):
+    if self.__cache is not None:
+      return self.__cache.many(xbatch(self.__in, n))
+    return self.encode_many(xbatch(self.__in, n))
+
+class xsoundex_names (_xnames):
+  """Calculates standard soundex codes of a stream of names.
+
+  Takes a stream of names (strings).  Generates the soundex code of
+  each, as a string; see xsoundex.  Batches are encoded by
+  soundex_many, or by a soundex_cache if one is set.
+
+  Methods:
+    __init__(self, input = None)
+    set_input(self, input),
+    set_cache(self, cache) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.
+  """
+
+  __slots__ = ()
+
+  encode = staticmethod(_soundex)
+  encode_many = staticmethod(soundex_many)
+
+class xunorthodox_soundex_names (_xnames):
+  """Calculates (IMHO) more useful soundex codes of a stream of names.
+
+  Takes a stream of names (strings).  Generates the code of each, as a
+  string; see xunorthodox_soundex.  Batches are encoded by
+  unorthodox_soundex_many, or by a soundex_cache (made with
+  'unorthodox' true) if one is set.
+
+  Methods:
+    __init__(self, input = None)
+    set_input(self, input),
+    set_cache(self, cache) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.
+  """
+
+  __slots__ = ()
+
+  encode = staticmethod(_unorthodox_soundex)
+  encode_many = staticmethod(unorthodox_soundex_many)
+
+#
+# Blocking index
+#
+
+# A soundex_index file holds, in the byte order of the machine that
+#  wrote it:
+#    the header (_soundex_header): _soundex_magic, the number of IDs, and
+#      for each table (standard codes, then unorthodox codes) the number
+#      of codes and the size of their text in bytes;
+#    every ID in the index, sorted, as int64s;
+#    then, for each table:
+#      code offsets: code i is text[offsets[i]:offsets[i + 1]];
+#      ID offsets: the IDs of code i are ids[offsets[i]:offsets[i + 1]];
+#      ids: the IDs of each code in turn, sorted, as int64s;
+#      text: the codes, sorted, in UTF-8, padded to a multiple of 8 bytes.
+#  Offsets are uint64s, and each table has one more of each than codes.
+_soundex_magic = b'TBASDX01'
+_soundex_header = struct.Struct('=8s5Q')
+
+def _xpad8(size):
+  return (size + 7) & ~7
+
+class _xcodes:
+  """The sorted codes of one table of a soundex_index file, as a sequence."""
+
+  __slots__ = ('__offsets', '__text')
+
+  def __init__(self, offsets, text):
+    self.__offsets = offsets
+    self.__text = text
+
+  def __len__(self):
+    return len(self.__offsets) - 1
+
+  def __getitem__(self, i):
+    return str(self.__text[self.__offsets[i]:self.__offsets[i + 1]], 'utf-8')
+
+class soundex_index:
+  """Find the IDs of names with the same soundex code.
+
+  A soundex_index holds a set of names, each with an integer ID (which
+  must fit in 64 bits).  Each name is encoded once, when it is
+  inserted, both as xsoundex and as xunorthodox_soundex would encode
+  it; candidates(name) then returns the IDs of every name whose code is
+  the same as that of 'name', without encoding any of them again.
+
+  save(path) writes the index to a file, and soundex_index(path) opens
+  it again.  The file is memory-mapped, not read: its IDs are sorted
+  by code, so the IDs of a code are found by binary search, and copied
+  out only when they are returned.  Names inserted or deleted after the
+  file is opened are kept in memory, until the index is saved again.
+  The names themselves are not kept, only their codes.
+
+  Methods:
+    __init__(self, path = None) --
+      Opens the index saved at 'path', or makes an empty index.
+    insert(self, id, name) --
+      Adds a name; if 'id' is in the index, replaces its name.
+    insert_many(self, records) --
+      Adds each (id, name) pair of 'records'.
+    delete(self, id) --
+      Removes a name.  Raises KeyError if 'id' is not in the index.
+    candidates(self, name, unorthodox = 0) --
+      Returns a sorted list of the IDs of the names with the same
+      code as 'name' (the same unorthodox code, if 'unorthodox').
+    lookup(self, code, unorthodox = 0) --
+      Returns a sorted list of the IDs of the names with code 'code'.
+    __len__(self),
+    __contains__(self, id) --
+      The number of names, and whether an ID is in the index.
+    save(self, path) --
+      Writes the index to a file.
+    close(self) --
+      Unmaps the file the index was opened from; the index may not be
+      used after that.
+
+  Example:
+    >>> index = soundex_index()
+    >>> index.insert_many([(1, 'Cook'), (2, 'Kuk'), (3, 'Smith'), (4, 'Smyth')])
+    >>> index.candidates('Koch'), index.candidates('Koch', unorthodox = 1)
+    ([2], [1, 2])
+    >>> index.candidates('Smithe')
+    [3, 4]
+  """
+
+  __slots__ = ('__map', '__views', '__ids', '__base', '__deleted', '__codes',
+               '__tables')
+
+  def __init__(self, path = None):
+    self.__map = None
+    self.__views = []
+    self.__ids = ()
+    self.__base = None
+    # Base IDs deleted (or replaced) since the file was opened
+    self.__deleted = set()
+    # Inserted IDs: id -> (code, unorthodox code), and for each table,
+    #  code -> set of IDs
+    self.__codes = {}
+    self.__tables = ({}, {})
+    if path is not None:
+      self.__open(path)
+
+  def __open(self, path):
+    with open(path, 'rb') as file:
+      self.__map = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+    view = memoryview(self.__map)
+    self.__views.append(view)
+    magic, n, codes0, text0, codes1, text1 = _soundex_header.unpack_from(view)
+    if magic != _soundex_magic:
+      self.close()
+      raise ValueError('%r is not a soundex_index file' % (path,))
+    pos = _soundex_header.size
+    self.__ids = self.__view(view, pos, n * 8, 'q')
+    pos += n * 8
+    tables = []
+    for codes, text in ((codes0, text0), (codes1, text1)):
+      size = (codes + 1) * 8
+      code_offsets = self.__view(view, pos, size, 'Q')
+      id_offsets = self.__view(view, pos + size, size, 'Q')
+      ids = self.__view(view, pos + 2 * size, n * 8, 'q')
+      pos += 2 * size + n * 8
+      text = self.__view(view, pos, text, 'B')
+      pos += _xpad8(len(text))
+      tables.append((_xcodes(code_offsets, text), id_offsets, ids))
+    self.__base = tuple(tables)
+
+  def __view(self, view, pos, size, format):
+    ret = view[pos:pos + size].cast(format)
+    self.__views.append(ret)
+    return ret
+
+  def __in_base(self, id):
+    ids = self.__ids
+    i = bisect.bisect_left(ids, id)
+    return i < len(ids) and ids[i] == id and id not in self.__deleted
+
+  def __base_lookup(self, table, code):
+    codes, offsets, ids = self.__base[table]
+    i = bisect.bisect_left(codes, code)
+    if i == len(codes) or codes[i] != code:
+      return []
+    ret = ids[offsets[i]:offsets[i + 1]].tolist()
+    deleted = self.__deleted
+    if deleted:
+      ret = [x for x in ret if x not in deleted]
+    return ret
+
+  def __contains__(self, id):
+    return id in self.__codes or self.__in_base(id)
+
+  def __len__(self):
+    return len(self.__codes) + len(self.__ids) - len(self.__deleted)
+
+  def insert(self, id, name):
+    self.__insert(id, (_soundex(name), _unorthodox_soundex(name)))
+
+  def insert_many(self, records):
+    records = list(records)
+    names = [x[1] for x in records]
+    for (id, name), codes in zip(records, zip(soundex_many(names),
+                                              unorthodox_soundex_many(names))):
+      self.__insert(id, codes)
+
+  def __insert(self, id, codes):
+    if id in self:
+      self.delete(id)
+    self.__codes[id] = codes
+    for table, code in zip(self.__tables, codes):
+      ids = table.get(code)
+      if ids is None:
+        ids = table[code] = set()
+      ids.add(id)
+
+  def delete(self, id):
+    codes = self.__codes.pop(id, None)
+    if codes is not None:
+      for table, code in zip(self.__tables, codes):
+        ids = table[code]
+        ids.discard(id)
+        if not ids:
+          del table[code]
+    elif self.__in_base(id):
+      self.__deleted.add(id)
+    else:
+      raise KeyError(id)
+
+  def candidates(self, name, unorthodox = 0):
+    if unorthodox:
+      return self.lookup(_unorthodox_soundex(name), 1)
+    return self.lookup(_soundex(name), 0)
+
+  def lookup(self, code, unorthodox = 0):
+    table = unorthodox and 1 or 0
+    ret = []
+    if self.__base is not None:
+      ret = self.__base_lookup(table, code)
+    added = self.__tables[table].get(code)
+    if added:
+      # Base and inserted IDs never overlap; sorting merges the two runs.
+      ret.extend(added)
+      ret.sort()
+    return ret
+
+  def __items(self, table):
+    """Return a sorted list of (code, sorted IDs) for one table."""
+
+    ret = {}
+    if self.__base is not None:
+      codes, offsets, ids = self.__base[table]
+      for i in range(len(codes)):
+        x = self.__base_lookup(table, codes[i])
+        if x:
+          ret[codes[i]] = x
+    for code, x in self.__tables[table].items():
+      ret[code] = sorted(ret.get(code, []) + list(x))
+    return sorted(ret.items())
+
+  def save(self, path):
+    ids = self.__ids
+    if self.__deleted:
+      ids = [x for x in ids if x not in self.__deleted]
+    ids = array('q', sorted(list(ids) + list(self.__codes)))
+    tables, header = [], [_soundex_magic, len(ids)]
+    for table in (0, 1):
+      items = self.__items(table)
+      text = [code.encode('utf-8') for code, x in items]
+      code_offsets, id_offsets = array('Q', [0]), array('Q', [0])
+      for code, x in zip(text, items):
+        code_offsets.append(code_offsets[-1] + len(code))
+        id_offsets.append(id_offsets[-1] + len(x[1]))
+      text = b''.join(text)
+      tables.append((code_offsets, id_offsets, items, text))
+      header.extend([len(items), len(text)])
+    # Write a new file, then replace the old one, so that an index
+    #  opened from the old file keeps working.
+    temp = path + '.tmp'
+    with open(temp, 'wb') as file:
+      file.write(_soundex_header.pack(*header))
+      file.write(ids.tobytes())
+      for code_offsets, id_offsets, items, text in tables:
+        file.write(code_offsets.tobytes())
+        file.write(id_offsets.tobytes())
+        for code, x in items:
+          file.write(array('q', x).tobytes())
+        file.write(text + b'\0' * (_xpad8(len(text)) - len(text)))
+    os.replace(temp, path)
+
+  def close(self):
+    # The views of the file must be released before it is unmapped.
+    while self.__views:
+      self.__views.pop().release()
+    if self.__map is not None:
+      self.__map.close()
+      self.__map = None
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator, asyncio, random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms.xcompatibility import cmp
+from TBA.algorithms import xasync, xbasic, xsorted
+from TBA.algorithms.xasync import axcat, axfilter, axmap, axhead, axtail, axmerge, \
+    axresult
+
+async def agen(seq):
+  """An asynchronous source that yields to the event loop between elements."""
+  for x in seq:
+    await asyncio.sleep(0)
+    yield x
+
+def run(input, start = None):
+  return asyncio.run(axresult(input, start))
+
+class BasicTestCase(unittest.TestCase):
+  def test_cat(self):
+    self.assertTrue(run(axcat()) == [])
+    self.assertTrue(run(axcat(agen([1, 2]), [], agen([3]))) == [1, 2, 3])
+
+  def test_filter(self):
+    self.assertTrue(run(axfilter(None, agen([0, 2, 0, 4]))) == [2, 4])
+    async def positive(x):
+      await asyncio.sleep(0)
+      return x > 0
+    self.assertTrue(run(axfilter(positive, agen([-1, 2, -3, 4]))) == [2, 4])
+
+  def test_map(self):
+    self.assertTrue(run(axmap(abs)) == [])
+    self.assertTrue(run(axmap(abs, agen([3, 0, -2]))) == [3, 0, 2])
+    i = axmap(operator.mul, agen([2, 3]), [5, 7, 11]).set_replace(1)
+    self.assertTrue(run(i) == [10, 21, 11])
+
+  def test_head_tail(self):
+    for bound in (-1, 0, 2, 2.5, 9):
+      data = [1, 1, 2, 3]
+      self.assertTrue(run(axhead(agen(data), bound)) == [x for x in xbasic.xhead(data, bound)])
+      self.assertTrue(run(axtail(agen(data), bound)) == [x for x in xbasic.xtail(data, bound)])
+
+  def test_result(self):
+    self.assertTrue(run(agen('bc'), 'a') == 'abc')
+    self.assertTrue(run(agen([2]), (1,)) == (1, 2))
+    self.assertTrue(run(agen([2]), [1]) == [1, 2])
+
+class ConcurrencyTestCase(unittest.TestCase):
+  def test_ordered(self):
+    running, peak = [0], [0]
+    async def work(x):
+      running[0] += 1
+      peak[0] = max(peak[0], running[0])
+      await asyncio.sleep((10 - x) * 0.001)
+      running[0] -= 1
+      return x * x
+    self.assertTrue(run(axmap(work, agen(range(10))).set_concurrency(3)) ==
+                    [x * x for x in range(10)])
+    self.assertTrue(peak[0] == 3)
+
+  def test_exception_position(self):
+    async def inverse(x):
+      await asyncio.sleep(0)
+      return 1 / x
+    async def body():
+      i = axmap(inverse, agen([1, 0, 4])).set_concurrency(2)
+      ret = [await i.__anext__()]
+      try:
+        await i.__anext__()
+      except ZeroDivisionError:
+        ret.append('error')
+      ret.append(await i.__anext__())
+      try:
+        await i.__anext__()
+      except StopAsyncIteration:
+        ret.append('done')
+      return ret
+    self.assertTrue(asyncio.run(body()) == [1, 'error', 0.25, 'done'])
+
+class SortedTestCase(unittest.TestCase):
+  def test_same_output(self):
+    rand = random.Random(1)
+    for i in range(100):
+      x = sorted(rand.sample(range(20), rand.randint(0, 10)))
+      y = sorted(rand.sample(range(20), rand.randint(0, 10)))
+      for name in ('xmerge', 'xset_union', 'xset_intersection', 'xset_difference',
+                   'xset_symmetric_difference'):
+        expected = [z for z in getattr(xsorted, name)(x, y)]
+        result = run(getattr(xasync, 'a' + name)(agen(x), agen(y)))
+        self.assertTrue(result == expected, (name, x, y))
+
+  def test_stability(self):
+    a, b = [], []
+    result = run(axmerge(agen([a]), agen([b])))
+    self.assertTrue(result[0] is a and result[1] is b)
+    result = run(xasync.axset_union(agen([a]), agen([b])))
+    self.assertTrue(len(result) == 1 and result[0] is a)
+    result = run(xasync.axset_intersection(agen([a]), agen([b])))
+    self.assertTrue(len(result) == 1 and result[0] is a)
+
+  def test_comp_and_key(self):
+    def rcmp(x, y): return cmp(y, x)
+    self.assertTrue(run(axmerge(agen([5, 1]), [4, 2], rcmp)) == [5, 4, 2, 1])
+    result = run(axmerge(agen(['b', 'C']), agen(['A', 'c'])).set_key(str.lower))
+    self.assertTrue(result == ['A', 'b', 'C', 'c'])
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
@@ -4,90 +4,453 @@
 # All rights reserved.
 # See the file 'COPYRIGHT' for copyright and disclaimer information
 
-import unittest, sys, os, os.path, operator
-sys.path.insert(0, os.path.join(*tuple([os.pardir] * 3)))
+import unittest, sys, os, os.path, operator, functools, array, io, pickle, random, tempfile, \
+    itertools
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
 
-from TBA.algorithms.xbasic import xcat, xfilter, xmap, xunique
+from TBA.algorithms.xcompatibility import cmp
+from TBA.algorithms.xbasic import xcat, xfilter, xmap, xmap_trim, xunique, \
+    xdistinct, xgroupby, xhead, xtail, xfill, xaggregate, xcount, xsum, xmin, xmax, \
+    xfirst, xlast, xgroup
+from TBA.algorithms import xbase, xfast, xsorted
+from TBA.algorithms.examples.xsoundex import xsoundex
 
 class CatTestCase(unittest.TestCase):
   def test_0_inputs(self):
-    self.failUnless([x for x in xcat()] == [])
+    self.assertTrue([x for x in xcat()] == [])
 
   def test_1_input(self):
-    self.failUnless([x for x in xcat([])] == [])
-    self.failUnless([x for x in xcat([3])] == [3])
-    self.failUnless([x for x in xcat([3, 5, None])] == [3, 5, None])
+    self.assertTrue([x for x in xcat([])] == [])
+    self.assertTrue([x for x in xcat([3])] == [3])
+    self.assertTrue([x for x in xcat([3, 5, None])] == [3, 5, None])
 
   def test_2_inputs(self):
-    self.failUnless([x for x in xcat([], [])] == [])
-    self.failUnless([x for x in xcat([3], [])] == [3])
-    self.failUnless([x for x in xcat([], [3])] == [3])
-    self.failUnless([x for x in xcat([3, 5, None], [])] == [3, 5, None])
-    self.failUnless([x for x in xcat([], [3, 5, None])] == [3, 5, None])
-    self.failUnless([x for x in xcat([3, 5, None], [3])] == [3, 5, None, 3])
-    self.failUnless([x for x in xcat([3], [3, 5, None])] == [3, 3, 5, None])
-    self.failUnless([x for x in xcat([3, 5, None], [4, 6, 'two'])] == [3, 5, None, 4, 6, 'two'])
+    self.assertTrue([x for x in xcat([], [])] == [])
+    self.assertTrue([x for x in xcat([3], [])] == [3])
+    self.assertTrue([x for x in xcat([], [3])] == [3])
+    self.assertTrue([x for x in xcat([3, 5, None], [])] == [3, 5, None])
+    self.assertTrue([x for x in xcat([], [3, 5, None])] == [3, 5, None])
+    self.assertTrue([x for x in xcat([3, 5, None], [3])] == [3, 5, None, 3])
+    self.assertTrue([x for x in xcat([3], [3, 5, None])] == [3, 3, 5, None])
+    self.assertTrue([x for x in xcat([3, 5, None], [4, 6, 'two'])] == [3, 5, None, 4, 6, 'two'])
 
   def test_n_inputs(self):
-    self.failUnless([x for x in xcat([1, 4, 7], [2, 5, 8], [3, 6, 9])] == [1, 4, 7, 2, 5, 8, 3, 6, 9])
-    self.failUnless([x for x in xcat([2, 5, 8], [], [1, 4, 7])] == [2, 5, 8, 1, 4, 7])
+    self.assertTrue([x for x in xcat([1, 4, 7], [2, 5, 8], [3, 6, 9])] == [1, 4, 7, 2, 5, 8, 3, 6, 9])
+    self.assertTrue([x for x in xcat([2, 5, 8], [], [1, 4, 7])] == [2, 5, 8, 1, 4, 7])
 
 class FilterTestCase(unittest.TestCase):
   def test_basic(self):
-    self.failUnless([x for x in xfilter(None, [])] == [])
-    self.failUnless([x for x in xfilter(None, [3])] == [3])
-    self.failUnless([x for x in xfilter(None, [None, 3, [], 0, 13])] == [3, 13])
+    self.assertTrue([x for x in xfilter(None, [])] == [])
+    self.assertTrue([x for x in xfilter(None, [3])] == [3])
+    self.assertTrue([x for x in xfilter(None, [None, 3, [], 0, 13])] == [3, 13])
 
   def test_lambda(self):
     def gt_3(x): return x > 3
-    self.failUnless([x for x in xfilter(gt_3, [])] == [])
-    self.failUnless([x for x in xfilter(gt_3, [3])] == [])
-    self.failUnless([x for x in xfilter(gt_3, [4])] == [4])
-    self.failUnless([x for x in xfilter(gt_3, [2, 3, 4, 5, 6, 5, 4, 3, 2])] == [4, 5, 6, 5, 4])
+    self.assertTrue([x for x in xfilter(gt_3, [])] == [])
+    self.assertTrue([x for x in xfilter(gt_3, [3])] == [])
+    self.assertTrue([x for x in xfilter(gt_3, [4])] == [4])
+    self.assertTrue([x for x in xfilter(gt_3, [2, 3, 4, 5, 6, 5, 4, 3, 2])] == [4, 5, 6, 5, 4])
 
 class MapTestCase(unittest.TestCase):
   def test_0_inputs(self):
-    self.failUnless([x for x in xmap()] == [])
-    self.failUnless([x for x in xmap(None, [])] == [])
-    self.failUnless([x for x in xmap(None, [], [])] == [])
-    self.failUnless([x for x in xmap(None, [], [], [])] == [])
+    self.assertTrue([x for x in xmap()] == [])
+    self.assertTrue([x for x in xmap(None, [])] == [])
+    self.assertTrue([x for x in xmap(None, [], [])] == [])
+    self.assertTrue([x for x in xmap(None, [], [], [])] == [])
 
   def test_1_input(self):
     def sqr(x): return x*x
-    self.failUnless([x for x in xmap(sqr, [])] == [])
-    self.failUnless([x for x in xmap(sqr, [3])] == [9])
-    self.failUnless([x for x in xmap(sqr, [3, 1, 2])] == [9, 1, 4])
+    self.assertTrue([x for x in xmap(sqr, [])] == [])
+    self.assertTrue([x for x in xmap(sqr, [3])] == [9])
+    self.assertTrue([x for x in xmap(sqr, [3, 1, 2])] == [9, 1, 4])
 
   def test_2_inputs(self):
     add = operator.add
-    self.failUnless([x for x in xmap(add, [], [])] == [])
-    self.failUnless([x for x in xmap(add, [3], []).set_replace(0)] == [3])
-    self.failUnless([x for x in xmap(add, [], [3]).set_replace(0)] == [3])
-    self.failUnless([x for x in xmap(add, [3], [3])] == [6])
-    self.failUnless([x for x in xmap(add, [3, 1, 2], [3]).set_replace(0)] == [6, 1, 2])
-    self.failUnless([x for x in xmap(add, [3], [3, 1, 2]).set_replace(0)] == [6, 1, 2])
-    self.failUnless([x for x in xmap(add, [6, 6, 1], [1, 2, 1])] == [7, 8, 2])
+    self.assertTrue([x for x in xmap(add, [], [])] == [])
+    self.assertTrue([x for x in xmap(add, [3], []).set_replace(0)] == [3])
+    self.assertTrue([x for x in xmap(add, [], [3]).set_replace(0)] == [3])
+    self.assertTrue([x for x in xmap(add, [3], [3])] == [6])
+    self.assertTrue([x for x in xmap(add, [3, 1, 2], [3]).set_replace(0)] == [6, 1, 2])
+    self.assertTrue([x for x in xmap(add, [3], [3, 1, 2]).set_replace(0)] == [6, 1, 2])
+    self.assertTrue([x for x in xmap(add, [6, 6, 1], [1, 2, 1])] == [7, 8, 2])
 
   def test_n_inputs(self):
-    def add(*inputs): return reduce(operator.add, inputs)
-    self.failUnless([x for x in xmap(add, [])] == [])
-    self.failUnless([x for x in xmap(add, [], [])] == [])
-    self.failUnless([x for x in xmap(add, [], [], [])] == [])
-    self.failUnless([x for x in xmap(add, [3], [3], []).set_replace(0)] == [6])
-    self.failUnless([x for x in xmap(add, [3], [], [3]).set_replace(0)] == [6])
-    self.failUnless([x for x in xmap(add, [], [3], [3]).set_replace(0)] == [6])
-    self.failUnless([x for x in xmap(add, [3, 4, 5], [1, 2, 3], [4, 5, 6])] == [8, 11, 14])
-    self.failUnless([x for x in xmap(add, [1], [2], [3], [4])] == [10])
+    def add(*inputs): return functools.reduce(operator.add, inputs)
+    self.assertTrue([x for x in xmap(add, [])] == [])
+    self.assertTrue([x for x in xmap(add, [], [])] == [])
+    self.assertTrue([x for x in xmap(add, [], [], [])] == [])
+    self.assertTrue([x for x in xmap(add, [3], [3], []).set_replace(0)] == [6])
+    self.assertTrue([x for x in xmap(add, [3], [], [3]).set_replace(0)] == [6])
+    self.assertTrue([x for x in xmap(add, [], [3], [3]).set_replace(0)] == [6])
+    self.assertTrue([x for x in xmap(add, [3, 4, 5], [1, 2, 3], [4, 5, 6])] == [8, 11, 14])
+    self.assertTrue([x for x in xmap(add, [1], [2], [3], [4])] == [10])
 
 class UniqueTestCase(unittest.TestCase):
   def test_all(self):
-    self.failUnless([x for x in xunique([])] == [])
-    self.failUnless([x for x in xunique([3])] == [3])
-    self.failUnless([x for x in xunique([3, 5])] == [3, 5])
-    self.failUnless([x for x in xunique([3, 5, 3])] == [3, 5, 3])
-    self.failUnless([x for x in xunique([3, 3, 5])] == [3, 5])
-    self.failUnless([x for x in xunique([3, 5, 5])] == [3, 5])
-    self.failUnless([x for x in xunique([3, 3, 3, 3, 3, 5, 5, 5, 5, 5, 3, 3])] == [3, 5, 3])
+    self.assertTrue([x for x in xunique([])] == [])
+    self.assertTrue([x for x in xunique([3])] == [3])
+    self.assertTrue([x for x in xunique([3, 5])] == [3, 5])
+    self.assertTrue([x for x in xunique([3, 5, 3])] == [3, 5, 3])
+    self.assertTrue([x for x in xunique([3, 3, 5])] == [3, 5])
+    self.assertTrue([x for x in xunique([3, 5, 5])] == [3, 5])
+    self.assertTrue([x for x in xunique([3, 3, 3, 3, 3, 5, 5, 5, 5, 5, 3, 3])] == [3, 5, 3])
+
+  def test_key(self):
+    calls = []
+    def lower(x):
+      calls.append(x)
+      return x.lower()
+    self.assertTrue([x for x in xunique(['a', 'A', 'b', 'B', 'a'], key = lower)] == ['a', 'b', 'a'])
+    self.assertTrue(calls == ['a', 'A', 'b', 'B', 'a'])
+    self.assertTrue([x for x in xunique([3, -3, 4]).set_key(abs)] == [3, 4])
+    def abs_cmp(x, y): return cmp(abs(x), abs(y))
+    self.assertTrue([x for x in xunique([3, -3, 4], abs_cmp)] == [3, 4])
+    self.assertTrue([x for x in xunique([3, -3, 4], abs_cmp, abs)] == [3, 4])
+    self.assertTrue([x for x in xunique([]).set_input([1, 1])] == [1])
+
+def first_occurrences(data, key = lambda x: x):
+  seen, ret = set(), []
+  for x in data:
+    if key(x) not in seen:
+      seen.add(key(x))
+      ret.append(x)
+  return ret
+
+class GroupbyTestCase(unittest.TestCase):
+  def setUp(self):
+    random.seed(5)
+    self.data = [random.choice('aAbBc') for i in range(3000)]
+
+  def test_counts(self):
+    self.assertTrue([x for x in xgroupby([])] == [])
+    expected = [(next(g), 1 + len(list(g))) for k, g in itertools.groupby(self.data)]
+    self.assertTrue([x for x in xgroupby(self.data)] == expected)
+    self.assertTrue(batched(lambda: xgroupby(self.data), 7) == expected)
+    expected = [(next(g), 1 + len(list(g))) for k, g in itertools.groupby(self.data, str.lower)]
+    self.assertTrue([x for x in xgroupby(self.data, key = str.lower)] == expected)
+    def lower_cmp(x, y): return cmp(x.lower(), y.lower())
+    self.assertTrue([x for x in xgroupby(self.data, lower_cmp)] == expected)
+
+  def test_aggregates(self):
+    data = [(1, 2.5), (1, -1.0), (1, 4.0), (2, 7.0), (1, 0.5)]
+    def run(aggregate):
+      i = xgroupby(data, key = operator.itemgetter(0)).set_aggregate(aggregate)
+      return [x for x in i]
+    second = operator.itemgetter(1)
+    self.assertTrue(run(xcount()) == run(xaggregate()) == [(1, 3), (2, 1), (1, 1)])
+    self.assertTrue(run(xsum(second)) == [(1, 5.5), (2, 7.0), (1, 0.5)])
+    self.assertTrue(run(xmin(second)) == [(1, (1, -1.0)), (2, (2, 7.0)), (1, (1, 0.5))])
+    self.assertTrue(run(xmax(second)) == [(1, (1, 4.0)), (2, (2, 7.0)), (1, (1, 0.5))])
+    self.assertTrue(run(xfirst()) == [(1, data[0]), (2, data[3]), (1, data[4])])
+    self.assertTrue(run(xlast()) == [(1, data[2]), (2, data[3]), (1, data[4])])
+    self.assertTrue(run(xgroup()) == [(1, data[:3]), (2, data[3:4]), (1, data[4:])])
+    # Ties go to the first element
+    self.assertTrue([x for x in xgroupby([1, 1.0, True]).set_aggregate(xmin())] == [(1, 1)])
+    self.assertTrue(type([x for x in xgroupby([1, 1.0]).set_aggregate(xmax())][0][1]) is int)
+
+  def test_repeats(self):
+    # Repeats of one object skip the key function, but are aggregated
+    calls = []
+    def key(x):
+      calls.append(x)
+      return x
+    x, y = 10 ** 20, 10 ** 20 + 1
+    data = [x] * 50 + [y] * 30 + [x] * 3 + [0.5] * 4
+    i = xgroupby(data, key = key).set_aggregate(xsum())
+    self.assertTrue([r for r in i] == [(x, x * 50), (y, y * 30), (x, x * 3), (0.5, 2.0)])
+    self.assertTrue(calls == [x, y, x, 0.5])
+    i = xgroupby(data).set_aggregate(xgroup())
+    self.assertTrue([len(r[1]) for r in i] == [50, 30, 3, 4])
+    self.assertTrue([r for r in xgroupby(data)] == [(x, 50), (y, 30), (x, 3), (0.5, 4)])
+
+class DistinctTestCase(unittest.TestCase):
+  def setUp(self):
+    random.seed(17)
+    self.data = [random.randrange(3000) for i in range(20000)]
+
+  def test_all(self):
+    self.assertTrue([x for x in xdistinct([])] == [])
+    self.assertTrue([x for x in xdistinct([3, 5, 3, 3, 4, 5])] == [3, 5, 4])
+    self.assertTrue([x for x in xdistinct(self.data)] == first_occurrences(self.data))
+
+  def test_key(self):
+    calls = []
+    def lower(x):
+      calls.append(x)
+      return x.lower()
+    self.assertTrue([x for x in xdistinct(['a', 'B', 'A', 'b', 'c'], key = lower)] == ['a', 'B', 'c'])
+    self.assertTrue(calls == ['a', 'B', 'A', 'b', 'c'])
+
+  def test_spill(self):
+    # Whatever the cap, the output is the first occurrences in input order
+    expected = first_occurrences(self.data)
+    tempdir = tempfile.mkdtemp()
+    try:
+      for max_entries in (1, 7, 100, 2999, 3000):
+        i = xdistinct(self.data, max_entries = max_entries).set_tempdir(tempdir)
+        self.assertTrue(batched(lambda: i, 100) == expected, max_entries)
+        self.assertTrue(os.listdir(tempdir) == [])
+    finally:
+      os.rmdir(tempdir)
+    calls = []
+    def mod(x):
+      calls.append(x)
+      return x % 500
+    i = xdistinct(self.data, key = mod, max_entries = 50)
+    self.assertTrue([x for x in i] == first_occurrences(self.data, lambda x: x % 500))
+    self.assertTrue(len(calls) == len(self.data))
+
+  def test_spill_bounds(self):
+    # Each partition deduplicated in memory has at most 'max_entries'
+    #  keys, and at most XSORT_FANIN runs are merged at once
+    leaves, merges = [], []
+    spill, merge_many, fanin = xsorted._xspill, xsorted.xmerge_many, xsorted.XSORT_FANIN
+    def leaf_spill(input, dir):
+      if isinstance(input, list):
+        leaves.append(len(input))
+      return spill(input, dir)
+    def counted_merge_many(*inputs, **settings):
+      merges.append(len(inputs))
+      return merge_many(*inputs, **settings)
+    xsorted._xspill, xsorted.xmerge_many, xsorted.XSORT_FANIN = \
+        leaf_spill, counted_merge_many, 4
+    try:
+      for keys in (list(range(5000)), [str(x) for x in range(5000)],
+                   [x << 32 for x in range(5000)]):
+        data = keys + keys[::-1]
+        for max_entries in (10, 100):
+          del leaves[:], merges[:]
+          result = [x for x in xdistinct(data, max_entries = max_entries)]
+          self.assertTrue(result == keys)
+          self.assertTrue(max(leaves) <= max_entries, (max(leaves), max_entries))
+          self.assertTrue(max(merges) <= 4)
+    finally:
+      xsorted._xspill, xsorted.xmerge_many, xsorted.XSORT_FANIN = spill, merge_many, fanin
+
+  def test_bloom(self):
+    data = list(range(10000))
+    result = [x for x in xdistinct(data + data[::-1], max_entries = 10000).set_bloom(0.01)]
+    # No repeats, and at most about 1% of the keys lost
+    self.assertTrue(result == first_occurrences(result) and result == sorted(result))
+    self.assertTrue(len(result) >= 9900)
+    self.assertRaises(ValueError, xdistinct(data).set_bloom(0.01).next_batch)
+    self.assertRaises(ValueError, xdistinct(data, max_entries = 10).set_bloom(1).next_batch)
+    for bad in (0, -1):
+      self.assertRaises(ValueError, next, xdistinct([1, 1, 2], max_entries = bad))
+      self.assertRaises(ValueError, xdistinct(data, max_entries = bad).set_bloom(0.01).next_batch)
+
+class ProtocolTestCase(unittest.TestCase):
+  def test_next(self):
+    i = xcat([1], [2])
+    self.assertTrue(next(i) == 1)
+    self.assertTrue(i.next() == 2)
+    self.assertRaises(StopIteration, next, i)
+    self.assertRaises(StopIteration, i.next)
+    self.assertRaises(StopIteration, next, i)
+
+  def test_slots(self):
+    # Algorithms keep their state in slots, not in a __dict__
+    for i in (xcat(), xfilter(None, []), xmap(abs), xmap_trim(abs), xunique([]), xdistinct([]),
+              xgroupby([]), xhead([]), xtail([]), xfill([]), xbase.xsingle_buffer([]),
+              xfast.xcat(), xfast.xmap(abs), xfast.xhead([]), xsoundex('a')):
+      self.assertFalse(hasattr(i, '__dict__'), i)
+    # Derived classes that do not declare slots still work
+    class derived (xmap): pass
+    self.assertTrue([x for x in derived(abs, [-1]).set_replace(0)] == [1])
+
+  def test_single_buffer_none(self):
+    # None is an element like any other, not an empty buffer
+    i = xbase.xsingle_buffer([None, 0], key = lambda x: [x])
+    self.assertTrue(i and i.get() is None and i.get_key() == [None])
+    self.assertTrue(i.consume() is None and i.consume() == 0 and not i)
+    i = xbase.xsingle_buffer([None, None, 1])
+    self.assertTrue(i.get() is None and i.consume_batch(2) == [None, None])
+
+def batched(make, n):
+  """Read make() a batch of n at a time, checking the batch sizes."""
+  i = make()
+  ret = []
+  while 1:
+    batch = i.next_batch(n)
+    assert len(batch) <= n
+    ret.extend(batch)
+    if len(batch) < n:
+      assert i.next_batch(n) == []
+      return ret
+
+class BatchTestCase(unittest.TestCase):
+  def assertBatches(self, make):
+    expected = [x for x in make()]
+    for n in (1, 2, 3, 7, 100):
+      result = batched(make, n)
+      self.assertTrue(result == expected, (n, result, expected))
+
+  def test_stages(self):
+    data = [0, 3, -1, 0, 4, 4, -5, 2, 0, 9]
+    self.assertBatches(lambda: xcat())
+    self.assertBatches(lambda: xcat([], data, [], [1, 2], []))
+    self.assertBatches(lambda: xfilter(None, data))
+    self.assertBatches(lambda: xfilter(lambda x: x > 3, data))
+    self.assertBatches(lambda: xmap(abs, data))
+    self.assertBatches(lambda: xmap(operator.add, data, [1, 2, 3]).set_replace(0))
+    self.assertBatches(lambda: xmap(operator.add))
+    self.assertBatches(lambda: xmap_trim(operator.add, data, [1, 2, 3]))
+    self.assertBatches(lambda: xmap_trim(operator.add, [1, 2, 3], data))
+    self.assertBatches(lambda: xunique(data))
+    self.assertBatches(lambda: xfill(data, 13, 0))
+    for bound in (-1, 0, 2, 2.5, 10, 12):
+      self.assertBatches(lambda: xhead(data, bound))
+      self.assertBatches(lambda: xtail(data, bound))
+    self.assertTrue(xmap_trim(lambda: 1).next_batch(3) == [1, 1, 1])
+
+  def test_nested(self):
+    # Each stage reads batches from the stage below it.
+    data = range(1000)
+    make = lambda: xhead(xfilter(None, xmap(operator.mod, xtail(data, 3),
+                                            xcat(iter([7] * 10), [5] * 2000))), 500)
+    self.assertBatches(make)
+
+  def test_mixed(self):
+    i = xcat([1, 2], [3, 4, 5], [6])
+    self.assertTrue(next(i) == 1)
+    self.assertTrue(i.next_batch(2) == [2, 3])
+    self.assertTrue(next(i) == 4)
+    self.assertTrue(i.next_batch(5) == [5, 6])
+    self.assertTrue(i.next_batch(5) == [])
+    self.assertRaises(StopIteration, next, i)
+
+  def test_result(self):
+    self.assertTrue(xbase.xresult(xcat('ab', 'c'), '-') == '-abc')
+    self.assertTrue(xbase.xresult(iter([b'ab', b'c']), b'-') == b'-abc')
+    self.assertTrue(xbase.xresult(xmap(abs, range(-3000, 0)), (0,)) == (0,) + tuple(range(3000, 0, -1)))
+    buf = bytearray(b'a')
+    self.assertTrue(xbase.xresult(b'bc', buf) is buf and buf == b'abc')
+    buf = array.array('d')
+    self.assertTrue(xbase.xresult(xhead(range(5), 3), buf) is buf and list(buf) == [0, 1, 2])
+    self.assertRaises(TypeError, xbase.xresult, [1], '')
+
+  def test_result_buffer(self):
+    buf = bytearray(5)
+    view = xbase.xresult(b'abc', memoryview(buf))
+    self.assertTrue(bytes(view) == b'abc' and buf == b'abc\0\0')
+    buf = array.array('q', [0] * 3000)
+    view = xbase.xresult(xmap(abs, range(-2999, 1)), memoryview(buf))
+    self.assertTrue(len(view) == 3000 and list(buf) == list(range(2999, -1, -1)))
+    # A known length that does not fit is refused before anything is read
+    i = iter([1, 2, 3])
+    self.assertRaises(ValueError, xbase.xresult, i, memoryview(bytearray(2)))
+    self.assertTrue(next(i) == 1)
+    # Otherwise, at most one element too many is read
+    i = xfilter(None, [1, 2, 3, 4])
+    self.assertRaises(ValueError, xbase.xresult, i, memoryview(bytearray(2)))
+    self.assertTrue(next(i) == 4)
+
+  def test_helpers(self):
+    i = iter(range(5))
+    self.assertTrue(xbase.xbatch(i, 3) == [0, 1, 2])
+    self.assertTrue(xbase.xbatch(xfilter(None, i), 3) == [3, 4])
+    self.assertTrue([b for b in xbase.xbatches(xmap(abs, range(5)), 2)] == [[0, 1], [2, 3], [4]])
+    self.assertTrue([b for b in xbase.xbatches([], 2)] == [])
+    self.assertTrue(xbase.xresult(xcat([1], range(2, 3000))) == list(range(1, 3000)))
+    self.assertTrue(xbase.xresult(xcat([2]), [1]) == [1, 2])
+    buf = xbase.xsingle_buffer([1, 2, 3, 4])
+    self.assertTrue(buf.get() == 1)
+    self.assertTrue(buf.consume_batch(3) == [1, 2, 3])
+    self.assertTrue(buf.consume_batch(3) == [4])
+    self.assertTrue(not buf)
+
+class HintTestCase(unittest.TestCase):
+  def assertHints(self, make):
+    # The hint is the exact number of elements left, after any reads
+    for n in (0, 1, 3):
+      i = make()
+      i.next_batch(n)
+      left = len([x for x in make()][n:])
+      self.assertTrue(operator.length_hint(i) == left, (n, operator.length_hint(i), left))
+
+  def test_hints(self):
+    data = [0, 3, -1, 0, 4, 4, -5, 2, 0, 9]
+    self.assertHints(lambda: xcat([], data, [1, 2]))
+    self.assertHints(lambda: xmap(operator.add, data, [1, 2, 3]).set_replace(0))
+    self.assertHints(lambda: xmap_trim(operator.add, data, [1, 2, 3]))
+    self.assertHints(lambda: xfill(data, 13, 0))
+    for bound in (-1, 0, 2, 2.5, 10, 12):
+      self.assertHints(lambda: xhead(data, bound))
+      self.assertHints(lambda: xtail(data, bound))
+    self.assertHints(lambda: xhead(xtail(xmap(abs, xcat(data, range(3000))), 5), 2000))
+
+  def test_unknown(self):
+    gen = lambda: (x for x in range(3))
+    for i in (xcat([1], gen()), xmap(abs, gen()), xhead(gen(), 2),
+              xtail(xfilter(None, [1]), 2), xfill([], 2.5), xmap_trim(abs)):
+      self.assertTrue(operator.length_hint(i, -1) == -1, i)
+    self.assertTrue(operator.length_hint(xmap(abs)) == 0)
+
+  def test_tail_seek(self):
+    class sequence:
+      def __init__(self, n): self.n, self.read = n, []
+      def __len__(self): return self.n
+      def __getitem__(self, index):
+        if not 0 <= index < self.n: raise IndexError(index)
+        self.read.append(index)
+        return index
+    for tail in (xtail, xfast.xtail):
+      s = sequence(10)
+      self.assertTrue([x for x in tail(s, 7)] == [7, 8, 9] and s.read == [7, 8, 9])
+      self.assertTrue([x for x in tail(range(10), 12)] == [])
+    i = xtail(range(10**12), 10**12 - 2)
+    self.assertTrue(i.next_batch(5) == [10**12 - 2, 10**12 - 1])
+    # Builtin sequences are neither sliced (copied) nor indexed
+    class tracked(list):
+      def __getitem__(self, index):
+        self.read.append(index)
+        return list.__getitem__(self, index)
+    s = tracked(range(10))
+    s.read = []
+    self.assertTrue([x for x in xtail(s, 8)] == [8, 9] and s.read == [])
+    self.assertTrue([x for x in xtail('ab\u0100', 1)] == ['b', '\u0100'])
+
+class unsliceable:
+  # A sequence that cannot be sliced
+  def __init__(self, data): self.data = data
+  def __len__(self): return len(self.data)
+  def __getitem__(self, index): return self.data[operator.index(index)]
+
+class CheckpointTestCase(unittest.TestCase):
+  def assertResumes(self, make):
+    expected = [x for x in make()]
+    for n in range(len(expected) + 2):
+      i = make()
+      read = i.next_batch(n)
+      state = pickle.loads(pickle.dumps(i.snapshot()))
+      result = read + [x for x in make().restore(state)]
+      self.assertTrue(result == expected, (n, result, expected))
+
+  def test_stages(self):
+    data = [0, 3, -1, 0, 4, 4, -5, 2, 0, 9]
+    self.assertResumes(lambda: xcat([], data, range(3), [1, 2]))
+    self.assertResumes(lambda: xfilter(None, data))
+    self.assertResumes(lambda: xmap(operator.add, data, (1, 2, 3)).set_replace(0))
+    self.assertResumes(lambda: xmap_trim(operator.add, data, [1, 2, 3]))
+    self.assertResumes(lambda: xunique(data, key = abs))
+    self.assertResumes(lambda: xfill(iter(data), 13, 0))
+    for bound in (0, 2, 2.5, 12):
+      self.assertResumes(lambda: xhead(data, bound))
+      self.assertResumes(lambda: xtail(data, bound))
+      self.assertResumes(lambda: xtail(iter(data), bound))
+      self.assertResumes(lambda: xtail(unsliceable(data), bound))
+
+  def test_files(self):
+    text = b'a\nb\nc\n'
+    self.assertResumes(lambda: xmap(bytes.strip, xtail(io.BytesIO(text), 1)))
+
+  def test_unsupported(self):
+    self.assertRaises(TypeError, xfilter(None, (x for x in [1])).snapshot)
+    self.assertRaises(TypeError, xfast.xhead([1], 1).snapshot)
+    # Only iterators over builtin sequences are taken by index
+    i = itertools.chain([1], [2])
+    self.assertRaises(TypeError, xfilter(None, i).snapshot)
+    self.assertRaises(TypeError, xbase.xrestore, i, 0)
 
 if __name__ == '__main__':
   try:
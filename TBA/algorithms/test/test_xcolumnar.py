@@ -0,0 +1,147 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator, array
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms import xbasic
+from TBA.algorithms.xcolumnar import numpy, xcolumns, xto_columns, xfrom_columns, \
+    xmap, xmap_trim, xfilter, xhead
+
+def rows(input, column = None):
+  return [x for x in xfrom_columns(input, column)]
+
+class ColumnsTestCase(unittest.TestCase):
+  def test_columns(self):
+    b = xcolumns([1, 2, 3], array.array('d', [4, 5, 6]))
+    self.assertTrue(len(b) == 3 and len(xcolumns()) == 0)
+    self.assertTrue(list(b.rows()) == [(1, 4.0), (2, 5.0), (3, 6.0)])
+    self.assertTrue(b.slice(1, 3).columns == ([2, 3], array.array('d', [5, 6])))
+    self.assertTrue(b.compress(iter([0, 1, 1])).columns == ([2, 3], array.array('d', [5, 6])))
+    self.assertRaises(ValueError, xcolumns, [1], [])
+
+  def test_adapters(self):
+    data = list(range(10))
+    i = xto_columns(data, 'abcdefghijkl').set_typecodes('i').set_size(4)
+    batches = [x for x in i]
+    self.assertTrue([len(x) for x in batches] == [4, 4, 2])
+    self.assertTrue(isinstance(batches[0].column(0), array.array))
+    self.assertTrue(isinstance(batches[0].column(1), list))
+    self.assertTrue(rows(batches) == list(zip(data, 'abcdefghij')))
+    self.assertTrue(rows(batches, 1) == list('abcdefghij'))
+    self.assertTrue(rows(xto_columns()) == [])
+    self.assertTrue(rows(xto_columns([])) == [])
+    i = xfrom_columns(xto_columns(data).set_size(3), 0)
+    self.assertTrue(i.next_batch(5) == [0, 1, 2, 3, 4])
+    self.assertTrue(i.next_batch(9) == [5, 6, 7, 8, 9])
+    self.assertTrue(i.next_batch(9) == [])
+
+class AlgorithmTestCase(unittest.TestCase):
+  def test_map(self):
+    a, b = list(range(10)), list(range(100, 107))
+    expected = [x for x in xbasic.xmap(operator.add, a, b).set_replace(0)]
+    for size0, size1 in ((1, 1), (3, 4), (10, 2), (1024, 1024)):
+      i = xmap(operator.add, xto_columns(a).set_size(size0),
+               xto_columns(b).set_size(size1)).set_replace(0)
+      self.assertTrue(rows(i, 0) == expected, (size0, size1))
+    # Two columns of one stream are two arguments
+    self.assertTrue(rows(xmap(operator.sub, xto_columns(a, b)), 0) ==
+                    [x for x in xbasic.xmap_trim(operator.sub, a, b)])
+    # A stream that is done is replaced in every one of its columns
+    i = xmap(lambda x, y, z: (x, y, z), [xcolumns([1])],
+             [xcolumns([2, 3], [4, 5])])
+    self.assertTrue(rows(i, 0) == [(1, 2, 4), (None, 3, 5)])
+    i = xmap(operator.neg, xto_columns([1, 2])).set_typecode('l')
+    self.assertTrue([x.column(0) for x in i] == [array.array('l', [-1, -2])])
+    self.assertTrue(rows(xmap(abs)) == [])
+    # A typed column is padded with a replacement value it cannot hold
+    def pair(x, y): return (x, y)
+    for replace in (0, None, 2.5, 2 ** 80):
+      i = xmap(pair, xto_columns([1, 2]).set_typecodes('i'),
+               xto_columns([5, 7, 11])).set_replace(replace)
+      self.assertTrue(rows(i, 0) == [(1, 5), (2, 7), (replace, 11)], replace)
+
+  def test_empty_width(self):
+    # An empty stream of two columns is padded with two columns
+    def triple(x, y, z): return (x, y, z)
+    for empty in (xto_columns([], []), xfilter(None, xto_columns([0], [1])),
+                  xhead(xto_columns('ab', 'cd'), 0), [xcolumns([], [])]):
+      i = xmap(triple, empty, xto_columns([7, 8]))
+      self.assertTrue(rows(i, 0) == [(None, None, 7), (None, None, 8)], empty)
+    self.assertTrue(xto_columns([], [], []).width() == 3)
+    self.assertTrue(xmap(triple).width() == 1 and xfilter(None, []).width() is None)
+    # A stream with no batches and no width() cannot be padded
+    self.assertRaises(ValueError, next, xmap(abs, [], xto_columns([1])))
+    self.assertTrue(rows(xmap_trim(triple, [], xto_columns([1]))) == [])
+
+  def test_map_trim(self):
+    a, b = list(range(10)), list(range(100, 107))
+    expected = [x for x in xbasic.xmap_trim(operator.add, a, b)]
+    for size0, size1 in ((1, 1), (3, 4), (10, 2)):
+      i = xmap_trim(operator.add, xto_columns(a).set_size(size0),
+                    xto_columns(b).set_size(size1))
+      self.assertTrue(rows(i, 0) == expected, (size0, size1))
+    # No batch is longer than the current batch of any input
+    i = xmap_trim(operator.add, xto_columns(a).set_size(3), xto_columns(b).set_size(4))
+    self.assertTrue([len(x) for x in i] == [3, 1, 2, 1])
+
+  def test_filter(self):
+    data = xto_columns([1, 0, 3, 0, 5, 6], 'abcdef').set_size(2)
+    self.assertTrue(rows(xfilter(None, data)) ==
+                    [(1, 'a'), (3, 'c'), (5, 'e'), (6, 'f')])
+    # Batches with no rows left are not output
+    data = xto_columns([1, 3, 2, 4, 5]).set_typecodes('i').set_size(2)
+    i = xfilter(lambda x: x % 2, data)
+    self.assertTrue([x.column(0) for x in i] == [array.array('i', [1, 3]),
+                                                 array.array('i', [5])])
+
+  def test_head(self):
+    read = []
+    def source():
+      for x in range(10):
+        read.append(x)
+        yield x
+    i = xhead(xto_columns(source()).set_size(3), 4.5)
+    self.assertTrue(rows(i, 0) == [0, 1, 2, 3, 4])
+    self.assertTrue(len(read) == 6)
+    self.assertTrue(rows(xhead(xto_columns(range(3)), 9), 0) == [0, 1, 2])
+    self.assertTrue(rows(xhead(xto_columns(range(3)), 0), 0) == [])
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class NumPyTestCase(unittest.TestCase):
+  def test_vectorized(self):
+    a, b = list(range(10)), [x * 0.5 for x in range(10)]
+    data = xto_columns(a, b).set_typecodes('i8', 'f8').set_numpy(1).set_size(4)
+    i = xmap(numpy.multiply, data).set_vectorized(1)
+    expected = [x * y for x, y in zip(a, b)]
+    result = rows(i, 0)
+    self.assertTrue(result == expected and type(result[0]) is float)
+    data = xto_columns(a, b).set_numpy(1).set_size(4)
+    i = xfilter(lambda x, y: x % 3 == 0, data).set_vectorized(1)
+    self.assertTrue(rows(i) == [(0, 0.0), (3, 1.5), (6, 3.0), (9, 4.5)])
+    # Streams of arrays are lined up and padded as lists are
+    i = xmap(operator.add, xto_columns(a).set_numpy(1).set_size(3),
+             xto_columns(b[:7]).set_numpy(1).set_size(5)).set_replace(0)
+    self.assertTrue(rows(i, 0) == [x for x in xbasic.xmap(operator.add, a, b[:7])
+                                   .set_replace(0)])
+    # ... keeping their dtype if the replacement value fits it
+    def pair(x, y): return (x, y)
+    for replace in (0, None, 2.5, float('nan')):
+      i = xmap(pair, xto_columns([1, 2]).set_typecodes('i8').set_numpy(1),
+               xto_columns([5, 7, 11])).set_replace(replace)
+      result = rows(i, 0)
+      self.assertTrue(result[:2] == [(1, 5), (2, 7)] and result[2][1] == 11)
+      self.assertTrue(result[2][0] is replace or result[2][0] == replace)
+    def first(x, y): return x
+    i = xmap(first, xto_columns([1.5, 2.5]).set_typecodes('f8').set_numpy(1),
+             xto_columns([5, 7, 11])).set_replace(float('nan')).set_vectorized(1)
+    self.assertTrue([x.column(0).dtype for x in i] == [numpy.dtype('f8')])
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
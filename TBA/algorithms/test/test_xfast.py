@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms.xcompatibility import cmp
+from TBA.algorithms import xbasic, xfast
+
+def both(name, *args):
+  """Return the outputs of the xbasic and xfast classes called 'name'."""
+  return ([x for x in getattr(xbasic, name)(*args)],
+          [x for x in getattr(xfast, name)(*args)])
+
+class SameOutputTestCase(unittest.TestCase):
+  def assertSame(self, name, *args):
+    slow, fast = both(name, *args)
+    self.assertTrue(slow == fast, (name, args, slow, fast))
+
+  def test_cat(self):
+    self.assertSame('xcat')
+    self.assertSame('xcat', [])
+    self.assertSame('xcat', [1, 4, 7], [], [2, 5, 8])
+
+  def test_filter(self):
+    self.assertSame('xfilter', None, [None, 3, [], 0, 13])
+    self.assertSame('xfilter', lambda x: x > 3, [2, 3, 4, 5, 6, 5, 4, 3, 2])
+
+  def test_map(self):
+    self.assertSame('xmap')
+    self.assertSame('xmap', abs, [3, 0, -2, -1])
+    self.assertSame('xmap', operator.add, [6, 6, 1], [1, 2, 1])
+    slow = [x for x in xbasic.xmap(operator.add, [3, 1, 2], [3]).set_replace(0)]
+    fast = [x for x in xfast.xmap(operator.add, [3, 1, 2], [3]).set_replace(0)]
+    self.assertTrue(slow == fast == [6, 1, 2])
+
+  def test_map_trim(self):
+    self.assertSame('xmap_trim', abs, [3, 0, -2, -1])
+    self.assertSame('xmap_trim', operator.mul, [2, 3], [5, 7, 11])
+    self.assertTrue([x for x in xfast.xhead(xfast.xmap_trim(lambda: 1), 3)] == [1, 1, 1])
+
+  def test_unique(self):
+    self.assertSame('xunique', [3, 3, 3, 5, 5, 3, 3])
+    def lower_cmp(x, y): return cmp(x.lower(), y.lower())
+    self.assertSame('xunique', ['a', 'A', 'b', 'a'], lower_cmp)
+    self.assertSame('xunique', ['a', 'A', 'b', 'a'], cmp, str.lower)
+    a, b = [], []
+    result = [x for x in xfast.xunique([a, b])]
+    self.assertTrue(result == [[]] and result[0] is a)
+
+  def test_head_tail_fill(self):
+    for bound in (-1, 0, 2, 2.5, 4, 9):
+      self.assertSame('xhead', [1, 1, 2, 3], bound)
+      self.assertSame('xtail', [1, 1, 2, 3], bound)
+      self.assertSame('xfill', [1, 1, 2, 3], bound, 0)
+
+  def test_builders(self):
+    i = xfast.xfilter().set_func(None).set_input([0, 1, 2])
+    self.assertTrue([x for x in i] == [1, 2])
+    i = xfast.xfill().set_input('ab').set_bound(4).set_fill('0')
+    self.assertTrue(''.join(i) == 'ab00')
+    i = xfast.xmap().set_func(operator.add).set_inputs([1], [2, 3]).set_replace(10)
+    self.assertTrue([x for x in i] == [3, 13])
+
+  def test_next(self):
+    i = xfast.xcat([1], [2])
+    self.assertTrue(next(i) == 1)
+    self.assertTrue([x for x in i] == [2])
+    self.assertRaises(StopIteration, next, i)
+
+  def test_pipeline(self):
+    # The pipeline xsoundex builds, made of compiled stages.
+    source = xfast.xcat('R-', xfast.xtail('1355', 1))
+    self.assertTrue(''.join(xfast.xhead(xfast.xfill(source, 5, '0'), 5)) == 'R-355')
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
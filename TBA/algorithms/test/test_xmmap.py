@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, struct, tempfile, pickle
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms import xbasic, xsorted
+from TBA.algorithms.xmmap import xmmap_lines, xmmap_records
+
+class MmapTestCase(unittest.TestCase):
+  def setUp(self):
+    self.paths = []
+
+  def tearDown(self):
+    for x in self.paths:
+      os.remove(x)
+
+  def file(self, data):
+    fd, path = tempfile.mkstemp()
+    os.write(fd, data)
+    os.close(fd)
+    self.paths.append(path)
+    return path
+
+class LinesTestCase(MmapTestCase):
+  def lines(self, data):
+    i = xmmap_lines(self.file(data))
+    ret = [bytes(x) for x in i]
+    i.close()
+    return ret
+
+  def test_lines(self):
+    for data in (b'', b'\n', b'a', b'a\n', b'a\nbc', b'a\n\nbc\n'):
+      self.assertTrue(self.lines(data) == data.splitlines(True), data)
+
+  def test_sorted(self):
+    i = xmmap_lines(self.file(b'a\nc\nd\n'))
+    result = [bytes(x) for x in xsorted.xset_intersection(i, [b'c\n', b'd\n']).set_key(bytes)]
+    self.assertTrue(result == [b'c\n', b'd\n'])
+    i.close()
+
+class RecordsTestCase(MmapTestCase):
+  def test_records(self):
+    path = self.file(struct.pack('<4h', 1, -2, 3, 4))
+    r = xmmap_records(path, '<h')
+    self.assertTrue(len(r) == 4)
+    self.assertTrue(r[0] == (1,) and r[1] == (-2,) and r[-1] == (4,))
+    self.assertRaises(IndexError, r.__getitem__, 4)
+    self.assertRaises(IndexError, r.__getitem__, -5)
+    self.assertTrue([x for x in r] == [(1,), (-2,), (3,), (4,)])
+    r = xmmap_records(path, '<2h')
+    self.assertTrue([x for x in r] == [(1, -2), (3, 4)])
+    self.assertTrue([x for x in xmmap_records(self.file(b''), '<h')] == [])
+
+  def test_raw(self):
+    r = xmmap_records(self.file(b'abcdef'), '2s').set_raw(1)
+    self.assertTrue(bytes(r[1]) == b'cd')
+    self.assertTrue([bytes(x) for x in r] == [b'ab', b'cd', b'ef'])
+
+  def test_bad_size(self):
+    r = xmmap_records(self.file(b'abc'), '<h')
+    self.assertRaises(ValueError, len, r)
+
+  def test_sorted_sequence(self):
+    # xsorted searches the records by bisection, through __getitem__
+    data = list(range(0, 3000, 3))
+    r = xmmap_records(self.file(struct.pack('<%dq' % len(data), *data)), '<q')
+    probes = [(-1,), (3,), (4,), (2997,), (3000,)]
+    result = [x for x in xsorted.xset_intersection(probes, r)]
+    self.assertTrue(result == [(3,), (2997,)])
+    r.close()
+
+class CheckpointTestCase(MmapTestCase):
+  def resumed(self, make, n):
+    i = make()
+    ret = [bytes(x) for x in i.next_batch(n)]
+    state = pickle.loads(pickle.dumps(i.snapshot()))
+    i = make().restore(state)
+    return ret + [bytes(x) for x in i]
+
+  def assertResumes(self, make, expected):
+    for n in range(len(expected) + 2):
+      self.assertTrue(self.resumed(make, n) == expected, n)
+
+  def test_lines(self):
+    path = self.file(b'a\nbc\n\nd')
+    self.assertResumes(lambda: xmmap_lines(path), [b'a\n', b'bc\n', b'\n', b'd'])
+
+  def test_records(self):
+    path = self.file(struct.pack('<4h', 1, -2, 3, 4))
+    self.assertResumes(lambda: xmmap_records(path, '<2s').set_raw(1),
+                       [b'\x01\x00', b'\xfe\xff', b'\x03\x00', b'\x04\x00'])
+    i = xmmap_records(path, '<h')
+    self.assertTrue(next(i) == (1,) and next(i) == (-2,))
+    self.assertTrue([x for x in xmmap_records(path, '<h').restore(i.snapshot())] == [(3,), (4,)])
+    # xtail reads a source by index past the records it skips
+    self.assertResumes(lambda: xbasic.xtail(xmmap_records(path, '<2s').set_raw(1), 1),
+                       [b'\xfe\xff', b'\x03\x00', b'\x04\x00'])
+
+  def test_merge(self):
+    # The state of a merge holds the offset of the next line of each file
+    a, b = self.file(b'a\nc\ne\n'), self.file(b'b\nd\n')
+    make = lambda: xsorted.xmerge(xmmap_lines(a), xmmap_lines(b)).set_key(bytes)
+    self.assertResumes(make, [b'a\n', b'b\n', b'c\n', b'd\n', b'e\n'])
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator, random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms.xcompatibility import cmp
+from TBA.algorithms import xnumpy, xsorted
+from TBA.algorithms.xnumpy import numpy
+
+class FallbackTestCase(unittest.TestCase):
+  # Without arrays (or without NumPy), the pure-Python algorithms run.
+  def test_map_filter(self):
+    self.assertTrue([x for x in xnumpy.xmap(abs, [3, 0, -2])] == [3, 0, 2])
+    self.assertTrue([x for x in xnumpy.xmap(operator.add, [1], [2, 3]).set_replace(0)] == [3, 3])
+    self.assertTrue([x for x in xnumpy.xfilter(None, [0, 2, 0, 4])] == [2, 4])
+
+  def test_sets(self):
+    for name in ('xset_union', 'xset_intersection', 'xset_difference',
+                 'xset_symmetric_difference'):
+      expected = [x for x in getattr(xsorted, name)([1, 4, 6], [2, 4])]
+      self.assertTrue([x for x in getattr(xnumpy, name)([1, 4, 6], [2, 4])] == expected)
+    result = [x for x in xnumpy.xset_union(['b', 'C'], ['A', 'c'], key = str.lower)]
+    self.assertTrue(result == ['A', 'b', 'C'])
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class VectorTestCase(unittest.TestCase):
+  def test_map(self):
+    a, b = numpy.array([1, 2, 3]), numpy.array([10, 20])
+    i = xnumpy.xmap(numpy.negative, a)
+    self.assertTrue(i.vector() is not None)
+    self.assertTrue([x for x in i] == [-1, -2, -3])
+    i = xnumpy.xmap(numpy.add, a, b).set_replace(0)
+    self.assertTrue(i.array().tolist() == [11, 22, 3])
+    # Not a ufunc, or unequal lengths with no replacement: falls back
+    self.assertTrue(xnumpy.xmap(abs, a).vector() is None)
+    self.assertTrue(xnumpy.xmap(numpy.add, a, b).vector() is None)
+    self.assertTrue(xnumpy.xmap(lambda x: x * 2, a).set_vectorized(1).array().tolist() == [2, 4, 6])
+    self.assertRaises(ValueError, xnumpy.xmap(numpy.sum, a).set_vectorized(1).vector)
+
+  def test_padding(self):
+    # A replacement value the dtype cannot hold would promote the arrays,
+    #  so the output is computed as xfast.xmap computes it on lists
+    a, b = numpy.array([2**53 + 1, 3]), numpy.array([1])
+    for replace in (0.5, 2**70, 'x'):
+      i = xnumpy.xmap(numpy.add, a, b).set_replace(replace)
+      self.assertTrue(i.vector() is None)
+    i = xnumpy.xmap(numpy.add, a, b).set_replace(0.5)
+    self.assertTrue([x for x in i] == [2**53 + 2, 3.5])
+    self.assertTrue([x for x in i.scalar()] == [2**53 + 2, 3.5])
+    i = xnumpy.xmap(numpy.add, a, b).set_replace(0)
+    self.assertTrue(i.vector().dtype == a.dtype)
+    self.assertTrue([x for x in i] == [2**53 + 2, 3])
+
+  def test_element_types(self):
+    # Vectorized or not, arrays give NumPy scalars
+    a, b = numpy.array([3, -1, 2]), numpy.array([0.5, 1.5])
+    for i in (xnumpy.xmap(numpy.negative, a), xnumpy.xmap(operator.neg, a),
+              xnumpy.xfilter(None, a), xnumpy.xfilter(bool, a),
+              xnumpy.xset_union(numpy.sort(a), a[:1]),
+              xnumpy.xset_union(numpy.sort(a), a[:1], key = abs)):
+      self.assertTrue([type(x) for x in i] == [a.dtype.type] * 3, i)
+    for i in (xnumpy.xset_intersection(b, b), xnumpy.xset_intersection(b, b, key = abs)):
+      self.assertTrue([type(x) for x in i] == [b.dtype.type] * 2, i)
+
+  def test_filter(self):
+    a = numpy.array([0, 3, -1, 0, 4])
+    self.assertTrue([x for x in xnumpy.xfilter(None, a)] == [3, -1, 4])
+    self.assertTrue(xnumpy.xfilter(numpy.signbit, a).array().tolist() == [-1])
+    self.assertTrue(xnumpy.xfilter(lambda x: x > 0, a).vector() is None)
+    self.assertTrue(xnumpy.xfilter(lambda x: x > 0, a).set_vectorized(1).array().tolist() == [3, 4])
+
+  def test_sets(self):
+    rand = random.Random(1)
+    for i in range(200):
+      x = sorted(rand.sample(range(50), rand.randint(0, 30)))
+      y = sorted(rand.sample(range(50), rand.randint(0, 30)))
+      for name in ('xset_union', 'xset_intersection', 'xset_difference',
+                   'xset_symmetric_difference'):
+        i = getattr(xnumpy, name)(numpy.array(x, int), numpy.array(y, int))
+        self.assertTrue(i.vector() is not None)
+        expected = [z for z in getattr(xsorted, name)(x, y)]
+        self.assertTrue([z for z in i] == expected, (name, x, y))
+
+  def test_dtypes(self):
+    # Mixed dtypes: falls back, so no element is promoted
+    a, b = numpy.array([1, 3, 5], numpy.int32), numpy.array([2.5, 3.0])
+    for name in ('xset_union', 'xset_intersection', 'xset_difference',
+                 'xset_symmetric_difference'):
+      i = getattr(xnumpy, name)(a, b)
+      self.assertTrue(i.vector() is None)
+      expected = [x for x in getattr(xsorted, name)(a, b)]
+      result = [x for x in getattr(xnumpy, name)(a, b)]
+      self.assertTrue(result == expected)
+      self.assertTrue([x.dtype for x in result] == [x.dtype for x in expected])
+    result = [x for x in xnumpy.xset_union(a, b)]
+    self.assertTrue(result == [1, 2.5, 3, 5])
+    self.assertTrue(result[0].dtype == numpy.int32 and result[2].dtype == numpy.int32)
+    # A comparision object, a key, or non-numeric arrays: falls back
+    def rcmp(x, y): return cmp(y, x)
+    self.assertTrue(xnumpy.xset_union(a[::-1], a[::-1], rcmp).vector() is None)
+    self.assertTrue([x for x in xnumpy.xset_union(a[::-1], a[::-1], rcmp)] == [5, 3, 1])
+    self.assertTrue(xnumpy.xset_union(a, b, key = abs).vector() is None)
+    self.assertTrue(xnumpy.xset_union(numpy.array(['a']), numpy.array(['b'])).vector() is None)
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
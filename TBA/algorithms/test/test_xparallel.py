@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator, threading, concurrent.futures, gc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms.xbasic import xmap, xhead
+from TBA.algorithms.xparallel import xmap_parallel, xmap_trim_parallel
+
+def inverse(x): return 1 / x
+
+class MapParallelTestCase(unittest.TestCase):
+  def test_same_output(self):
+    self.assertTrue([x for x in xmap_parallel(abs)] == [])
+    self.assertTrue([x for x in xmap_parallel(abs, [])] == [])
+    data = list(range(-50, 50))
+    self.assertTrue([x for x in xmap_parallel(abs, data, workers = 4)] ==
+                    [x for x in xmap(abs, data)])
+    self.assertTrue([x for x in xmap_parallel(operator.add, [1, 2, 3], [4, 5])
+                                 .set_replace(10)] == [5, 7, 13])
+    self.assertTrue([x for x in xmap_trim_parallel(operator.add, [1, 2, 3], [4, 5])] == [5, 7])
+    self.assertTrue([x for x in xhead(xmap_trim_parallel(lambda: 1), 3)] == [1, 1, 1])
+
+  def test_exception_position(self):
+    i = xmap_parallel(inverse, [1, 2, 0, 4], workers = 2)
+    self.assertTrue(next(i) == 1)
+    self.assertTrue(next(i) == 0.5)
+    self.assertRaises(ZeroDivisionError, next, i)
+    self.assertTrue(next(i) == 0.25)
+    self.assertRaises(StopIteration, next, i)
+    self.assertRaises(StopIteration, next, i)
+
+  def test_max_inflight(self):
+    read = []
+    def source():
+      for x in range(100):
+        read.append(x)
+        yield x
+    i = xmap_parallel(abs, source(), workers = 2, max_inflight = 3)
+    for expected in range(10):
+      self.assertTrue(next(i) == expected)
+      self.assertTrue(len(read) <= expected + 3)
+    i.close()
+    self.assertRaises(StopIteration, next, i)
+    for bad in (0, -1):
+      self.assertRaises(ValueError, xmap_parallel, abs, [-1], max_inflight = bad)
+      self.assertRaises(ValueError, xmap_trim_parallel(abs, [-1]).set_max_inflight, bad)
+    self.assertTrue([x for x in xmap_parallel(abs, [-1, -2], max_inflight = 1)] == [1, 2])
+
+  def test_unordered(self):
+    gate = threading.Event()
+    def slow_first(x):
+      if x == 0:
+        gate.wait(5)
+      return x
+    i = xmap_parallel(slow_first, [0, 1], workers = 2, ordered = 0)
+    self.assertTrue(next(i) == 1)
+    gate.set()
+    self.assertTrue([x for x in i] == [0])
+    i = xmap_parallel(abs, range(-20, 0), workers = 3).set_ordered(0)
+    self.assertTrue(sorted([x for x in i]) == list(range(1, 21)))
+
+  def test_executors(self):
+    self.assertTrue([x for x in xmap_parallel(abs, [-1, -2], executor = 'process',
+                                              workers = 2)] == [1, 2])
+    pool = concurrent.futures.ThreadPoolExecutor(2)
+    try:
+      self.assertTrue([x for x in xmap_parallel(abs, [-3], executor = pool)] == [3])
+      # A pool that was passed in is left running
+      self.assertTrue(pool.submit(abs, -4).result() == 4)
+    finally:
+      pool.shutdown()
+    self.assertRaises(ValueError, next, xmap_parallel(abs, [1], executor = 'bogus'))
+
+  def test_close(self):
+    threads = set()
+    def record(x):
+      threads.add(threading.current_thread())
+      return x
+    # Leaving a with statement early shuts down the pool
+    with xmap_parallel(record, range(1000), workers = 2) as i:
+      self.assertTrue(next(i) == 0)
+    self.assertRaises(StopIteration, next, i)
+    for x in threads:
+      x.join(5)
+      self.assertTrue(not x.is_alive())
+    # As does garbage collection of an abandoned algorithm
+    threads.clear()
+    i = xmap_trim_parallel(record, range(1000), workers = 2)
+    self.assertTrue(next(i) == 0)
+    del i
+    gc.collect()
+    for x in threads:
+      x.join(5)
+      self.assertTrue(not x.is_alive())
+    # ... and after an exception
+    with xmap_parallel(inverse, [0, 1, 2], workers = 2) as i:
+      self.assertRaises(ZeroDivisionError, next, i)
+    self.assertRaises(StopIteration, next, i)
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator, random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms import xfast
+from TBA.algorithms.xbasic import xcat, xfilter, xmap, xmap_trim, xunique, \
+    xhead, xtail, xfill
+from TBA.algorithms.xsorted import xmerge
+from TBA.algorithms.xpipeline import xpipeline
+
+def odd(x): return x % 2
+def dec(x): return x - 1
+
+def build(recipe, data):
+  """Build a pipeline of xbasic stages from a list of stage recipes."""
+  ret = data
+  for name, arg in recipe:
+    if name == 'xfilter':
+      ret = xfilter(arg, ret)
+    elif name == 'xmap':
+      ret = xmap(arg, ret)
+    elif name == 'xunique':
+      ret = xunique(ret)
+    elif name == 'xfill':
+      ret = xfill(ret, arg, -1)
+    elif name == 'xcat':
+      ret = xcat(arg, ret)
+    else:
+      ret = {'xhead': xhead, 'xtail': xtail}[name](ret, arg)
+  return ret
+
+class PlanTestCase(unittest.TestCase):
+  def test_loop(self):
+    p = xpipeline(xmap(abs, xfilter(None, xmap(dec, [1, 0, 2, -3]))))
+    self.assertTrue(p.plan() == 'loop(map, filter, map) <- xmap, xfilter, xmap\n'
+                                '  list_iterator')
+    self.assertTrue([x for x in p] == [1, 1, 4])
+
+  def test_slice(self):
+    p = xpipeline(xtail(xhead(xtail(range(10), 2), 5), 1))
+    self.assertTrue(p.plan() == 'islice(3, 7) <- xtail, xhead, xtail\n'
+                                '  range_iterator')
+    self.assertTrue([x for x in p] == [3, 4, 5, 6])
+    p = xpipeline(xtail(xhead(range(10), 2), 5))
+    self.assertTrue([x for x in p] == [])
+
+  def test_soundex_shape(self):
+    codes = iter('1355')
+    p = xpipeline(xhead(xfill(xcat('R-', xtail(codes, 1)), 5, '0'), 5))
+    leaf = type(codes).__name__
+    self.assertTrue(p.plan() == 'islice(0, 5) <- xhead\n'
+                                "  pad('0') <- xfill\n"
+                                '    chain <- xcat\n'
+                                '      %s\n'
+                                '      islice(1, None) <- xtail\n'
+                                '        %s' % (leaf, leaf))
+    self.assertTrue(''.join(p) == 'R-355')
+
+  def test_unfusable(self):
+    p = xpipeline(xmap(dec, xmerge([1, 3], [2])))
+    self.assertTrue(p.plan() == 'map <- xmap\n  xmerge')
+    self.assertTrue([x for x in p] == [0, 1, 2])
+
+  def test_multi_input(self):
+    p = xpipeline(xmap(operator.add, xcat([1], xcat([2], [3])), [10]).set_replace(0))
+    self.assertTrue(p.plan().split('\n')[:2] == ['starmap(zip_longest) <- xmap',
+                                                 '  chain <- xcat, xcat'])
+    self.assertTrue([x for x in p] == [11, 2, 3])
+    p = xpipeline(xmap_trim(operator.mul, [2, 3], [5, 7, 11]))
+    self.assertTrue([x for x in p] == [10, 21])
+
+  def test_xfast_stages(self):
+    p = xpipeline(xfast.xhead(xfast.xfilter(odd, range(100)), 3))
+    self.assertTrue(p.plan() == 'islice(0, 3) <- xhead\n'
+                                '  filter <- xfilter\n'
+                                '    range')
+    self.assertTrue([x for x in p] == [1, 3, 5])
+
+class RandomTestCase(unittest.TestCase):
+  def test_same_output(self):
+    rand = random.Random(1)
+    stages = [('xfilter', None), ('xfilter', odd), ('xmap', dec), ('xunique', None),
+              ('xhead', 0), ('xhead', 3), ('xhead', 8), ('xtail', 0), ('xtail', 2),
+              ('xfill', 6), ('xcat', [7, 7, 8])]
+    for i in range(300):
+      recipe = [rand.choice(stages) for j in range(rand.randint(1, 6))]
+      data = [rand.randint(-3, 3) for j in range(rand.randint(0, 12))]
+      slow = [x for x in build(recipe, data)]
+      fast = [x for x in xpipeline(build(recipe, data))]
+      self.assertTrue(slow == fast, (recipe, data, slow, fast))
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+import unittest, sys, os, os.path, operator
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
+
+from TBA.algorithms.xcompatibility import cmp
+from TBA.algorithms.xbasic import xcat, xfilter, xmap, xhead
+from TBA.algorithms.xsorted import xmerge, xset_intersection
+from TBA.algorithms.xpipeline import xpipeline
+from TBA.algorithms.xprofile import xprofile
+
+def counts(stats):
+  """Flatten a stats tree into (depth, name, in, out, calls) tuples."""
+  ret = []
+  def walk(stats, depth):
+    name, c, inputs = stats
+    ret.append((depth, name, c['in'], c['out'], c['calls']))
+    for x in inputs:
+      walk(x, depth + 1)
+  walk(stats, 0)
+  return ret
+
+class ProfileTestCase(unittest.TestCase):
+  def test_linear(self):
+    p = xprofile(xhead(xmap(abs, xfilter(None, [0, -1, 2, 0, -3, 4])), 2))
+    self.assertTrue([x for x in p] == [1, 2])
+    self.assertTrue(counts(p.stats()) == [(0, 'xhead', 2, 2, 0),
+                                          (1, 'xmap', 2, 2, 2),
+                                          (2, 'xfilter', 3, 2, 0),
+                                          (3, 'list_iterator', None, 3, 0)])
+
+  def test_batches(self):
+    data = list(range(-2000, 2000))
+    p = xprofile(xmap(abs, xcat(data, [5])))
+    self.assertTrue(p.next_batch(5000) == [abs(x) for x in data] + [5])
+    self.assertTrue(p.next_batch() == [])
+    self.assertTrue(counts(p.stats())[:2] == [(0, 'xmap', 4001, 4001, 4001),
+                                              (1, 'xcat', 4001, 4001, 0)])
+
+  def test_sorted(self):
+    # Comparisions are counted, and selectivity reported, for xset_*
+    comp = lambda x, y: cmp(x, y)
+    p = xprofile(xset_intersection(range(0, 30, 2), range(0, 30, 3), comp = comp))
+    self.assertTrue([x for x in p] == [0, 6, 12, 18, 24])
+    (depth, name, read, out, calls), a, b = counts(p.stats())
+    self.assertTrue(name == 'xset_intersection' and out == 5 and read == a[3] + b[3])
+    self.assertTrue(calls > 0)
+    self.assertTrue(p.report().splitlines()[0].startswith(
+        'xset_intersection: in %d, out 5 (%.1f%%), calls %d, time ' % (read, 500.0 / read, calls)))
+    p = xprofile(xmerge([3, 1], xfilter(None, [2, 0])).set_key(operator.neg))
+    self.assertTrue([x for x in p] == [3, 2, 1])
+    self.assertTrue(counts(p.stats())[0] == (0, 'xmerge', 3, 3, 3))
+
+  def test_times(self):
+    p = xprofile(xmap(abs, xfilter(None, range(-100, 100))))
+    [x for x in p]
+    name, c, inputs = p.stats()
+    self.assertTrue(c['time'] >= inputs[0][1]['time'] >= 0)
+    self.assertTrue(abs(c['self_time'] - (c['time'] - inputs[0][1]['time'])) < 1e-9)
+
+  def test_opaque(self):
+    # A stage without input setters is profiled as a whole
+    p = xprofile(xpipeline(xmap(abs, [-1, 2])))
+    self.assertTrue([x for x in p] == [1, 2])
+    self.assertTrue(counts(p.stats()) == [(0, 'xpipeline', None, 2, 0)])
+    self.assertTrue([x for x in xprofile([3, 4])] == [3, 4])
+
+if __name__ == '__main__':
+  try:
+    unittest.main()
+  except SystemExit:
+    pass
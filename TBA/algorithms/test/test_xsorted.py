@@ -4,95 +4,419 @@
 # All rights reserved.
 # See the file 'COPYRIGHT' for copyright and disclaimer information
 
-import unittest, sys, os, os.path
-sys.path.insert(0, os.path.join(*tuple([os.pardir] * 3)))
+import unittest, sys, os, os.path, operator, random, tempfile, io, pickle
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), *tuple([os.pardir] * 3)))
 
-from TBA.algorithms.xsorted import xmerge, xset_union, xset_intersection, \
-    xset_difference, xset_symmetric_difference
+from TBA.algorithms.xcompatibility import cmp
+from TBA.algorithms.xsorted import xmerge, xmerge_many, xset_union, xset_intersection, \
+    xset_difference, xset_symmetric_difference, xset_union_many, \
+    xset_intersection_many, xset_difference_many, xset_symmetric_difference_many, \
+    xsort, xjoin
+from TBA.algorithms import xsorted
 
 class MergeTestCase(unittest.TestCase):
   def test_all(self):
-    self.failUnless([x for x in xmerge([], [])] == [])
-    self.failUnless([x for x in xmerge([3], [])] == [3])
-    self.failUnless([x for x in xmerge([], [3])] == [3])
-    self.failUnless([x for x in xmerge([3], [3])] == [3, 3])
-    self.failUnless([x for x in xmerge([2, 4], [1, 3, 5, 7])] == [1, 2, 3, 4, 5, 7])
-    self.failUnless([x for x in xmerge([2, 4], [3, 5, 7])] == [2, 3, 4, 5, 7])
-    self.failUnless([x for x in xmerge([1, 3, 5, 7], [2, 4])] == [1, 2, 3, 4, 5, 7])
-    self.failUnless([x for x in xmerge([3, 5, 7], [2, 4])] == [2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xmerge([], [])] == [])
+    self.assertTrue([x for x in xmerge([3], [])] == [3])
+    self.assertTrue([x for x in xmerge([], [3])] == [3])
+    self.assertTrue([x for x in xmerge([3], [3])] == [3, 3])
+    self.assertTrue([x for x in xmerge([2, 4], [1, 3, 5, 7])] == [1, 2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xmerge([2, 4], [3, 5, 7])] == [2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xmerge([1, 3, 5, 7], [2, 4])] == [1, 2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xmerge([3, 5, 7], [2, 4])] == [2, 3, 4, 5, 7])
     a, b = [], []
     result = [x for x in xmerge([a], [b])]
-    self.failUnless(result == [[], []])
-    self.failUnless(result[0] is a)
-    self.failUnless(result[1] is b)
+    self.assertTrue(result == [[], []])
+    self.assertTrue(result[0] is a)
+    self.assertTrue(result[1] is b)
+
+class KeyTestCase(unittest.TestCase):
+  def test_key_called_once(self):
+    for algorithm in (xmerge, xset_union, xset_intersection, xset_difference,
+                      xset_symmetric_difference):
+      calls = []
+      def lower(x):
+        calls.append(x)
+        return x.lower()
+      input0, input1 = ['a', 'C', 'd'], ['B', 'c', 'e']
+      [x for x in algorithm(iter(input0), iter(input1), key = lower)]
+      self.assertTrue(sorted(calls) == sorted(input0 + input1))
+
+  def test_key(self):
+    input0, input1 = ['a', 'C', 'd'], ['A', 'b', 'c']
+    self.assertTrue([x for x in xmerge(input0, input1, key = str.lower)] == ['a', 'A', 'b', 'C', 'c', 'd'])
+    self.assertTrue([x for x in xset_union(input0, input1, key = str.lower)] == ['a', 'b', 'C', 'd'])
+    self.assertTrue([x for x in xset_intersection(input0, input1, key = str.lower)] == ['a', 'C'])
+    self.assertTrue([x for x in xset_difference(input0, input1, key = str.lower)] == ['d'])
+    self.assertTrue([x for x in xset_symmetric_difference(input0, input1).set_key(str.lower)] == ['b', 'd'])
+
+  def test_comp_and_key(self):
+    def rcmp(x, y): return cmp(y, x)
+    input0, input1 = ['d', 'C', 'a'], ['c', 'b', 'A']
+    self.assertTrue([x for x in xmerge(input0, input1, rcmp, str.lower)] == ['d', 'C', 'c', 'b', 'a', 'A'])
+    self.assertTrue([x for x in xset_union(input0, input1, rcmp, str.lower)] == ['d', 'C', 'b', 'a'])
+    self.assertTrue([x for x in xset_intersection(input0, input1, rcmp, str.lower)] == ['C', 'a'])
+    self.assertTrue([x for x in xset_difference(input0, input1, rcmp, str.lower)] == ['d'])
+    self.assertTrue([x for x in xset_symmetric_difference(input0, input1, rcmp, str.lower)] == ['d', 'b'])
+
+class MergeManyTestCase(unittest.TestCase):
+  def test_all(self):
+    self.assertTrue([x for x in xmerge_many()] == [])
+    self.assertTrue([x for x in xmerge_many([])] == [])
+    self.assertTrue([x for x in xmerge_many([], [], [])] == [])
+    self.assertTrue([x for x in xmerge_many([3], [], [1])] == [1, 3])
+    self.assertTrue([x for x in xmerge_many([2, 4], [1, 3, 5, 7])] == [1, 2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xmerge_many([1, 4, 7], [2, 5, 8], [3, 6, 9])] == [1, 2, 3, 4, 5, 6, 7, 8, 9])
+    self.assertTrue([x for x in xmerge_many([3, 5], [1, 5], [5, 6], [0])] == [0, 1, 3, 5, 5, 5, 6])
+
+  def test_stability(self):
+    a, b, c, d = [], [], [], []
+    result = [x for x in xmerge_many([a, b], [c], [d])]
+    self.assertTrue(result == [[], [], [], []])
+    self.assertTrue(result[0] is a)
+    self.assertTrue(result[1] is b)
+    self.assertTrue(result[2] is c)
+    self.assertTrue(result[3] is d)
+
+  def test_comp_and_key(self):
+    def rcmp(x, y): return cmp(y, x)
+    self.assertTrue([x for x in xmerge_many([5, 1], [4, 2], comp = rcmp)] == [5, 4, 2, 1])
+    result = [x for x in xmerge_many([(1, 'a'), (2, 'b')], [(1, 'c'), (3, 'd')],
+                                     key = operator.itemgetter(0))]
+    self.assertTrue(result == [(1, 'a'), (1, 'c'), (2, 'b'), (3, 'd')])
+    result = [x for x in xmerge_many(['b', 'C'], ['A', 'c']).set_key(str.lower)]
+    self.assertTrue(result == ['A', 'b', 'C', 'c'])
+    self.assertRaises(TypeError, xmerge_many, [1], bogus = 1)
+
+  def test_matches_xmerge_chain(self):
+    inputs = [range(i, 60, 7) for i in range(7)]
+    chain = inputs[0]
+    for input in inputs[1:]:
+      chain = xmerge(chain, input)
+    self.assertTrue([x for x in xmerge_many(*inputs)] == [x for x in chain])
+
+class MergeBatchTestCase(unittest.TestCase):
+  def assertBatches(self, make):
+    expected = [x for x in make()]
+    for n in (1, 2, 3, 100):
+      i, result = make(), []
+      while 1:
+        batch = i.next_batch(n)
+        result.extend(batch)
+        if len(batch) < n:
+          break
+      self.assertTrue(result == expected, (n, result, expected))
+      self.assertTrue(i.next_batch(n) == [])
+
+  def test_merge(self):
+    self.assertBatches(lambda: xmerge([], []))
+    self.assertBatches(lambda: xmerge([2, 4], [1, 3, 5, 7, 9, 11]))
+    self.assertBatches(lambda: xmerge([1, 3, 5, 7, 9, 11], [2, 4]))
+    self.assertBatches(lambda: xmerge(['b', 'C'], ['A', 'c'], key = str.lower))
+    a, b = [], []
+    result = xmerge([a], [b]).next_batch(2)
+    self.assertTrue(result[0] is a and result[1] is b)
+
+  def test_merge_many(self):
+    self.assertBatches(lambda: xmerge_many())
+    self.assertBatches(lambda: xmerge_many([3], [], [1]))
+    self.assertBatches(lambda: xmerge_many([3, 5], [1, 5], [5, 6, 8, 9, 10], [0]))
+    self.assertBatches(lambda: xmerge_many(*[range(i, 60, 7) for i in range(7)]))
+    self.assertBatches(lambda: xmerge_many(['b', 'C'], ['A', 'c', 'd'], key = str.lower))
+    a, b, c = [], [], []
+    result = xmerge_many([a, b], [c]).next_batch(3)
+    self.assertTrue(result[0] is a and result[1] is b and result[2] is c)
+
+  def test_mixed(self):
+    i = xmerge_many([1, 4, 6], [2, 3, 5, 7])
+    self.assertTrue(next(i) == 1)
+    self.assertTrue(i.next_batch(3) == [2, 3, 4])
+    self.assertTrue(next(i) == 5)
+    self.assertTrue(i.next_batch(3) == [6, 7])
+    i = xmerge([1, 4], [2, 3, 5])
+    self.assertTrue(i.next_batch(2) == [1, 2])
+    self.assertTrue([x for x in i] == [3, 4, 5])
+
+class SortTestCase(unittest.TestCase):
+  def test_in_memory(self):
+    self.assertTrue([x for x in xsort([])] == [])
+    self.assertTrue([x for x in xsort([3, 1, 2])] == [1, 2, 3])
+    self.assertTrue([x for x in xsort(iter('hello'))] == ['e', 'h', 'l', 'l', 'o'])
+    def rcmp(x, y): return cmp(y, x)
+    self.assertTrue([x for x in xsort([3, 1, 2], rcmp)] == [3, 2, 1])
+
+  def test_spill(self):
+    rand = random.Random(1)
+    data = [rand.randint(0, 1000) for i in range(5000)]
+    for max_memory in (1, 500, 20000):
+      result = [x for x in xsort(iter(data), max_memory = max_memory)]
+      self.assertTrue(result == sorted(data), max_memory)
+    self.assertTrue(xsort(data, max_memory = 500).next_batch(3) == sorted(data)[:3])
+
+  def test_stability(self):
+    # Every (key, position) pair is unique; the positions must stay in order.
+    rand = random.Random(2)
+    data = [(rand.randint(0, 9), i) for i in range(3000)]
+    fanin = xsorted.XSORT_FANIN
+    try:
+      for xsorted.XSORT_FANIN in (2, 3, 64):
+        result = [x for x in xsort(data, key = operator.itemgetter(0), max_memory = 1000)]
+        self.assertTrue(result == sorted(data), xsorted.XSORT_FANIN)
+    finally:
+      xsorted.XSORT_FANIN = fanin
+
+  def test_tempdir(self):
+    tempdir = tempfile.mkdtemp()
+    try:
+      i = xsort(range(100, 0, -1)).set_max_memory(100).set_tempdir(tempdir)
+      self.assertTrue([x for x in i] == list(range(1, 101)))
+    finally:
+      os.rmdir(tempdir)
+
+  def test_set_algorithms(self):
+    self.assertTrue([x for x in xset_intersection(xsort([4, 1, 3]), [1, 3, 5])] == [1, 3])
+    i = xset_union(xsort(iter([9, 3, 1]), max_memory = 1), xsort([2, 1]))
+    self.assertTrue([x for x in i] == [1, 2, 3, 9])
+
+def naive_join(x, y, mode, key0, key1):
+  """Join by comparing every pair of records; x and y are sorted."""
+  ret = []
+  for k in sorted(set([key0(r) for r in x] + [key1(r) for r in y])):
+    xs = [r for r in x if key0(r) == k]
+    ys = [r for r in y if key1(r) == k]
+    if mode == 'anti':
+      if not ys:
+        ret.extend(xs)
+    elif xs and ys:
+      ret.extend([(r, q) for r in xs for q in ys])
+    elif xs and mode in ('left', 'full'):
+      ret.extend([(r, None) for r in xs])
+    elif ys and mode == 'full':
+      ret.extend([(None, q) for q in ys])
+  return ret
+
+class JoinTestCase(unittest.TestCase):
+  def test_modes(self):
+    rand = random.Random(1)
+    key0, key1 = operator.itemgetter(0), operator.itemgetter(1)
+    for i in range(200):
+      x = sorted([(rand.randint(0, 6), j) for j in range(rand.randint(0, 8))])
+      y = sorted([(j, rand.randint(0, 6)) for j in range(rand.randint(0, 8))], key = key1)
+      for mode in ('inner', 'left', 'full', 'anti'):
+        result = [r for r in xjoin(x, y, mode = mode).set_keys(key0, key1)]
+        self.assertTrue(result == naive_join(x, y, mode, key0, key1), (mode, x, y))
+
+  def test_key_called_once(self):
+    calls = []
+    def key(x):
+      calls.append(x)
+      return x
+    result = [r for r in xjoin([1, 2, 2, 3], [2, 2, 4], key = key, mode = 'full')]
+    self.assertTrue(result == [(1, None), (2, 2), (2, 2), (2, 2), (2, 2), (3, None), (None, 4)])
+    self.assertTrue(len(calls) == 7)
+
+  def test_settings(self):
+    def rcmp(x, y): return cmp(y, x)
+    self.assertTrue([r for r in xjoin([3, 1], [3, 2, 1], rcmp)] == [(3, 3), (1, 1)])
+    i = xjoin().set_inputs(['a', 'B'], ['b']).set_key(str.lower).set_mode('left').set_fill('-')
+    self.assertTrue([r for r in i] == [('a', '-'), ('B', 'b')])
+    self.assertRaises(ValueError, next, xjoin([1], [1, 1, 1]).set_max_group(2))
+    self.assertTrue([r for r in xjoin([1], [1, 1]).set_max_group(2)] == [(1, 1), (1, 1)])
+    # An anti join buffers no group, so 'max_group' never applies
+    i = xjoin([0, 1, 1, 2], [1] * 1000 + [3], mode = 'anti').set_max_group(2)
+    self.assertTrue([r for r in i] == [0, 2])
+    self.assertRaises(ValueError, next, xjoin([1], [1], mode = 'outer'))
 
 class SetUnionTestCase(unittest.TestCase):
   def test_all(self):
-    self.failUnless([x for x in xset_union([], [])] == [])
-    self.failUnless([x for x in xset_union([1], [])] == [1])
-    self.failUnless([x for x in xset_union([], [1])] == [1])
-    self.failUnless([x for x in xset_union([1], [1])] == [1])
-    self.failUnless([x for x in xset_union([2, 4], [1, 3, 5, 7])] == [1, 2, 3, 4, 5, 7])
-    self.failUnless([x for x in xset_union([2, 4], [3, 5, 7])] == [2, 3, 4, 5, 7])
-    self.failUnless([x for x in xset_union([1, 3, 5, 7], [2, 4])] == [1, 2, 3, 4, 5, 7])
-    self.failUnless([x for x in xset_union([3, 5, 7], [2, 4])] == [2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xset_union([], [])] == [])
+    self.assertTrue([x for x in xset_union([1], [])] == [1])
+    self.assertTrue([x for x in xset_union([], [1])] == [1])
+    self.assertTrue([x for x in xset_union([1], [1])] == [1])
+    self.assertTrue([x for x in xset_union([2, 4], [1, 3, 5, 7])] == [1, 2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xset_union([2, 4], [3, 5, 7])] == [2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xset_union([1, 3, 5, 7], [2, 4])] == [1, 2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xset_union([3, 5, 7], [2, 4])] == [2, 3, 4, 5, 7])
     a, b = [], []
     result = [x for x in xset_union([a], [b])]
-    self.failUnless(result == [[]])
-    self.failUnless(result[0] is a)
+    self.assertTrue(result == [[]])
+    self.assertTrue(result[0] is a)
 
 class SetIntersectionTestCase(unittest.TestCase):
   def test_all(self):
-    self.failUnless([x for x in xset_intersection([], [])] == [])
-    self.failUnless([x for x in xset_intersection([1], [])] == [])
-    self.failUnless([x for x in xset_intersection([], [1])] == [])
-    self.failUnless([x for x in xset_intersection([1], [1])] == [1])
-    self.failUnless([x for x in xset_intersection([2, 4], [1, 3, 5])] == [])
-    self.failUnless([x for x in xset_intersection([1, 3, 5], [2, 4])] == [])
-    self.failUnless([x for x in xset_intersection([1, 3, 5], [2, 3, 4, 5])] == [3, 5])
-    self.failUnless([x for x in xset_intersection([3, 5], [3, 4, 5])] == [3, 5])
+    self.assertTrue([x for x in xset_intersection([], [])] == [])
+    self.assertTrue([x for x in xset_intersection([1], [])] == [])
+    self.assertTrue([x for x in xset_intersection([], [1])] == [])
+    self.assertTrue([x for x in xset_intersection([1], [1])] == [1])
+    self.assertTrue([x for x in xset_intersection([2, 4], [1, 3, 5])] == [])
+    self.assertTrue([x for x in xset_intersection([1, 3, 5], [2, 4])] == [])
+    self.assertTrue([x for x in xset_intersection([1, 3, 5], [2, 3, 4, 5])] == [3, 5])
+    self.assertTrue([x for x in xset_intersection([3, 5], [3, 4, 5])] == [3, 5])
     a, b = [], []
     result = [x for x in xset_intersection([a], [b])]
-    self.failUnless(result == [[]])
-    self.failUnless(result[0] is a)
+    self.assertTrue(result == [[]])
+    self.assertTrue(result[0] is a)
+
+  def test_gallop(self):
+    dense, sparse = range(0, 10000, 2), [5, 6, 4000, 4001, 9998, 20000]
+    for input0, input1 in [(dense, sparse), (sparse, dense), (iter(dense), sparse),
+                           (dense, iter(sparse)), (iter(sparse), iter(dense))]:
+      self.assertTrue([x for x in xset_intersection(input0, input1)] == [6, 4000, 9998])
+    def rcmp(x, y): return cmp(y, x)
+    result = [x for x in xset_intersection(dense[::-1], [20000, 9998, 9997, 6], rcmp)]
+    self.assertTrue(result == [9998, 6])
+    result = [x for x in xset_intersection('abdfz', 'bcdz')]
+    self.assertTrue(result == ['b', 'd', 'z'])
 
 class SetDifferenceTestCase(unittest.TestCase):
   def test_all(self):
-    self.failUnless([x for x in xset_difference([], [])] == [])
-    self.failUnless([x for x in xset_difference([1], [])] == [1])
-    self.failUnless([x for x in xset_difference([], [1])] == [])
-    self.failUnless([x for x in xset_difference([1], [1])] == [])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [0])] == [1, 2, 3, 4])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [1])] == [2, 3, 4])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [2])] == [1, 3, 4])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [3])] == [1, 2, 4])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [4])] == [1, 2, 3])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [5])] == [1, 2, 3, 4])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [2, 3])] == [1, 4])
-    self.failUnless([x for x in xset_difference([1, 2, 3, 4], [2, 4, 5])] == [1, 3])
+    self.assertTrue([x for x in xset_difference([], [])] == [])
+    self.assertTrue([x for x in xset_difference([1], [])] == [1])
+    self.assertTrue([x for x in xset_difference([], [1])] == [])
+    self.assertTrue([x for x in xset_difference([1], [1])] == [])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [0])] == [1, 2, 3, 4])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [1])] == [2, 3, 4])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [2])] == [1, 3, 4])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [3])] == [1, 2, 4])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [4])] == [1, 2, 3])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [5])] == [1, 2, 3, 4])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [2, 3])] == [1, 4])
+    self.assertTrue([x for x in xset_difference([1, 2, 3, 4], [2, 4, 5])] == [1, 3])
+
+  def test_gallop(self):
+    dense, sparse = range(0, 10000, 2), [5, 6, 4000, 4001, 9998, 20000]
+    self.assertTrue([x for x in xset_difference(sparse, dense)] == [5, 4001, 20000])
+    self.assertTrue([x for x in xset_difference(iter(sparse), dense)] == [5, 4001, 20000])
+    self.assertTrue([x for x in xset_difference(sparse, iter(dense))] == [5, 4001, 20000])
+    self.assertTrue(len([x for x in xset_difference(dense, sparse)]) == len(dense) - 3)
 
 class SetSymmetricDifferenceTestCase(unittest.TestCase):
   def test_all(self):
-    self.failUnless([x for x in xset_symmetric_difference([], [])] == [])
-    self.failUnless([x for x in xset_symmetric_difference([1], [])] == [1])
-    self.failUnless([x for x in xset_symmetric_difference([], [1])] == [1])
-    self.failUnless([x for x in xset_symmetric_difference([1], [1])] == [])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [0])] == [0, 1, 2, 3, 4])
-    self.failUnless([x for x in xset_symmetric_difference([0], [1, 2, 3, 4])] == [0, 1, 2, 3, 4])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [1])] == [2, 3, 4])
-    self.failUnless([x for x in xset_symmetric_difference([1], [1, 2, 3, 4])] == [2, 3, 4])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [2])] == [1, 3, 4])
-    self.failUnless([x for x in xset_symmetric_difference([2], [1, 2, 3, 4])] == [1, 3, 4])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [3])] == [1, 2, 4])
-    self.failUnless([x for x in xset_symmetric_difference([3], [1, 2, 3, 4])] == [1, 2, 4])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [4])] == [1, 2, 3])
-    self.failUnless([x for x in xset_symmetric_difference([4], [1, 2, 3, 4])] == [1, 2, 3])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [5])] == [1, 2, 3, 4, 5])
-    self.failUnless([x for x in xset_symmetric_difference([5], [1, 2, 3, 4])] == [1, 2, 3, 4, 5])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [2, 3])] == [1, 4])
-    self.failUnless([x for x in xset_symmetric_difference([2, 3], [1, 2, 3, 4])] == [1, 4])
-    self.failUnless([x for x in xset_symmetric_difference([1, 2, 3, 4], [2, 4, 5])] == [1, 3, 5])
-    self.failUnless([x for x in xset_symmetric_difference([2, 4, 5], [1, 2, 3, 4])] == [1, 3, 5])
+    self.assertTrue([x for x in xset_symmetric_difference([], [])] == [])
+    self.assertTrue([x for x in xset_symmetric_difference([1], [])] == [1])
+    self.assertTrue([x for x in xset_symmetric_difference([], [1])] == [1])
+    self.assertTrue([x for x in xset_symmetric_difference([1], [1])] == [])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [0])] == [0, 1, 2, 3, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([0], [1, 2, 3, 4])] == [0, 1, 2, 3, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [1])] == [2, 3, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([1], [1, 2, 3, 4])] == [2, 3, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [2])] == [1, 3, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([2], [1, 2, 3, 4])] == [1, 3, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [3])] == [1, 2, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([3], [1, 2, 3, 4])] == [1, 2, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [4])] == [1, 2, 3])
+    self.assertTrue([x for x in xset_symmetric_difference([4], [1, 2, 3, 4])] == [1, 2, 3])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [5])] == [1, 2, 3, 4, 5])
+    self.assertTrue([x for x in xset_symmetric_difference([5], [1, 2, 3, 4])] == [1, 2, 3, 4, 5])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [2, 3])] == [1, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([2, 3], [1, 2, 3, 4])] == [1, 4])
+    self.assertTrue([x for x in xset_symmetric_difference([1, 2, 3, 4], [2, 4, 5])] == [1, 3, 5])
+    self.assertTrue([x for x in xset_symmetric_difference([2, 4, 5], [1, 2, 3, 4])] == [1, 3, 5])
+
+class SetUnionManyTestCase(unittest.TestCase):
+  def test_all(self):
+    self.assertTrue([x for x in xset_union_many()] == [])
+    self.assertTrue([x for x in xset_union_many([], [])] == [])
+    self.assertTrue([x for x in xset_union_many([1], [], [1])] == [1])
+    self.assertTrue([x for x in xset_union_many([2, 4], [1, 3, 5, 7])] == [1, 2, 3, 4, 5, 7])
+    self.assertTrue([x for x in xset_union_many([1, 4], [2, 4], [4, 9], [0, 4])] == [0, 1, 2, 4, 9])
+    a, b, c = [], [], []
+    result = [x for x in xset_union_many([[0]], [a], [b, [1]], [c])]
+    self.assertTrue(result == [[], [0], [1]])
+    self.assertTrue(result[0] is a)
+    result = [x for x in xset_union_many(['a', 'B'], ['A', 'b', 'c'], key = str.lower)]
+    self.assertTrue(result == ['a', 'B', 'c'])
+
+class SetIntersectionManyTestCase(unittest.TestCase):
+  def test_all(self):
+    self.assertTrue([x for x in xset_intersection_many()] == [])
+    self.assertTrue([x for x in xset_intersection_many([1, 2])] == [1, 2])
+    self.assertTrue([x for x in xset_intersection_many([1], [], [1])] == [])
+    self.assertTrue([x for x in xset_intersection_many([1, 3, 5], [2, 3, 4, 5])] == [3, 5])
+    self.assertTrue([x for x in xset_intersection_many(range(0, 100, 2), range(0, 100, 3),
+                                                       iter(range(0, 100, 5)))] == [0, 30, 60, 90])
+    self.assertTrue([x for x in xset_intersection_many(range(1000), [7, 500, 999], iter([7, 999]))] == [7, 999])
+
+  def test_stability(self):
+    a, b, c = [], [], []
+    result = [x for x in xset_intersection_many([a, [0], [1]], [b], [c, [2]])]
+    self.assertTrue(result == [[]])
+    self.assertTrue(result[0] is a)
+    result = [x for x in xset_intersection_many(['A', 'B', 'C'], ['a', 'c'], key = str.lower)]
+    self.assertTrue(result == ['A', 'C'])
+
+class SetDifferenceManyTestCase(unittest.TestCase):
+  def test_all(self):
+    self.assertTrue([x for x in xset_difference_many()] == [])
+    self.assertTrue([x for x in xset_difference_many([1, 2])] == [1, 2])
+    self.assertTrue([x for x in xset_difference_many([1, 2, 3, 4], [2], [0, 4])] == [1, 3])
+    self.assertTrue([x for x in xset_difference_many([1, 2, 3, 4], [], [5])] == [1, 2, 3, 4])
+    self.assertTrue([x for x in xset_difference_many(iter(range(20)), range(0, 20, 2),
+                                                     iter(range(0, 20, 3)))] == [1, 5, 7, 11, 13, 17, 19])
+    result = [x for x in xset_difference_many(['A', 'B', 'C'], ['b']).set_key(str.lower)]
+    self.assertTrue(result == ['A', 'C'])
+
+class SetSymmetricDifferenceManyTestCase(unittest.TestCase):
+  def test_all(self):
+    self.assertTrue([x for x in xset_symmetric_difference_many()] == [])
+    self.assertTrue([x for x in xset_symmetric_difference_many([1], [1])] == [])
+    self.assertTrue([x for x in xset_symmetric_difference_many([1], [1], [1])] == [1])
+    self.assertTrue([x for x in xset_symmetric_difference_many([1, 2, 3, 4], [2, 4, 5])] == [1, 3, 5])
+    self.assertTrue([x for x in xset_symmetric_difference_many([1, 2], [2, 3], [3, 4])] == [1, 4])
+    a, b = [], []
+    result = [x for x in xset_symmetric_difference_many([[0]], [a], [b, [0]], [b])]
+    self.assertTrue(result == [[]])
+    self.assertTrue(result[0] is a)
+
+class SlotsTestCase(unittest.TestCase):
+  def test_slots(self):
+    for i in (xmerge([], []), xmerge_many(), xsort([]), xset_union([], []),
+              xset_intersection([], []), xset_difference([], []),
+              xset_symmetric_difference([], []), xset_union_many(),
+              xset_intersection_many(), xset_difference_many(),
+              xset_symmetric_difference_many(), xjoin([], [])):
+      self.assertFalse(hasattr(i, '__dict__'), i)
+      self.assertTrue([x for x in i] == [])
+
+def resumed(make, n):
+  """Read n elements of make(), then the rest from a restored make()."""
+  i = make()
+  ret = i.next_batch(n)
+  state = pickle.loads(pickle.dumps(i.snapshot()))
+  return ret + [x for x in make().restore(state)]
+
+class CheckpointTestCase(unittest.TestCase):
+  def assertResumes(self, make):
+    expected = [x for x in make()]
+    for n in range(len(expected) + 2):
+      self.assertTrue(resumed(make, n) == expected, n)
+
+  def test_two_inputs(self):
+    a, b = [1, 3, 4, 8, 9], [2, 3, 5, 8, 10, 11]
+    for algorithm in (xmerge, xset_union, xset_intersection, xset_difference,
+                      xset_symmetric_difference):
+      self.assertResumes(lambda: algorithm(a, b))
+      self.assertResumes(lambda: algorithm(range(0, 20, 2), iter(b)))
+      self.assertResumes(lambda: algorithm(a, b, key = operator.neg, comp = lambda x, y: cmp(y, x)))
+
+  def test_many_inputs(self):
+    inputs = ([1, 3, 4, 8], [2, 3, 8, 10], range(0, 12, 4), [3, 8])
+    for algorithm in (xmerge_many, xset_union_many, xset_intersection_many,
+                      xset_symmetric_difference_many):
+      self.assertResumes(lambda: algorithm(*inputs))
+      self.assertResumes(lambda: algorithm())
+
+  def test_files(self):
+    # Binary files are restored by seeking to the offset of the next line
+    a, b = b'apple\ncherry\nplum\n', b'banana\ncherry\nfig\n'
+    self.assertResumes(lambda: xmerge(io.BytesIO(a), io.BytesIO(b)))
+    self.assertResumes(lambda: xset_union_many(io.BytesIO(a), io.BytesIO(b)))
+
+  def test_unsupported(self):
+    self.assertRaises(TypeError, xsort([2, 1]).snapshot)
+    i = xmerge((x for x in [1, 2]), [2])
+    next(i)
+    self.assertRaises(TypeError, i.snapshot)
 
 if __name__ == '__main__':
   try:
@@ -0,0 +1,542 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Asynchronous versions of some PyX algorithms.
+
+Each class in this file is an asynchronous iterator (it defines
+__aiter__ and __anext__), to be read with 'async for' inside an
+asyncio coroutine.  Each class has the same name as a class in xbasic
+or xsorted with an 'a' in front, and the same constructor, set_*
+methods, output sequence and stability; see that class's __doc__.
+
+Definitions:
+  APyX input -- any asynchronous iterator or iterable (such as an
+    asynchronous generator), or any PyX input, with the following
+    restriction:
+      Once it has raised StopAsyncIteration (or StopIteration), any
+        further calls to __anext__ (or next) will also raise it.
+    A PyX input is read synchronously, between the awaits of the
+    algorithm reading it.
+
+Functions given to axfilter and axmap may be ordinary functions or
+coroutine functions; if a call returns an awaitable, it is awaited.
+
+PyX Classes (each has its own __doc__):
+  axbase -- Base class for asynchronous PyX algorithms.
+  axcat -- Append input sequences end-to-end.
+  axfilter -- Filter an input sequence.
+  axmap -- Apply a function to input sequences until all of them are done.
+  axhead -- Copy part of an input sequence.
+  axtail -- Copy last part of an input sequence.
+  axmerge -- Merge two sorted sequences.
+  axset_union -- Union two sorted, unique sequences (|).
+  axset_intersection -- Intersect two sorted, unique sequences (&).
+  axset_difference -- Difference two sorted, unique sequences (&~).
+  axset_symmetric_difference -- Symm. diff. two sorted, unique sequences (^).
+
+Global Functions (each has its own __doc__):
+  axresult -- Create in-memory sequence from APyX input.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+import asyncio
+import collections
+import inspect
+
+#
+# Helper functions
+#
+
+async def _axsync(input):
+  """Generate the elements of a PyX input asynchronously."""
+
+  for x in input:
+    yield x
+
+def _axiter(input):
+  """Return an asynchronous iterator over an APyX input."""
+
+  if hasattr(input, '__aiter__'):
+    return input.__aiter__()
+  return _axsync(input)
+
+async def _axcall(func, *args):
+  """Call a function, and await its result if it is awaitable."""
+
+  ret = func(*args)
+  if inspect.isawaitable(ret):
+    ret = await ret
+  return ret
+
+class _axsingle_buffer:
+  """Asynchronous counterpart of xbase.xsingle_buffer.
+
+  await load() fills the buffer if it is empty, and returns true if
+  it holds an element (false once the input is exhausted); get(),
+  get_key() and consume() then read it without awaiting.
+  """
+
+  def __init__(self, input, key = None):
+    self.__in = _axiter(input)
+    self.__key = key
+    self.__valid = 0
+    self.__done = 0
+
+  async def load(self):
+    if not self.__valid and not self.__done:
+      try:
+        x = await self.__in.__anext__()
+      except StopAsyncIteration:
+        self.__done = 1
+        return 0
+      self.__val = x
+      if self.__key is None:
+        self.__val_key = x
+      else:
+        self.__val_key = self.__key(x)
+      self.__valid = 1
+    return self.__valid
+
+  def get(self):
+    return self.__val
+
+  def get_key(self):
+    return self.__val_key
+
+  def consume(self):
+    self.__valid = 0
+    return self.__val
+
+class axbase:
+  """Base class for asynchronous PyX algorithms.
+
+  Asynchronous PyX algorithms do not *have* to derive from this
+  class, but it may be helpful.  This class just defines __aiter__
+  to return self.
+  """
+
+  def __aiter__(self): return self
+
+class _axsorted (axbase):
+  """Base class for the sorted algorithms on two inputs.
+
+  Derived classes define the coroutine step(in0, in1), which returns
+  the next output element from the two _axsingle_buffers (or raises
+  StopAsyncIteration), as the __next__ of their xsorted counterpart
+  does.
+  """
+
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  async def __anext__(self):
+    if self.__in0 is None:
+      key = xbase.xsort_key(self.__comp, self.__key)
+      self.__in0 = _axsingle_buffer(self.__input0, key)
+      self.__in1 = _axsingle_buffer(self.__input1, key)
+    return await self.step(self.__in0, self.__in1)
+
+  def set_input0(self, input0):
+    self.__input0 = input0
+    return self
+
+  def set_input1(self, input1):
+    self.__input1 = input1
+    return self
+
+  def set_inputs(self, input0, input1):
+    self.__input0, self.__input1 = input0, input1
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+#
+# Pipe Algorithm classes
+#
+
+class axcat (axbase):
+  """Append input sequences end-to-end.
+
+  See xbasic.xcat.
+
+  Methods:
+    __init__(self, *inputs)
+    set_inputs(self, *inputs) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  def __init__(self, *inputs):
+    self.__in = [_axiter(x) for x in inputs]
+    self.__which = 0
+
+  async def __anext__(self):
+    while self.__which != len(self.__in):
+      try:
+        return await self.__in[self.__which].__anext__()
+      except StopAsyncIteration:
+        self.__which += 1
+    raise StopAsyncIteration
+
+  def set_inputs(self, *inputs):
+    self.__in = [_axiter(x) for x in inputs]
+    return self
+
+class axfilter (axbase):
+  """Filters an input sequence.
+
+  See xbasic.xfilter.  The filtering function may be a coroutine
+  function.
+
+  Methods:
+    __init__(self, func = None, input = None)
+    set_input(self, input),
+    set_func(self, func) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  def __init__(self, func = None, input = None):
+    self.__in = _axiter(input)
+    self.__func = func
+
+  async def __anext__(self):
+    while 1:
+      ret = await self.__in.__anext__()
+      if self.__func is None:
+        if ret:
+          return ret
+      elif await _axcall(self.__func, ret):
+        return ret
+
+  def set_input(self, input):
+    self.__in = _axiter(input)
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+class axmap (axbase):
+  """Applies a function over input sequences until all of them are done.
+
+  See xbasic.xmap.  The function may be a coroutine function.
+
+  By default, each call is awaited before the next elements are read.
+  With set_concurrency(n), up to n calls run at once as asyncio tasks,
+  started as the inputs are read; the results are still output in
+  input order, and an exception raised by a call is raised by
+  __anext__ at that call's position.  Iteration may continue after
+  it.  aclose() cancels the calls that are still running.
+
+  Methods:
+    __init__(self, func = None, *inputs) --
+      Note that 'replace' is not a parameter; it *must* be set using
+        set_replace.
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_replace(self, replace),
+    set_concurrency(self, concurrency) --
+      Must be called before iteration begins.
+      Returns self.
+    aclose(self) --
+      Coroutine; cancels running calls, and ends the output sequence.
+  """
+
+  def __init__(self, func = None, *inputs):
+    self.__in = [_axiter(x) for x in inputs]
+    self.__func = func
+    self.__replace = None
+    self.__concurrency = 1
+    self.__pending = collections.deque()
+    self.__done = 0
+
+  async def __read(self):
+    # Returns the next arguments, or None once every input is done.
+    done = 1
+    data_set = []
+    for x in self.__in:
+      try:
+        data_set.append(await x.__anext__())
+        done = 0
+      except StopAsyncIteration:
+        data_set.append(self.__replace)
+    if done:
+      return None
+    return data_set
+
+  async def __anext__(self):
+    pending = self.__pending
+    while not self.__done and len(pending) < self.__concurrency:
+      data_set = await self.__read()
+      if data_set is None:
+        self.__done = 1
+        break
+      if self.__concurrency <= 1:
+        return await _axcall(self.__func, *data_set)
+      pending.append(asyncio.ensure_future(_axcall(self.__func, *data_set)))
+    if not pending:
+      raise StopAsyncIteration
+    return await pending.popleft()
+
+  async def aclose(self):
+    self.__done = 1
+    for x in self.__pending:
+      x.cancel()
+    self.__pending.clear()
+
+  def set_inputs(self, *inputs):
+    self.__in = [_axiter(x) for x in inputs]
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_replace(self, replace):
+    self.__replace = replace
+    return self
+
+  def set_concurrency(self, concurrency):
+    self.__concurrency = concurrency
+    return self
+
+class axhead (axbase):
+  """Copy part of an input sequence.
+
+  See xbasic.xhead.
+
+  Methods:
+    __init__(self, input = None, bound = 0)
+    set_input(self, input),
+    set_bound(self, bound)
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  def __init__(self, input = None, bound = 0):
+    self.__in = _axiter(input)
+    self.__bound = bound
+
+  async def __anext__(self):
+    if self.__bound > 0:
+      self.__bound -= 1
+      return await self.__in.__anext__()
+    raise StopAsyncIteration
+
+  def set_input(self, input):
+    self.__in = _axiter(input)
+    return self
+
+  def set_bound(self, bound):
+    self.__bound = bound
+    return self
+
+class axtail (axbase):
+  """Copy last part of an input sequence.
+
+  See xbasic.xtail.
+
+  Methods:
+    __init__(self, input = None, bound = 0)
+    set_input(self, input),
+    set_bound(self, bound)
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  def __init__(self, input = None, bound = 0):
+    self.__in = _axiter(input)
+    self.__bound = bound
+
+  async def __anext__(self):
+    while self.__bound > 0:
+      self.__bound -= 1
+      await self.__in.__anext__()
+    return await self.__in.__anext__()
+
+  def set_input(self, input):
+    self.__in = _axiter(input)
+    return self
+
+  def set_bound(self, bound):
+    self.__bound = bound
+    return self
+
+class axmerge (_axsorted):
+  """Merges two sorted sequences.
+
+  See xsorted.xmerge.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  async def step(self, in0, in1):
+    if not await in0.load():
+      if await in1.load():
+        return in1.consume()
+      raise StopAsyncIteration
+    if not await in1.load():
+      return in0.consume()
+    if in1.get_key() < in0.get_key():
+      return in1.consume()
+    return in0.consume()
+
+class axset_union (_axsorted):
+  """Unions two sorted, unique sequences ("or").
+
+  See xsorted.xset_union.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  async def step(self, in0, in1):
+    if not await in0.load():
+      if await in1.load():
+        return in1.consume()
+      raise StopAsyncIteration
+    if not await in1.load():
+      return in0.consume()
+    x, y = in0.get_key(), in1.get_key()
+    if y < x:
+      return in1.consume()
+    if not x < y:
+      in1.consume()
+    return in0.consume()
+
+class axset_intersection (_axsorted):
+  """Intersects two sorted, unique sequences ("and").
+
+  See xsorted.xset_intersection.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  async def step(self, in0, in1):
+    while await in0.load() and await in1.load():
+      x, y = in0.get_key(), in1.get_key()
+      if x < y:
+        in0.consume()
+      elif y < x:
+        in1.consume()
+      else:
+        in1.consume()
+        return in0.consume()
+    raise StopAsyncIteration
+
+class axset_difference (_axsorted):
+  """Differences two sorted, unique sequences ("and not").
+
+  See xsorted.xset_difference.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  async def step(self, in0, in1):
+    while await in0.load():
+      if not await in1.load():
+        return in0.consume()
+      x, y = in0.get_key(), in1.get_key()
+      if x < y:
+        return in0.consume()
+      if not y < x:
+        in0.consume()
+      in1.consume()
+    raise StopAsyncIteration
+
+class axset_symmetric_difference (_axsorted):
+  """Symmetric differences two sorted, unique sequences ("xor").
+
+  See xsorted.xset_symmetric_difference.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+  """
+
+  async def step(self, in0, in1):
+    while 1:
+      if not await in0.load():
+        if await in1.load():
+          return in1.consume()
+        raise StopAsyncIteration
+      if not await in1.load():
+        return in0.consume()
+      x, y = in0.get_key(), in1.get_key()
+      if y < x:
+        return in1.consume()
+      if x < y:
+        return in0.consume()
+      in0.consume()
+      in1.consume()
+
+#
+# Global functions
+#
+
+async def axresult(input, start = None):
+  """Create in-memory sequence from APyX input.
+
+  Coroutine; the asynchronous counterpart of xbase.xresult, with the
+  same arguments and result.
+
+  Example:
+    >>> import asyncio
+    >>> asyncio.run(axresult(axcat([1, 3, 5], [2, 4, 6])))
+    [1, 3, 5, 2, 4, 6]
+  """
+
+  ret = []
+  async for x in _axiter(input):
+    ret.append(x)
+  if start is None:
+    return ret
+  return xbase.xresult(ret, start)
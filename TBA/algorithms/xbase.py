@@ -10,11 +10,30 @@ Helper Classes (each has its own __doc__):
 
 Global Functions (each has its own __doc__):
   xresult -- Create in-memory sequence from PyX input.
+  xsort_key -- Combine a comparision object and a key function.
+  xbatch -- Return the next batch of elements from a PyX input.
+  xbatches -- Iterate over a PyX input a batch at a time.
+  xsnapshot -- Return the position of a PyX input, for xrestore.
+  xrestore -- Return a PyX input to a position taken by xsnapshot.
+
+Constants:
+  XBATCH_SIZE -- The batch size used when the caller does not give one.
 """
 
-import types
+from TBA.algorithms.xcompatibility import *
+import array
+import itertools
+import operator
+import sys
 
-from xcompatibility import *
+XBATCH_SIZE = 1024
+
+# The iterators over builtin sequences, whose index can be set
+_xbuiltin_iterators = tuple(set([type(iter(x)) for x in
+    ([], (), '', '\u0100', b'', range(0), range(sys.maxsize + 1))]))
+
+# The value of an empty xsingle_buffer
+_xempty = object()
 
 #
 # Utility classes
@@ -29,19 +48,28 @@ class xsingle_buffer:
   through the member function "get()", and the iterator is incremented
   through the member function "next()".  Whether or not "get()" will
   throw can be determined by converting that object to a truth value.
-  If it evaluates to 1, then "get()" will not throw.
+  If it evaluates to True, then "get()" will not throw.
 
   "next()" returns self.
 
+  Optionally, a key function may be given.  It is called exactly once
+  for each element, when that element is loaded into the buffer; the
+  result is read through the member function "get_key()".
+
   Once StopIteration is raised, you can continue to call "get()" and
   testing it for truth value, but do not call "next()".
 
   Methods (each has its own __doc__):
     __init__ -- Create an xsingle_buffer.
     get -- Return buffer of an xsingle_buffer.
+    get_key -- Return key of buffer of an xsingle_buffer.
     next -- Clear buffer of an xsingle_buffer.
-    __nonzero__ -- Test an xsingle_buffer.
+    __bool__ -- Test an xsingle_buffer.
     consume -- Return and clear buffer of an xsingle_buffer.
+    consume_batch -- Return and clear buffer, and read a batch after it.
+    set_key -- Set key function of an xsingle_buffer.
+    snapshot -- Return the state of an xsingle_buffer.
+    restore -- Restore the state of an xsingle_buffer.
 
   Examples:
     >>> def true(x):
@@ -56,7 +84,7 @@ class xsingle_buffer:
     >>> true(i)
     1
     >>> i.next()
-    <xsingle_buffer instance at ...>
+    <...xsingle_buffer object at ...>
     >>> true(i)
     1
     >>> i.get()
@@ -66,7 +94,7 @@ class xsingle_buffer:
     >>> true(i)
     1
     >>> i.next()
-    <xsingle_buffer instance at ...>
+    <...xsingle_buffer object at ...>
     >>> true(i)
     1
     >>> i.get()
@@ -74,7 +102,7 @@ class xsingle_buffer:
     >>> true(i)
     1
     >>> i.next()
-    <xsingle_buffer instance at ...>
+    <...xsingle_buffer object at ...>
     >>> true(i)
     0
     >>> i.get()
@@ -87,18 +115,22 @@ class xsingle_buffer:
     StopIteration
   """
 
-  def __init__(self, input):
+  __slots__ = ('__in', '__key', '__val', '__k')
+
+  def __init__(self, input, key = None):
     """Create an xsingle_buffer.
 
     Arguments:
       input -- The PyX input to wrap around.
+      key (optional) -- The key function, or None.  Defaults to None.
 
     Notes:
       After this function is called, the buffer is empty.
     """
 
     self.__in = iter(input)
-    self.__valid = 0
+    self.__key = key
+    self.__val = _xempty
 
   def get(self):
     """Return buffer of an xsingle_buffer.
@@ -113,10 +145,32 @@ class xsingle_buffer:
       Raises StopIteration if the input is exhausted.
     """
 
-    if not self.__valid:
-      self.__val = self.__in.next()
-      self.__valid = 1
-    return self.__val
+    val = self.__val
+    if val is _xempty:
+      val = self.__val = next(self.__in)
+      if self.__key is not None:
+        self.__k = self.__key(val)
+    return val
+
+  def get_key(self):
+    """Return key of buffer of an xsingle_buffer.
+
+    Arguments: none.
+
+    Returns: key of buffer value.
+
+    Notes:
+      Loads a value into the buffer as get() does.  If there is no
+        key function, returns the buffer value itself.
+      Raises StopIteration if the input is exhausted.
+    """
+
+    val = self.__val
+    if val is _xempty:
+      val = self.get()
+    if self.__key is None:
+      return val
+    return self.__k
 
   def next(self):
     """Clear buffer of an xsingle_buffer.
@@ -131,15 +185,15 @@ class xsingle_buffer:
       Does not raise exceptions.
     """
 
-    self.__valid = 0
+    self.__val = _xempty
     return self
 
-  def __nonzero__(self):
+  def __bool__(self):
     """Test an xsingle_buffer.
 
     Arguments: none.
 
-    Returns: 1 if get() can be called without throwing, 0 otherwise.
+    Returns: True if get() can be called without throwing, False otherwise.
 
     Notes:
       Does not raise StopIteration.
@@ -148,8 +202,8 @@ class xsingle_buffer:
     try:
       self.get()
     except StopIteration:
-      return 0
-    return 1
+      return False
+    return True
 
   def consume(self):
     """Return and clear buffer of an xsingle_buffer.
@@ -166,31 +220,184 @@ class xsingle_buffer:
     """
 
     ret = self.get()
-    self.next()
+    self.__val = _xempty
     return ret
 
+  def consume_batch(self, n):
+    """Return and clear buffer, and read a batch after it.
+
+    Arguments:
+      n -- The maximum number of elements to return.
+
+    Returns:
+      A list of up to n elements: the buffer (if it is full),
+      followed by the elements after it (see xbatch).  The list is
+      shorter than n only if the input is exhausted.
+
+    Notes:
+      The key function is not called for the elements read after the
+      buffer, since they never enter it.  After this call, the buffer
+      is empty.
+    """
+
+    if self.__val is not _xempty and n > 0:
+      ret = [self.__val]
+      self.__val = _xempty
+      if n > 1:
+        ret.extend(xbatch(self.__in, n - 1))
+      return ret
+    return xbatch(self.__in, n)
+
+  def set_key(self, key):
+    """Set key function of an xsingle_buffer.
+
+    Arguments:
+      key -- The key function, or None.
+
+    Returns: self.
+
+    Notes:
+      Must be called while the buffer is empty.
+    """
+
+    self.__key = key
+    return self
+
+  def snapshot(self):
+    """Return the state of an xsingle_buffer.
+
+    Arguments: none.
+
+    Returns:
+      A picklable value: the buffer (if it is full) and the position
+      of the input, as xsnapshot returns it.
+
+    Notes:
+      Does not read from the input.
+      A buffered memoryview (such as xmmap produces) is saved as
+        bytes, since a memoryview cannot be pickled.
+    """
+
+    val = self.__val
+    if val is _xempty:
+      return (0, None, xsnapshot(self.__in))
+    return (1, _xsaved(val), xsnapshot(self.__in))
+
+  def restore(self, state):
+    """Restore the state of an xsingle_buffer.
+
+    Arguments:
+      state -- A value returned by snapshot().
+
+    Returns: self.
+
+    Notes:
+      Must be called before the buffer is first read, on an
+        xsingle_buffer wrapped around the same input (reopened, if
+        it is a file).
+      The key function is called again for a restored buffer.
+    """
+
+    full, val, pos = state
+    xrestore(self.__in, pos)
+    self.__val = _xempty
+    if full:
+      self.__val = val
+      if self.__key is not None:
+        self.__k = self.__key(val)
+    return self
+
 class xbase:
   """Base class for PyX algorithms.
 
   PyX algorithms do not *have* to derive from this class,
   but it may be helpful.  This class just defines __iter__
-  to return self, and (if running Python earlier than 2.2)
-  defines __getitem__ to just call next(), translating
-  StopIteration into IndexError.
+  to return self, and defines next() to call __next__(), so
+  that callers written against the Python 2 iterator protocol
+  keep working.
+
+  It also defines describe(), which returns a tuple
+  (name, inputs, settings): the name of the algorithm, a tuple
+  of its PyX inputs, and a dictionary of the values given to its
+  set_* methods.  Tools that inspect pipelines (such as xpipeline)
+  use it.  The default describes an algorithm with no visible
+  inputs or settings; derived classes override it.
+
+  Finally, it defines next_batch(n), which returns a list of the
+  next n elements of the output sequence, or fewer than n only if
+  the output sequence is then exhausted; an empty list means the
+  output sequence is done.  Batches and single elements may be read
+  from the same algorithm in any order.  The default calls
+  __next__() n times; derived classes override it where they can
+  produce a batch in fewer steps, usually by reading batches from
+  their own inputs through xbatch().
+
+  Algorithms whose output length follows from the lengths of their
+  inputs also define __length_hint__ (see operator.length_hint), so
+  that list() and xresult() can size their results in advance.  A
+  hint is exact or NotImplemented (when an input's length is not
+  known); it is never a guess, since a buffer given to xresult is
+  rejected up front if the hint says the output will not fit.
+
+  Algorithms that can be checkpointed define snapshot(), which
+  returns a picklable value holding their position and that of their
+  inputs (through xsnapshot), and restore(state), which puts a new,
+  identically built algorithm (over the same inputs, reopened) back
+  in that position before it is first read, and returns self.  Only
+  snapshot() does any work; nothing is recorded while elements are
+  read.  The defaults raise TypeError.
   """
 
+  __slots__ = ()
+
   def __iter__(self): return self
-  if SUPPORT_SEQUENCE_ITER:
-    def __getitem__(self, i):
-      try:
-        return self.next()
-      except StopIteration:
-        raise IndexError
+  def next(self): return self.__next__()
+  def describe(self): return (self.__class__.__name__, (), {})
+  def next_batch(self, n = XBATCH_SIZE): return list(itertools.islice(self, n))
+
+  def snapshot(self):
+    raise TypeError('%s cannot be checkpointed' % self.__class__.__name__)
+
+  def restore(self, state):
+    raise TypeError('%s cannot be checkpointed' % self.__class__.__name__)
 
 #
 # Global functions
 #
 
+def xsort_key(comp = cmp, key = None):
+  """Combine a comparision object and a key function.
+
+  Arguments:
+    comp (optional) --
+      The comparision object.  Defaults to 'cmp'.
+    key (optional) --
+      The key function, or None.  Defaults to 'None'.
+
+  Returns:
+    A key function whose results are ordered by the builtin
+    comparision operators exactly as 'comp' orders the results of
+    'key', or None if the elements themselves may be compared
+    directly.
+
+  Notes:
+    PyX algorithms call the returned function once per element (see
+    xsingle_buffer), then compare the keys with '<' and '=='.  If
+    'comp' is 'cmp', the keys are not wrapped at all.
+
+  Example:
+    >>> k = xsort_key(key = str.lower)
+    >>> k('B') < k('a')
+    False
+  """
+
+  if comp is cmp:
+    return key
+  wrap = cmp_to_key(comp)
+  if key is None:
+    return wrap
+  return lambda x: wrap(key(x))
+
 def xresult(input, start = None):
   """Create in-memory sequence from PyX input.
 
@@ -198,37 +405,277 @@ def xresult(input, start = None):
     input --
       The PyX input to use.
     start (optional) --
-      The sequence on which the PyX input is concatenated.
-      Must be of string, tuple, or list type.  If 'None',
-      a starting value of '[]' is used.  Defaults to 'None'.
-      The value of this argument (if mutable) may be changed.
+      The sequence on which the PyX input is concatenated.  If
+      'None', a starting value of '[]' is used.  Defaults to 'None'.
+      It may be:
+        a string, bytes or tuple -- a new sequence is returned;
+        a sequence with an 'extend' method, such as a list, a
+          bytearray or an array.array -- it is extended in place;
+        any other mutable sequence of fixed length, such as a
+          memoryview or a NumPy array -- it is a preallocated buffer,
+          which is written in place from its start.
 
   Returns:
     A sequence starting with 'start' that also contains each
-    element in 'input'.
+    element in 'input'; for a preallocated buffer, the part of it
+    that was written (for a memoryview, a view of that part).
 
   Notes:
     The expression 'xresult(inp)' is equivalent to:
     '[x for x in inp]'
-    
+
+    The elements are collected a batch at a time, and strings, bytes
+    and tuples are joined once at the end, so the cost is linear in
+    the length of the output.  The elements added to a string or bytes
+    must be strings or bytes themselves (as with '+').
+
+    A preallocated buffer raises ValueError if the output does not
+    fit; if the input reports its length (through __length_hint__),
+    this is checked before any of it is read.  Otherwise, at most one
+    element more than fits is read.
+
   Example:
     >>> xresult( xcat([1, 3, 5], [2, 4, 6]) )
     [1, 3, 5, 2, 4, 6]
+    >>> xresult( ['b', 'c'], 'a' )
+    'abc'
+    >>> import array
+    >>> xresult( [2, 3], array.array('i', [1]) )
+    array('i', [1, 2, 3])
   """
 
   if start is None:
-    return [x for x in input]
-  elif type(start) is types.StringType:
-    while 1:
-      try:
-        start += input.next()
-      except StopIteration:
-        return start
-  elif type(start) is types.TupleType:
-    while 1:
-      try:
-        start += ( input.next(), )
-      except StopIteration:
-        return start
+    ret = []
+    for batch in xbatches(input):
+      ret.extend(batch)
+    return ret
+  elif isinstance(start, (str, bytes, tuple)):
+    parts = []
+    for batch in xbatches(input):
+      parts.extend(batch)
+    if isinstance(start, tuple):
+      return start + tuple(parts)
+    return start + start[:0].join(parts)
+  elif hasattr(start, 'extend'):
+    for batch in xbatches(input):
+      start.extend(batch)
+    return start
+  else:
+    return _xresult_into(input, start)
+
+def _xresult_into(input, buffer):
+  """Write a PyX input into a preallocated buffer; see xresult."""
+
+  size = len(buffer)
+  if operator.length_hint(input) > size:
+    raise ValueError('output does not fit in a buffer of %d elements' % size)
+  if isinstance(buffer, memoryview):
+    # A memoryview is written from another buffer of the same format.
+    convert = lambda batch: array.array(buffer.format, batch)
+  else:
+    convert = None
+  input = iter(input)
+  pos = 0
+  while pos < size:
+    batch = xbatch(input, min(size - pos, XBATCH_SIZE))
+    if not batch:
+      return buffer[:pos]
+    end = pos + len(batch)
+    buffer[pos:end] = convert is None and batch or convert(batch)
+    pos = end
+  if xbatch(input, 1):
+    raise ValueError('output does not fit in a buffer of %d elements' % size)
+  return buffer[:pos]
+
+def xbatch(input, n = XBATCH_SIZE):
+  """Return the next batch of elements from a PyX input.
+
+  Arguments:
+    input --
+      The PyX input to read.  Must be an iterator (for instance, the
+      result of iter()), since it is read from where it left off.
+    n (optional) --
+      The maximum number of elements to return.  Defaults to
+      XBATCH_SIZE.
+
+  Returns:
+    A list of the next n elements of 'input', or fewer than n only if
+    'input' is then exhausted.  An empty list means 'input' is done.
+
+  Notes:
+    If 'input' has a next_batch() method (as every xbase.xbase does),
+    it is used; otherwise the elements are read one at a time, at C
+    speed, with itertools.islice.
+
+  Example:
+    >>> i = iter(range(5))
+    >>> xbatch(i, 3), xbatch(i, 3), xbatch(i, 3)
+    ([0, 1, 2], [3, 4], [])
+  """
+
+  try:
+    next_batch = input.next_batch
+  except AttributeError:
+    return list(itertools.islice(input, n))
+  return next_batch(n)
+
+def xbatches(input, n = XBATCH_SIZE):
+  """Iterate over a PyX input a batch at a time.
+
+  Arguments:
+    input --
+      The PyX input to read.
+    n (optional) --
+      The batch size.  Defaults to XBATCH_SIZE.
+
+  Returns:
+    A generator of the non-empty batches of 'input' (see xbatch).
+
+  Example:
+    >>> [b for b in xbatches([1, 2, 3, 4, 5], 2)]
+    [[1, 2], [3, 4], [5]]
+  """
+
+  input = iter(input)
+  while 1:
+    batch = xbatch(input, n)
+    if not batch:
+      return
+    yield batch
+    if len(batch) < n:
+      return
+
+def xsnapshot(input):
+  """Return the position of a PyX input, for xrestore.
+
+  Arguments:
+    input --
+      The PyX input, as read so far.  It may be:
+        an object with a snapshot() method, such as a PyX algorithm
+        or a source in xmmap -- its snapshot() is returned;
+        a file (or anything else with tell() and seek()) -- its
+        tell() is returned;
+        an iterator over a list, tuple, str, bytes or range, as
+        iter() returns it -- its index is returned.
+
+  Returns:
+    A picklable value.
+
+  Notes:
+    Raises TypeError for any other input, such as a generator or
+    an itertools object.
+    Files must be opened in binary mode: a file opened in text mode
+    refuses tell() while it is being iterated over.
+
+  Example:
+    >>> i = iter([1, 2, 3])
+    >>> n = next(i)
+    >>> pos = xsnapshot(i)
+    >>> i = iter([1, 2, 3])
+    >>> [x for x in xrestore(i, pos)]
+    [2, 3]
+  """
+
+  try:
+    snapshot = input.snapshot
+  except AttributeError:
+    pass
   else:
-    return start + [x for x in input]
+    return snapshot()
+  if hasattr(input, 'tell') and hasattr(input, 'seek'):
+    return input.tell()
+  if type(input) in _xbuiltin_iterators:
+    reduced = input.__reduce__()
+    # An exhausted builtin iterator drops its index
+    if len(reduced) > 2:
+      return reduced[2]
+    return None
+  raise TypeError('cannot take the position of %r' % (input,))
+
+def xrestore(input, state):
+  """Return a PyX input to a position taken by xsnapshot.
+
+  Arguments:
+    input --
+      The PyX input, not yet read.  Must be the same kind of input
+      as was given to xsnapshot, over the same data.
+    state --
+      A value returned by xsnapshot.
+
+  Returns:
+    'input'.
+  """
+
+  try:
+    restore = input.restore
+  except AttributeError:
+    pass
+  else:
+    restore(state)
+    return input
+  if hasattr(input, 'tell') and hasattr(input, 'seek'):
+    input.seek(state)
+  elif type(input) in _xbuiltin_iterators:
+    # Builtin iterators clamp their index to the end
+    input.__setstate__(sys.maxsize if state is None else state)
+  else:
+    raise TypeError('cannot set the position of %r' % (input,))
+  return input
+
+def _xsaved(x):
+  """Return a buffered element in a form that can be pickled."""
+
+  if isinstance(x, memoryview):
+    return x.tobytes()
+  return x
+
+def _xis_sequence(input):
+  """Return 1 if 'input' supports len() and random access by index."""
+
+  return hasattr(input, '__getitem__') and hasattr(input, '__len__') \
+      and not hasattr(input, 'keys')
+
+def _xseek(input, start):
+  """Return an iterator over a sequence, from index 'start' on.
+
+  The iterator of a builtin sequence is set to index 'start', and
+  other sequences are read by index, so the elements before 'start'
+  are neither read nor copied.  Either way, xsnapshot takes the
+  position of the iterator.
+  """
+
+  ret = iter(input)
+  if type(ret) in _xbuiltin_iterators:
+    ret.__setstate__(start)
+    return ret
+  return _xindexer(input, start)
+
+class _xindexer:
+  """Iterator over a sequence by index, with snapshot() and restore()."""
+
+  __slots__ = ('__seq', '__pos', '__end')
+
+  def __init__(self, seq, start):
+    self.__seq = seq
+    self.__pos = start
+    self.__end = len(seq)
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    pos = self.__pos
+    if pos >= self.__end:
+      raise StopIteration
+    self.__pos = pos + 1
+    return self.__seq[pos]
+
+  def __length_hint__(self):
+    return max(self.__end - self.__pos, 0)
+
+  def snapshot(self):
+    return self.__pos
+
+  def restore(self, state):
+    self.__pos = state
+    return self
@@ -13,7 +13,7 @@ Definitions:
     from its own PyX input(s).
 
 Notes:
-  Any sequence type, xrange, and xreadlines are PyX inputs.
+  Any sequence type, range, and file objects are PyX inputs.
 
 PyX Classes (each has its own __doc__):
   xcat -- Append input sequences end-to-end.
@@ -21,13 +21,357 @@ PyX Classes (each has its own __doc__):
   xmap -- Apply a function to input sequences until all of them are done.
   xmap_trim -- Apply a function to input sequences until any one is done.
   xunique -- Remove consecutive runs of equal elements in a sequence.
+  xdistinct -- Remove all repeated elements of a sequence.
+  xgroupby -- Summarize consecutive runs of equal elements in a sequence.
   xhead -- Copy part of an input sequence.
   xtail -- Copy last part of an input sequence.
   xfill -- Pad the ending of an input sequence.
+
+Aggregators for xgroupby (each has its own __doc__):
+  xaggregate -- Base class of the aggregators; counts a run.
+  xcount -- Count the elements of a run.
+  xsum -- Add up the elements of a run.
+  xmin, xmax -- Smallest or largest element of a run.
+  xfirst, xlast -- First or last element of a run.
+  xgroup -- List of the elements of a run.
 """
 
-from xcompatibility import *
-import xbase
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase, xsorted
+import itertools
+import math
+import operator
+import pickle
+import tempfile
+
+# The number of files xdistinct partitions its input into, when the
+#  keys do not fit in memory.
+XDISTINCT_PARTITIONS = 16
+
+# The deepest xdistinct partitions a partition that is still too large.
+XDISTINCT_DEPTH = 4
+
+#
+# Helper functions
+#
+
+def _xtake(bound, n):
+  """Return (count, rest): how many times, up to n, 'bound' can be
+  decremented by 1 while > 0, and what is left of it after that."""
+
+  if isinstance(bound, int):
+    count = min(n, max(bound, 0))
+    return (count, bound - count)
+  count = 0
+  while count < n and bound > 0:
+    bound -= 1
+    count += 1
+  return (count, bound)
+
+def _xhint(input):
+  """Return the length hint of an input, or -1 if it has none."""
+
+  return operator.length_hint(input, -1)
+
+def _xhints(inputs):
+  """Return the length hints of some inputs, or None if any has none."""
+
+  hints = [_xhint(x) for x in inputs]
+  if -1 in hints:
+    return None
+  return hints
+
+def _xmix(key):
+  """Return a well-mixed 64-bit hash of a key.
+
+  Uses the finalizer of SplitMix64, so that every bit of the result
+  depends on every bit of hash(key) (which is the integer itself for
+  small integers).
+  """
+
+  h = hash(key) & 0xFFFFFFFFFFFFFFFF
+  h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+  h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+  return h ^ (h >> 31)
+
+def _xpartition(triples, depth, tempdir):
+  """Write (index, key, element) triples to XDISTINCT_PARTITIONS
+  temporary files by the hash of their keys; return the files, rewound.
+
+  Each file holds a sequence of pickled lists of triples, in the order
+  they were read, as _xspill writes them.  Each depth uses its own
+  digit (base XDISTINCT_PARTITIONS) of the mixed hash, so the keys of
+  one partition are spread over all the partitions of the next depth.
+  """
+
+  scale = XDISTINCT_PARTITIONS ** depth
+  files = [tempfile.TemporaryFile(dir = tempdir) for i in range(XDISTINCT_PARTITIONS)]
+  buffers = [[] for i in range(XDISTINCT_PARTITIONS)]
+  for t in triples:
+    i = _xmix(t[1]) // scale % XDISTINCT_PARTITIONS
+    buffer = buffers[i]
+    buffer.append(t)
+    if len(buffer) == xbase.XBATCH_SIZE:
+      pickle.dump(buffer, files[i], pickle.HIGHEST_PROTOCOL)
+      buffers[i] = []
+  for file, buffer in zip(files, buffers):
+    if buffer:
+      pickle.dump(buffer, file, pickle.HIGHEST_PROTOCOL)
+    file.seek(0)
+  return files
+
+def _xdistinct_runs(triples, max_entries, depth, tempdir, runs):
+  """Add the runs of the triples whose keys occur first to 'runs'.
+
+  Each run is a rewound file of triples (as _xspill writes them), in
+  index order; see _xadd_run.  If more than 'max_entries' keys are
+  found, the triples are partitioned again, and each partition gives
+  its own runs.  At XDISTINCT_DEPTH, the triples are not partitioned
+  again, however many keys they have.
+  """
+
+  seen, out = set(), []
+  triples = iter(triples)
+  for t in triples:
+    k = t[1]
+    if k in seen:
+      continue
+    if len(seen) >= max_entries and depth < XDISTINCT_DEPTH:
+      # The triples kept so far come first in each new partition, so
+      #  the partitions stay in index order.
+      files = _xpartition(itertools.chain(out, [t], triples), depth + 1, tempdir)
+      del seen, out
+      for file in files:
+        _xdistinct_runs(xsorted._xrun(file), max_entries, depth + 1, tempdir, runs)
+      return
+    seen.add(k)
+    out.append(t)
+  if out:
+    _xadd_run(runs, xsorted._xspill(out, tempdir), tempdir)
+
+def _xmerge_runs(runs):
+  """Merge runs of triples into index order."""
+
+  return xsorted.xmerge_many(*[xsorted._xrun(x) for x in runs],
+                             key = operator.itemgetter(0))
+
+def _xadd_run(runs, run, tempdir):
+  """Add a run of triples to 'runs', a list of (level, run) pairs.
+
+  As in xsorted.xsort, once the last XSORT_FANIN runs are of one
+  level, they are merged into a run of the next level, so the number
+  of runs stays logarithmic in the size of the input.
+  """
+
+  fanin = xsorted.XSORT_FANIN
+  runs.append((0, run))
+  while len(runs) >= fanin and runs[-fanin][0] == runs[-1][0]:
+    level = runs[-1][0]
+    group = [x for l, x in runs[-fanin:]]
+    del runs[-fanin:]
+    runs.append((level + 1, xsorted._xspill(_xmerge_runs(group), tempdir)))
+
+#
+# Helper classes
+#
+
+class _xbloom:
+  """Bloom filter over hashable keys.
+
+  Sized for 'capacity' keys at a false positive rate of 'error_rate';
+  its memory does not grow as keys are added.
+  """
+
+  __slots__ = ('__bits', '__size', '__hashes')
+
+  def __init__(self, capacity, error_rate):
+    if not 0 < error_rate < 1:
+      raise ValueError('error rate must be between 0 and 1, not %r' % (error_rate,))
+    size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    self.__size = max(size, 8)
+    self.__hashes = max(int(round(self.__size / max(capacity, 1) * math.log(2))), 1)
+    self.__bits = bytearray((self.__size + 7) // 8)
+
+  def add(self, k):
+    """Add a key; return 1 if it was (probably) added before."""
+    # Double hashing: the probes are h1, h1 + h2, h1 + 2*h2, ...
+    h = hash((k,)) & 0xFFFFFFFFFFFFFFFF
+    h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+    bits, size = self.__bits, self.__size
+    found = 1
+    for i in range(self.__hashes):
+      pos = (h1 + i * h2) % size
+      mask = 1 << (pos & 7)
+      if not bits[pos >> 3] & mask:
+        bits[pos >> 3] |= mask
+        found = 0
+    return found
+
+#
+# Aggregators
+#
+
+class xaggregate:
+  """Base class of the aggregators of xgroupby.
+
+  An aggregator summarizes a run of elements as they are read, one
+  element at a time, without keeping the run.  It keeps no state of
+  its own: xgroupby holds the state of the current run, and passes it
+  to each method.  Derived classes override:
+    start(self, x) -- Returns the state of a run whose first element
+      is 'x'.
+    add(self, state, x) -- Returns the state after one more element.
+    add_repeats(self, state, x, n) -- Returns the state after 'n'
+      more elements, each the same object as 'x', which was the
+      last element added.  The default calls add() n times.
+    result(self, state) -- Returns the summary of the run.
+  The defaults of start, add and result count the run, as xcount
+  does.
+  """
+
+  __slots__ = ()
+
+  def start(self, x):
+    return 1
+
+  def add(self, state, x):
+    return state + 1
+
+  def add_repeats(self, state, x, n):
+    for i in range(n):
+      state = self.add(state, x)
+    return state
+
+  def result(self, state):
+    return state
+
+class xcount (xaggregate):
+  """Counts the elements of a run."""
+
+  __slots__ = ()
+
+  def add_repeats(self, state, x, n):
+    return state + n
+
+class xsum (xaggregate):
+  """Adds up the elements of a run with '+'.
+
+  Optionally can take a key function, whose results are added up
+  instead of the elements.
+  """
+
+  __slots__ = ('__key',)
+
+  def __init__(self, key = None):
+    self.__key = key
+
+  def start(self, x):
+    if self.__key is None:
+      return x
+    return self.__key(x)
+
+  def add(self, state, x):
+    if self.__key is None:
+      return state + x
+    return state + self.__key(x)
+
+  def add_repeats(self, state, x, n):
+    v = self.start(x)
+    if type(v) is int:
+      return state + v * n
+    for i in range(n):
+      state = state + v
+    return state
+
+class xmin (xaggregate):
+  """Smallest element of a run (the first, if several are smallest).
+
+  Optionally can take a key function, as the builtin 'min' does.
+  """
+
+  __slots__ = ('__key',)
+
+  def __init__(self, key = None):
+    self.__key = key
+
+  def start(self, x):
+    return x
+
+  def add(self, state, x):
+    key = self.__key
+    if key is None:
+      return x if x < state else state
+    return x if key(x) < key(state) else state
+
+  def add_repeats(self, state, x, n):
+    return state
+
+class xmax (xaggregate):
+  """Largest element of a run (the first, if several are largest).
+
+  Optionally can take a key function, as the builtin 'max' does.
+  """
+
+  __slots__ = ('__key',)
+
+  def __init__(self, key = None):
+    self.__key = key
+
+  def start(self, x):
+    return x
+
+  def add(self, state, x):
+    key = self.__key
+    if key is None:
+      return x if state < x else state
+    return x if key(state) < key(x) else state
+
+  def add_repeats(self, state, x, n):
+    return state
+
+class xfirst (xaggregate):
+  """First element of a run."""
+
+  __slots__ = ()
+
+  def start(self, x):
+    return x
+
+  def add(self, state, x):
+    return state
+
+  def add_repeats(self, state, x, n):
+    return state
+
+class xlast (xaggregate):
+  """Last element of a run."""
+
+  __slots__ = ()
+
+  def start(self, x):
+    return x
+
+  def add(self, state, x):
+    return x
+
+  def add_repeats(self, state, x, n):
+    return x
+
+class xgroup (xaggregate):
+  """List of the elements of a run."""
+
+  __slots__ = ()
+
+  def start(self, x):
+    return [x]
+
+  def add(self, state, x):
+    state.append(x)
+    return state
+
+  def add_repeats(self, state, x, n):
+    state.extend([x] * n)
+    return state
 
 #
 # Pipe Algorithm classes
@@ -44,6 +388,13 @@ class xcat (xbase.xbase):
     set_inputs(self, *inputs) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xcat([1, 3, 5], [2, 4, 6])]
@@ -52,25 +403,56 @@ class xcat (xbase.xbase):
     [1, 2, 6, 4, 3, 5, 7]
   """
 
+  __slots__ = ('__in', '__len_in', '__which')
+
   def __init__(self, *inputs):
-    self.__in = map(iter, inputs)
+    self.__in = [iter(x) for x in inputs]
     self.__len_in = len(inputs)
     self.__which = 0
 
-  def next(self):
+  def __next__(self):
     while 1:
       if self.__which == self.__len_in:
         raise StopIteration
       try:
-        return self.__in[self.__which].next()
+        return next(self.__in[self.__which])
       except StopIteration:
         self.__which += 1
 
   def set_inputs(self, *inputs):
-    self.__in = map(iter, inputs)
+    self.__in = [iter(x) for x in inputs]
     self.__len_in = len(inputs)
     return self
 
+  def describe(self):
+    return ('xcat', tuple(self.__in[self.__which:]), {})
+
+  def __length_hint__(self):
+    hints = _xhints(self.__in[self.__which:])
+    if hints is None:
+      return NotImplemented
+    return sum(hints)
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    ret = []
+    while self.__which != self.__len_in:
+      ret.extend(xbase.xbatch(self.__in[self.__which], n - len(ret)))
+      if len(ret) == n:
+        break
+      self.__which += 1
+    return ret
+
+  def snapshot(self):
+    which = self.__which
+    return (which, [xbase.xsnapshot(x) for x in self.__in[which:]])
+
+  def restore(self, state):
+    which, positions = state
+    self.__which = which
+    for x, pos in zip(self.__in[which:], positions):
+      xbase.xrestore(x, pos)
+    return self
+
 class xfilter (xbase.xbase):
   """Filters an input sequence.
 
@@ -84,6 +466,13 @@ class xfilter (xbase.xbase):
     set_func(self, func) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xfilter(None, [0, 2, 0, 4, 6, 7])]
@@ -92,13 +481,15 @@ class xfilter (xbase.xbase):
     [<built-in function chr>, <built-in function ord>]
   """
 
+  __slots__ = ('__in', '__func')
+
   def __init__(self, func = None, input = None):
     self.__in = iter(input)
     self.__func = func
 
-  def next(self):
+  def __next__(self):
     while 1:
-      ret = self.__in.next()
+      ret = next(self.__in)
       if self.__func is None:
         if ret:
           return ret
@@ -113,6 +504,26 @@ class xfilter (xbase.xbase):
     self.__func = func
     return self
 
+  def describe(self):
+    return ('xfilter', (self.__in,), {'func': self.__func})
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    ret = []
+    while len(ret) < n:
+      want = n - len(ret)
+      batch = xbase.xbatch(self.__in, want)
+      ret.extend(filter(self.__func, batch))
+      if len(batch) < want:
+        break
+    return ret
+
+  def snapshot(self):
+    return xbase.xsnapshot(self.__in)
+
+  def restore(self, state):
+    xbase.xrestore(self.__in, state)
+    return self
+
 class xmap (xbase.xbase):
   """Applies a function over input sequences until all of them are done.
 
@@ -134,6 +545,13 @@ class xmap (xbase.xbase):
     set_replace(self, replace) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xmap(abs, [3, 0, -2, -1])]
@@ -148,26 +566,28 @@ class xmap (xbase.xbase):
     [10, 21, 11]
   """
 
+  __slots__ = ('__in', '__func', '__replace')
+
   def __init__(self, func = None, *inputs):
-    self.__in = map(iter, inputs)
+    self.__in = [iter(x) for x in inputs]
     self.__func = func
     self.__replace = None
 
-  def next(self):
+  def __next__(self):
     done = 1
     data_set = []
-    for i in xrange(len(self.__in)):
+    for i in range(len(self.__in)):
       try:
-        data_set.append(self.__in[i].next())
+        data_set.append(next(self.__in[i]))
         done = 0
       except StopIteration:
         data_set.append(self.__replace)
     if done:
       raise StopIteration
-    return apply(self.__func, data_set)
+    return self.__func(*data_set)
 
   def set_inputs(self, *inputs):
-    self.__in = map(iter, inputs)
+    self.__in = [iter(x) for x in inputs]
     return self
 
   def set_func(self, func):
@@ -178,6 +598,33 @@ class xmap (xbase.xbase):
     self.__replace = replace
     return self
 
+  def describe(self):
+    return ('xmap', tuple(self.__in), {'func': self.__func, 'replace': self.__replace})
+
+  def __length_hint__(self):
+    hints = _xhints(self.__in)
+    if hints is None:
+      return NotImplemented
+    return max(hints + [0])
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    batches = [xbase.xbatch(x, n) for x in self.__in]
+    size = max([len(x) for x in batches] + [0])
+    if not size:
+      return []
+    for x in batches:
+      if len(x) < size:
+        x.extend([self.__replace] * (size - len(x)))
+    return list(map(self.__func, *batches))
+
+  def snapshot(self):
+    return [xbase.xsnapshot(x) for x in self.__in]
+
+  def restore(self, state):
+    for x, pos in zip(self.__in, state):
+      xbase.xrestore(x, pos)
+    return self
+
 class xmap_trim (xbase.xbase):
   """Applies a function over input sequences until any of them are done.
 
@@ -186,12 +633,22 @@ class xmap_trim (xbase.xbase):
   The function is applied to the elements of the input sequences, in
   order.  The result sequence is the results of the function.
 
+  When an input runs out, __next__ has read one more element from each
+  input before it; next_batch may have read up to a batch more.
+
   Methods:
     __init__(self, func = None, *inputs)
     set_inputs(self, *inputs),
     set_func(self, func) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xmap_trim(abs, [3, 0, -2, -1])]
@@ -203,77 +660,437 @@ class xmap_trim (xbase.xbase):
     [10, 21]
   """
 
+  __slots__ = ('__in', '__func', '__replace')
+
   def __init__(self, func = None, *inputs):
-    self.__in = map(iter, inputs)
+    self.__in = [iter(x) for x in inputs]
     self.__func = func
     self.__replace = None
 
-  def next(self):
-    return apply(self.__func, [x.next() for x in self.__in])
+  def __next__(self):
+    return self.__func(*[next(x) for x in self.__in])
 
   def set_inputs(self, *inputs):
-    self.__in = map(iter, inputs)
+    self.__in = [iter(x) for x in inputs]
     return self
 
   def set_func(self, func):
     self.__func = func
     return self
 
+  def describe(self):
+    return ('xmap_trim', tuple(self.__in), {'func': self.__func})
+
+  def __length_hint__(self):
+    # With no inputs, the output sequence never ends
+    hints = _xhints(self.__in)
+    if not hints:
+      return NotImplemented
+    return min(hints)
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    if not self.__in:
+      return [self.__func() for i in range(n)]
+    batches = []
+    for x in self.__in:
+      # Read no more from each input than the shortest batch so far
+      batch = xbase.xbatch(x, n)
+      batches.append(batch)
+      n = len(batch)
+      if not n:
+        return []
+    return list(map(self.__func, *batches))
+
+  def snapshot(self):
+    return [xbase.xsnapshot(x) for x in self.__in]
+
+  def restore(self, state):
+    for x, pos in zip(self.__in, state):
+      xbase.xrestore(x, pos)
+    return self
+
 class xunique (xbase.xbase):
   """Removes consecutive equivalent values from a sequence.
 
-  xunique takes a single input sequence and an optional comparision
-  function.  It produces a sequence with all consecutive equivalent
-  values (as defined by the comparision function) reduced to one
-  value.
+  xunique takes a single input sequence, an optional comparision
+  function, and an optional key function.  It produces a sequence with
+  all consecutive equivalent values (as defined by the comparision
+  function, applied to the keys if a key function is given) reduced
+  to one value.  The key function is called exactly once for each
+  element.
 
   Stability: The reduced value in the output sequence is the first
   of the consecutive equivalent values in the input sequence.
 
   Methods:
-    __init__(self, input = None, comp = cmp)
+    __init__(self, input = None, comp = cmp, key = None)
     set_input(self, input),
-    set_comp(self, comp) --
+    set_comp(self, comp),
+    set_key(self, key) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
 
   Examples:
     >>> [x for x in xunique([1, 1, 2, 3])]
     [1, 2, 3]
+    >>> [x for x in xunique(['a', 'A', 'b', 'a'], key = str.lower)]
+    ['a', 'b', 'a']
     >>> a = []
     >>> b = []
     >>> [x for x in xunique([a, b])]
     [[]]
-    >>> result = xunique([a, b])[0]
+    >>> result = next(xunique([a, b]))
     >>> result
     []
     >>> result is a
-    1
+    True
     >>> result is b
-    0
+    False
   """
 
-  def __init__(self, input = None, comp = cmp):
-    self.__in = xbase.xsingle_buffer(input)
-    self.__comp = comp
+  __slots__ = ('__input', '__in', '__comp', '__key')
+
+  def __init__(self, input = None, comp = cmp, key = None):
+    self.__input = input
+    self.__comp, self.__key = comp, key
+    self.__in = None
 
-  def next(self):
+  def __next__(self):
+    if self.__in is None:
+      self.__in = xbase.xsingle_buffer(self.__input,
+                                       xbase.xsort_key(self.__comp, self.__key))
+    k = self.__in.get_key()
     ret = self.__in.consume()
     try:
-      while self.__comp(ret, self.__in.get()) == 0:
+      while self.__in.get_key() == k:
         self.__in.next()
     except StopIteration:
       pass
     return ret
 
   def set_input(self, input):
-    self.__in = xsingle_buffer(input)
+    self.__input = input
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xunique', (self.__input,), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__in is None:
+      return None
+    return self.__in.snapshot()
+
+  def restore(self, state):
+    if state is not None:
+      self.__in = xbase.xsingle_buffer(self.__input,
+                                       xbase.xsort_key(self.__comp, self.__key))
+      self.__in.restore(state)
+    return self
+
+class xgroupby (xbase.xbase):
+  """Summarizes consecutive runs of equivalent values in a sequence.
+
+  xgroupby takes a single input sequence, an optional comparision
+  function, and an optional key function, and finds the runs of
+  consecutive equivalent values as xunique does.  For each run, it
+  produces the tuple (first, count): the first element of the run,
+  and the number of elements in it.
+
+  After set_aggregate(aggregate), it produces (key, summary) instead:
+  the key of the run (its first element, without a key function), and
+  the result of the aggregator 'aggregate' (such as xsum() or
+  xgroup(); see xaggregate) over the elements of the run.  The run is
+  summarized as it is read, so it is never held in memory unless the
+  aggregator keeps it.
+
+  An element that is the same object as the element before it belongs
+  to the same run; the key function is not called for it, and it is
+  not compared.  So runs of repeated objects (such as None, small
+  integers or interned strings) cost little more than a loop.
+  Otherwise the key function is called once for each element.
+
+  Methods:
+    __init__(self, input = None, comp = cmp, key = None)
+    set_input(self, input),
+    set_comp(self, comp),
+    set_key(self, key),
+    set_aggregate(self, aggregate) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xgroupby([1, 1, 2, 3, 3, 3, 1])]
+    [(1, 2), (2, 1), (3, 3), (1, 1)]
+    >>> [x for x in xgroupby(['a', 'A', 'b'], key = str.lower)]
+    [('a', 2), ('b', 1)]
+    >>> import operator
+    >>> sales = [('ann', 3), ('ann', 4), ('bob', 5)]
+    >>> i = xgroupby(sales, key = operator.itemgetter(0))
+    >>> [x for x in i.set_aggregate(xsum(operator.itemgetter(1)))]
+    [('ann', 7), ('bob', 5)]
+    >>> [x for x in xgroupby([3, 1, 4, 1], key = lambda x: 0).set_aggregate(xmax())]
+    [(0, 4)]
+  """
+
+  __slots__ = ('__in', '__comp', '__key', '__aggregate', '__out')
+
+  def __init__(self, input = None, comp = cmp, key = None):
+    self.__in = iter(input)
+    self.__comp, self.__key = comp, key
+    self.__aggregate = None
+    self.__out = None
+
+  def __runs(self):
+    key = self.__key
+    wrap = self.__comp is not cmp and cmp_to_key(self.__comp) or None
+    aggregate = self.__aggregate
+    keyed = aggregate is not None
+    if aggregate is None:
+      aggregate = xcount()
+    start, add, add_repeats, result = aggregate.start, aggregate.add, \
+        aggregate.add_repeats, aggregate.result
+    last = empty = xbase._xempty
+    repeats = 0
+    for batch in xbase.xbatches(self.__in):
+      for x in batch:
+        if x is last:
+          repeats += 1
+          continue
+        if repeats:
+          state = add_repeats(state, last, repeats)
+          repeats = 0
+        k = x if key is None else key(x)
+        c = k if wrap is None else wrap(k)
+        if last is not empty and c == run:
+          state = add(state, x)
+        else:
+          if last is not empty:
+            yield ((run_key if keyed else first), result(state))
+          first, run_key, run, state = x, k, c, start(x)
+        last = x
+    if last is not empty:
+      if repeats:
+        state = add_repeats(state, last, repeats)
+      yield ((run_key if keyed else first), result(state))
+
+  def __next__(self):
+    out = self.__out
+    if out is None:
+      out = self.__out = self.__runs()
+    return next(out)
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    out = self.__out
+    if out is None:
+      out = self.__out = self.__runs()
+    return xbase.xbatch(out, n)
+
+  def set_input(self, input):
+    self.__in = iter(input)
     return self
 
   def set_comp(self, comp):
     self.__comp = comp
     return self
 
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def set_aggregate(self, aggregate):
+    self.__aggregate = aggregate
+    return self
+
+  def describe(self):
+    return ('xgroupby', (self.__in,),
+            {'comp': self.__comp, 'key': self.__key, 'aggregate': self.__aggregate})
+
+class xdistinct (xbase.xbase):
+  """Removes all repeated elements of a sequence.
+
+  xdistinct takes a single input sequence and an optional key
+  function.  It produces the elements of the input sequence whose
+  keys (or the elements themselves, without a key function) have not
+  occurred earlier in the input sequence.  The keys must be hashable;
+  the key function is called once for each element.  Unlike xunique,
+  the input need not be sorted.
+
+  Stability: As for xunique, the element kept is the first of the
+  equivalent elements, and the output sequence is in input order.
+
+  The keys seen are kept in a set.  If 'max_entries' is given and the
+  set reaches that many keys, the elements kept so far are output as
+  they are read, but the rest of the input is read all at once: the
+  elements not already output are written to XDISTINCT_PARTITIONS
+  temporary files by the hash of their keys (so equal keys share a
+  file), each file is deduplicated in turn (and partitioned again if
+  it still has too many keys), and the results are merged back into
+  input order, XSORT_FANIN files at a time, as xsorted.xsort merges.
+  Elements and keys that are spilled must be picklable.  Temporary
+  files are created in the directory given to set_tempdir, or in the
+  default temporary directory.
+
+  Partitions are split at most XDISTINCT_DEPTH times, into at most
+  XDISTINCT_PARTITIONS ** (XDISTINCT_DEPTH + 1) (about a million)
+  partitions.  A partition of that depth is deduplicated in memory
+  however many keys it has, so there 'max_entries' no longer bounds
+  memory.  That happens when keys share their hash (or, for a small
+  'max_entries', most of it), or when the input has more than about
+  a million times 'max_entries' distinct keys.
+
+  After set_bloom(error_rate), the keys seen are kept in a Bloom
+  filter sized for 'max_entries' keys instead, and nothing is written
+  to disk.  Its memory is fixed, but an element may be dropped as a
+  repeat although its key is new: with at most 'max_entries' distinct
+  keys, this happens to a fraction of them no larger than
+  'error_rate'.  Repeated keys are always dropped.
+
+  Methods:
+    __init__(self, input = None, key = None, max_entries = None)
+    set_input(self, input),
+    set_key(self, key),
+    set_max_entries(self, max_entries),
+    set_bloom(self, error_rate),
+    set_tempdir(self, tempdir) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
+
+  Notes:
+    Raises ValueError when first read if 'max_entries' is less than 1,
+    or if set_bloom was called without 'max_entries', or with an error
+    rate not between 0 and 1.
+
+  Examples:
+    >>> [x for x in xdistinct([3, 1, 3, 2, 1])]
+    [3, 1, 2]
+    >>> [x for x in xdistinct(['a', 'B', 'A', 'b'], key = str.lower)]
+    ['a', 'B']
+    >>> [x for x in xdistinct([3, 1, 3, 2, 1, 4, 2], max_entries = 1)]
+    [3, 1, 2, 4]
+  """
+
+  __slots__ = ('__in', '__key', '__max_entries', '__bloom', '__tempdir', '__out')
+
+  def __init__(self, input = None, key = None, max_entries = None):
+    self.__in = iter(input)
+    self.__key = key
+    self.__max_entries = max_entries
+    self.__bloom = None
+    self.__tempdir = None
+    self.__out = None
+
+  def __start(self):
+    max_entries = self.__max_entries
+    if max_entries is not None and max_entries < 1:
+      raise ValueError('max_entries must be at least 1, not %r' % (max_entries,))
+    if self.__bloom is None:
+      self.__out = self.__exact()
+    else:
+      if self.__max_entries is None:
+        raise ValueError('a Bloom filter needs max_entries')
+      self.__out = self.__filtered(_xbloom(self.__max_entries, self.__bloom))
+    return self.__out
+
+  def __filtered(self, bloom):
+    key, add = self.__key, bloom.add
+    for x in self.__in:
+      if not add(x if key is None else key(x)):
+        yield x
+
+  def __exact(self):
+    key, max_entries = self.__key, self.__max_entries
+    seen = set()
+    input = self.__in
+    for x in input:
+      k = x if key is None else key(x)
+      if k in seen:
+        continue
+      if max_entries is not None and len(seen) >= max_entries:
+        break
+      seen.add(k)
+      yield x
+    else:
+      return
+    # Spill the rest of the input, less the keys already output, as
+    #  (index, key, element) triples
+    if key is None:
+      rest = enumerate(itertools.chain([x], input))
+      triples = ((i, y, y) for i, y in rest if y not in seen)
+    else:
+      rest = enumerate(itertools.chain([(k, x)], ((key(y), y) for y in input)))
+      triples = ((i, k, y) for i, (k, y) in rest if k not in seen)
+    tempdir = self.__tempdir
+    files = _xpartition(triples, 0, tempdir)
+    del seen
+    runs = []
+    for file in files:
+      _xdistinct_runs(xsorted._xrun(file), max_entries, 0, tempdir, runs)
+    runs = [x for l, x in runs]
+    fanin = xsorted.XSORT_FANIN
+    while len(runs) > fanin:
+      runs = [xsorted._xspill(_xmerge_runs(runs[i:i + fanin]), tempdir)
+              for i in range(0, len(runs), fanin)]
+    for t in _xmerge_runs(runs):
+      yield t[2]
+
+  def __next__(self):
+    out = self.__out
+    if out is None:
+      out = self.__start()
+    return next(out)
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    out = self.__out
+    if out is None:
+      out = self.__start()
+    return xbase.xbatch(out, n)
+
+  def set_input(self, input):
+    self.__in = iter(input)
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def set_max_entries(self, max_entries):
+    self.__max_entries = max_entries
+    return self
+
+  def set_bloom(self, error_rate):
+    self.__bloom = error_rate
+    return self
+
+  def set_tempdir(self, tempdir):
+    self.__tempdir = tempdir
+    return self
+
+  def describe(self):
+    return ('xdistinct', (self.__in,),
+            {'key': self.__key, 'max_entries': self.__max_entries, 'bloom': self.__bloom,
+             'tempdir': self.__tempdir})
+
 class xhead (xbase.xbase):
   """Copy part of an input sequence.
 
@@ -292,6 +1109,13 @@ class xhead (xbase.xbase):
     set_bound(self, bound)
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xhead([1, 1, 2, 3], 2)]
@@ -300,14 +1124,16 @@ class xhead (xbase.xbase):
     [1, 1, 2, 3]
   """
 
+  __slots__ = ('__in', '__bound')
+
   def __init__(self, input = None, bound = 0):
     self.__in = iter(input)
     self.__bound = bound
 
-  def next(self):
+  def __next__(self):
     if self.__bound > 0:
       self.__bound -= 1
-      return self.__in.next()
+      return next(self.__in)
     raise StopIteration
 
   def set_input(self, input):
@@ -318,6 +1144,29 @@ class xhead (xbase.xbase):
     self.__bound = bound
     return self
 
+  def describe(self):
+    return ('xhead', (self.__in,), {'bound': self.__bound})
+
+  def __length_hint__(self):
+    hint = _xhint(self.__in)
+    if hint < 0:
+      return NotImplemented
+    return _xtake(self.__bound, hint)[0]
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    count, self.__bound = _xtake(self.__bound, n)
+    if not count:
+      return []
+    return xbase.xbatch(self.__in, count)
+
+  def snapshot(self):
+    return (self.__bound, xbase.xsnapshot(self.__in))
+
+  def restore(self, state):
+    self.__bound, pos = state
+    xbase.xrestore(self.__in, pos)
+    return self
+
 class xfill (xbase.xbase):
   """Pad the end of an input sequence.
 
@@ -339,6 +1188,11 @@ class xfill (xbase.xbase):
     set_fill(self, fill)
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
 
   Examples:
     >>> [x for x in xfill([1, 1, 2, 3], 2, 0)]
@@ -347,16 +1201,18 @@ class xfill (xbase.xbase):
     [1, 1, 2, 3, 0, 0, 0, 0, 0]
   """
 
+  __slots__ = ('__in', '__bound', '__fill')
+
   def __init__(self, input = None, bound = 0, fill = None):
     self.__in = iter(input)
     self.__bound = bound
     self.__fill = fill
 
-  def next(self):
+  def __next__(self):
     if self.__bound > 0:
       self.__bound -= 1
       try:
-        return self.__in.next()
+        return next(self.__in)
       except StopIteration:
         return self.__fill
     raise StopIteration
@@ -373,6 +1229,23 @@ class xfill (xbase.xbase):
     self.__fill = fill
     return self
 
+  def describe(self):
+    return ('xfill', (self.__in,), {'bound': self.__bound, 'fill': self.__fill})
+
+  def __length_hint__(self):
+    # The output length depends only on the bound
+    if isinstance(self.__bound, int):
+      return max(self.__bound, 0)
+    return NotImplemented
+
+  def snapshot(self):
+    return (self.__bound, xbase.xsnapshot(self.__in))
+
+  def restore(self, state):
+    self.__bound, pos = state
+    xbase.xrestore(self.__in, pos)
+    return self
+
 class xtail (xbase.xbase):
   """Copy last part of an input sequence.
 
@@ -385,12 +1258,23 @@ class xtail (xbase.xbase):
   The numeric parameter may be of any type; it is decremented by 1 until
   less than or equal to 0.
 
+  If the input is a sequence (it supports len() and indexing), the
+  skipped elements are not read: the output starts at an index into
+  the sequence instead.  Other inputs are skipped a batch at a time.
+
   Methods:
     __init__(self, input = None, bound = 0)
     set_input(self, input),
     set_bound(self, bound)
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xtail([1, 1, 2, 3], 2)]
@@ -399,20 +1283,65 @@ class xtail (xbase.xbase):
     []
   """
 
+  __slots__ = ('__seq', '__skipped', '__in', '__bound')
+
   def __init__(self, input = None, bound = 0):
-    self.__in = iter(input)
+    self.set_input(input)
     self.__bound = bound
 
-  def next(self):
-    while self.__bound > 0:
-      self.__bound -= 1
-      self.__in.next()
-    return self.__in.next()
+  def __skip(self):
+    seq = self.__seq
+    if seq is not None:
+      self.__seq = None
+      count, self.__bound = _xtake(self.__bound, len(seq))
+      self.__skipped = count
+      self.__in = xbase._xseek(seq, count)
+      return
+    while 1:
+      count, self.__bound = _xtake(self.__bound, xbase.XBATCH_SIZE)
+      if not count or len(xbase.xbatch(self.__in, count)) < count:
+        return
+
+  def __next__(self):
+    if self.__bound > 0:
+      self.__skip()
+    return next(self.__in)
 
   def set_input(self, input):
-    self.__in = iter(input)
+    self.__seq = xbase._xis_sequence(input) and input or None
+    self.__skipped = None
+    if self.__seq is not None:
+      self.__in = xbase._xseek(input, 0)
+    else:
+      self.__in = iter(input)
     return self
 
   def set_bound(self, bound):
     self.__bound = bound
     return self
+
+  def describe(self):
+    return ('xtail', (self.__in,), {'bound': self.__bound})
+
+  def __length_hint__(self):
+    hint = _xhint(self.__in)
+    if hint < 0:
+      return NotImplemented
+    return hint - _xtake(self.__bound, hint)[0]
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    if self.__bound > 0:
+      self.__skip()
+    return xbase.xbatch(self.__in, n)
+
+  def snapshot(self):
+    return (self.__bound, self.__skipped, xbase.xsnapshot(self.__in))
+
+  def restore(self, state):
+    self.__bound, skipped, pos = state
+    if skipped is not None:
+      self.__skipped = skipped
+      self.__in = xbase._xseek(self.__seq, skipped)
+      self.__seq = None
+    xbase.xrestore(self.__in, pos)
+    return self
@@ -0,0 +1,725 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Columnar versions of some PyX algorithms.
+
+xmap builds an argument list for every element it outputs, and a
+pipeline of xbasic algorithms passes its elements one at a time.  The
+algorithms in this file pass batches of rows instead, each an
+xcolumns object holding one column per field: a list, an array.array
+or a NumPy array.  Each stage works on whole columns: xmap calls the
+builtin 'map' over the columns of a batch, xfilter selects rows with
+itertools.compress, and xhead slices the last batch it needs.  No
+stage allocates anything per row, except for the values it computes.
+
+A columnar pipeline starts with xto_columns, which reads ordinary PyX
+inputs into batches (one column per input), and ends with
+xfrom_columns, which produces rows again:
+    xfrom_columns(xmap(operator.add, xto_columns(a, b)), column = 0)
+has the same output sequence as xbasic.xmap_trim(operator.add, a, b).
+
+The batches of a columnar stream may have any size (empty batches
+are allowed and skipped); algorithms that combine several streams
+line up their rows across batch boundaries.  The algorithms in this
+file also declare the number of columns of their batches with a
+width() method, so that a stream with no rows at all still has a
+known shape; xmap pads a stream that ends before its first batch
+with that many columns, and raises ValueError if it has no width().
+
+NumPy is optional: if it cannot be imported, this module still loads,
+and its columns are lists or arrays from the array module.
+
+These classes are opt-in; to use them, import from xcolumnar:
+    from TBA.algorithms.xcolumnar import xto_columns, xmap, xfrom_columns
+
+Classes (each has its own __doc__):
+  xcolumns -- A batch of rows, stored as columns.
+
+PyX Classes (each has its own __doc__):
+  xto_columns -- Read input sequences into columnar batches.
+  xfrom_columns -- Read columnar batches as rows.
+  xmap -- Apply a function to the rows of columnar streams until all of
+    them are done.
+  xmap_trim -- Apply a function to the rows of columnar streams until
+    any one is done.
+  xfilter -- Filter the rows of a columnar stream.
+  xhead -- Copy the first rows of a columnar stream.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+from TBA.algorithms.xbasic import _xtake
+import array
+import itertools
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+#
+# Helper functions
+#
+# (array.array is filled faster from a list than from an iterator.)
+
+def _xis_array(column):
+  return numpy is not None and isinstance(column, numpy.ndarray)
+
+def _xconcat(columns):
+  """Return the columns appended end-to-end, as a column of the same type."""
+
+  if len(columns) == 1:
+    return columns[0]
+  if _xis_array(columns[0]):
+    return numpy.concatenate(columns)
+  ret = columns[0][:]
+  for x in columns[1:]:
+    ret.extend(x)
+  return ret
+
+def _xpad(column, size, replace):
+  """Return the column extended to 'size' elements with 'replace'.
+
+  The column keeps its type if 'replace' fits it; otherwise (None in
+  an array of numbers, say), the padded column is a list.
+  """
+
+  if len(column) == size:
+    return column
+  fill = _xfill_like(column, replace, size - len(column))
+  if fill is None:
+    return list(_xvalues(column)) + [replace] * (size - len(column))
+  if _xis_array(column):
+    return numpy.concatenate((column, fill))
+  return column + fill
+
+def _xfill_like(column, replace, count):
+  """Return 'count' copies of 'replace', in a column like 'column'.
+
+  Returns None if 'replace' cannot be stored in a typed column
+  without changing its value.
+  """
+
+  if not _xis_array(column) and not isinstance(column, array.array):
+    return [replace] * count
+  try:
+    if _xis_array(column):
+      fill = numpy.array([replace], column.dtype)
+    else:
+      fill = array.array(column.typecode, [replace])
+  except (TypeError, ValueError, OverflowError):
+    return None
+  value = _xvalues(fill)[0]
+  # (NaN is not equal to itself, but fits a column of floats.)
+  if value != replace and (value == value or replace == replace):
+    return None
+  if _xis_array(fill):
+    return numpy.repeat(fill, count)
+  return fill * count
+
+def _xcompress(column, mask):
+  """Return the elements of the column that have a true mask."""
+
+  if _xis_array(column):
+    return column[numpy.asarray(mask, bool)]
+  if isinstance(column, array.array):
+    return array.array(column.typecode, list(itertools.compress(column, mask)))
+  return list(itertools.compress(column, mask))
+
+def _xvalues(column):
+  """Return the column as a sequence of Python objects."""
+
+  if _xis_array(column):
+    return column.tolist()
+  return column
+
+def _xwidth(input):
+  """Return the number of columns a columnar stream declares, or None."""
+
+  width = getattr(input, 'width', None)
+  if width is None:
+    return None
+  return width()
+
+#
+# Helper classes
+#
+
+class _xreader:
+  """Reads rows from a columnar stream, in batches of any size."""
+
+  def __init__(self, input):
+    self.__in = iter(input)
+    self.__batch = None
+    self.__pos = 0
+    # The number of columns, as of the last batch read (even an empty
+    #  one); before any batch, as the stream declares it, if it does
+    self.width = _xwidth(input)
+
+  def available(self):
+    """Return the number of rows left in the current batch.
+
+    Reads the next non-empty batch if the current one is used up;
+    returns 0 when the stream is done.
+    """
+
+    while self.__batch is None or self.__pos == len(self.__batch):
+      try:
+        self.__batch = next(self.__in)
+      except StopIteration:
+        self.__batch = None
+        return 0
+      self.__pos = 0
+      self.width = len(self.__batch.columns)
+    return len(self.__batch) - self.__pos
+
+  def read(self, n):
+    """Return the next 'n' rows as an xcolumns, or fewer if the stream
+    is done.  Returns None if there are no rows left."""
+
+    pieces, count = [], 0
+    while count < n:
+      left = self.available()
+      if not left:
+        break
+      take = min(n - count, left)
+      batch, pos = self.__batch, self.__pos
+      if pos or take != len(batch):
+        batch = batch.slice(pos, pos + take)
+      pieces.append(batch)
+      self.__pos += take
+      count += take
+    if not pieces:
+      return None
+    if len(pieces) == 1:
+      return pieces[0]
+    return xcolumns(*[_xconcat(x) for x in zip(*[y.columns for y in pieces])])
+
+class _xmapper (xbase.xbase):
+  """Base class for the columnar mapping algorithms.
+
+  Derived classes define size(readers), which returns the number of
+  rows for the next output batch (0 when the output is done).
+  """
+
+  __slots__ = ('__in', '__inputs', '__func', '__typecode', '__vectorized')
+
+  def __init__(self, func, inputs):
+    self.__in = [_xreader(x) for x in inputs]
+    self.__inputs = inputs
+    self.__func = func
+    self.__typecode = None
+    self.__vectorized = 0
+
+  def __next__(self):
+    readers = self.__in
+    size = self.size(readers)
+    if not size:
+      raise StopIteration
+    columns = []
+    for x in readers:
+      batch = x.read(size)
+      if batch is None:
+        if x.width is None:
+          raise ValueError('cannot pad a columnar stream that ended before '
+                           'its first batch: its number of columns is unknown')
+        columns.extend([[self.get_replace()] * size] * x.width)
+      elif len(batch) < size:
+        columns.extend([_xpad(y, size, self.get_replace()) for y in batch.columns])
+      else:
+        columns.extend(batch.columns)
+    if self.__vectorized:
+      return xcolumns(numpy.asarray(self.__func(*columns)))
+    if self.__typecode is not None:
+      return xcolumns(array.array(self.__typecode, list(map(self.__func, *columns))))
+    return xcolumns(list(map(self.__func, *columns)))
+
+  def get_replace(self):
+    return None
+
+  def set_inputs(self, *inputs):
+    self.__in = [_xreader(x) for x in inputs]
+    self.__inputs = inputs
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_typecode(self, typecode):
+    self.__typecode = typecode
+    return self
+
+  def set_vectorized(self, vectorized):
+    self.__vectorized = vectorized
+    return self
+
+  def width(self):
+    return 1
+
+  def describe(self):
+    return ('xcolumnar.' + self.__class__.__name__, tuple(self.__inputs),
+            {'func': self.__func, 'typecode': self.__typecode,
+             'vectorized': self.__vectorized})
+
+#
+# Classes
+#
+
+class xcolumns:
+  """A batch of rows, stored as columns.
+
+  Each column is a list, an array.array or a one-dimensional NumPy
+  array, and all of them have the same length: the number of rows.
+  Row i is made of element i of every column.
+
+  Attributes:
+    columns -- The tuple of columns.
+
+  Methods:
+    __init__(self, *columns)
+    __len__(self) --
+      Returns the number of rows.
+    column(self, i) --
+      Returns column i.
+    rows(self) --
+      Returns an iterator over the rows, as tuples.
+    slice(self, start, stop) --
+      Returns the rows from start to stop, as an xcolumns.
+    compress(self, mask) --
+      Returns the rows whose element of 'mask' is true, as an xcolumns.
+
+  Examples:
+    >>> import array
+    >>> b = xcolumns(array.array('i', [1, 2, 3]), ['a', 'b', 'c'])
+    >>> len(b), b.column(0)
+    (3, array('i', [1, 2, 3]))
+    >>> [x for x in b.compress([1, 0, 1]).rows()]
+    [(1, 'a'), (3, 'c')]
+  """
+
+  def __init__(self, *columns):
+    self.columns = columns
+    if columns:
+      self.__len = len(columns[0])
+      for x in columns:
+        if len(x) != self.__len:
+          raise ValueError('columns have different lengths')
+    else:
+      self.__len = 0
+
+  def __len__(self):
+    return self.__len
+
+  def __repr__(self):
+    return 'xcolumns%r' % (self.columns,)
+
+  def column(self, i):
+    return self.columns[i]
+
+  def rows(self):
+    return zip(*[_xvalues(x) for x in self.columns])
+
+  def slice(self, start, stop):
+    return xcolumns(*[x[start:stop] for x in self.columns])
+
+  def compress(self, mask):
+    # A mask that is an iterator can only be read once
+    if not _xis_array(mask) and (len(self.columns) != 1 or _xis_array(self.columns[0])):
+      mask = list(mask)
+    return xcolumns(*[_xcompress(x, mask) for x in self.columns])
+
+#
+# Pipe Algorithm classes
+#
+
+class xto_columns (xbase.xbase):
+  """Read input sequences into columnar batches.
+
+  xto_columns takes any number of input sequences.  Its output
+  sequence is batches (xcolumns) of up to 'size' rows, with one column
+  for each input; together, the rows are those of zip(*inputs).  As
+  with xbasic.xmap_trim, the output is done when any input is done.
+
+  Each column is a list, unless a typecode is set for it: a typecode
+  from the array module makes the column an array.array.  With
+  set_numpy(1), each column is a NumPy array instead, of the dtype
+  given by its typecode (if it is not None).
+
+  Methods:
+    __init__(self, *inputs)
+    set_inputs(self, *inputs),
+    set_typecodes(self, *typecodes),
+    set_numpy(self, numpy),
+    set_size(self, size) --
+      Must be called before iteration begins.
+      Returns self.
+    width(self) --
+      Returns the number of columns: the number of inputs.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Notes:
+    When an input runs out, up to a batch more may have been read from
+    each input before it.
+
+  Examples:
+    >>> [x for x in xto_columns([1, 2, 3], 'abc').set_typecodes('i').set_size(2)]
+    [xcolumns(array('i', [1, 2]), ['a', 'b']), xcolumns(array('i', [3]), ['c'])]
+  """
+
+  __slots__ = ('__in', '__typecodes', '__numpy', '__size')
+
+  def __init__(self, *inputs):
+    self.__in = [iter(x) for x in inputs]
+    self.__typecodes = ()
+    self.__numpy = 0
+    self.__size = xbase.XBATCH_SIZE
+
+  def __next__(self):
+    if not self.__in:
+      raise StopIteration
+    n, batches = self.__size, []
+    for x in self.__in:
+      # Read no more from each input than the shortest batch so far
+      batch = xbase.xbatch(x, n)
+      batches.append(batch)
+      n = len(batch)
+      if not n:
+        raise StopIteration
+    typecodes = self.__typecodes
+    columns = []
+    for i in range(len(batches)):
+      batch = batches[i]
+      if len(batch) != n:
+        del batch[n:]
+      typecode = i < len(typecodes) and typecodes[i] or None
+      if self.__numpy:
+        if numpy is None:
+          raise ImportError('set_numpy(1) requires NumPy')
+        columns.append(numpy.array(batch, dtype = typecode))
+      elif typecode is not None:
+        columns.append(array.array(typecode, batch))
+      else:
+        columns.append(batch)
+    return xcolumns(*columns)
+
+  def set_inputs(self, *inputs):
+    self.__in = [iter(x) for x in inputs]
+    return self
+
+  def set_typecodes(self, *typecodes):
+    self.__typecodes = typecodes
+    return self
+
+  def set_numpy(self, numpy):
+    self.__numpy = numpy
+    return self
+
+  def set_size(self, size):
+    self.__size = size
+    return self
+
+  def width(self):
+    return len(self.__in)
+
+  def describe(self):
+    return ('xto_columns', tuple(self.__in),
+            {'typecodes': self.__typecodes, 'numpy': self.__numpy,
+             'size': self.__size})
+
+class xfrom_columns (xbase.xbase):
+  """Read columnar batches as rows.
+
+  xfrom_columns takes a columnar stream.  Its output sequence is the
+  rows of every batch, as tuples; or, if 'column' is not None, the
+  elements of that column alone.  Elements of NumPy columns are
+  output as Python numbers.
+
+  Methods:
+    __init__(self, input = None, column = None)
+    set_input(self, input),
+    set_column(self, column) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xfrom_columns([xcolumns([1, 2], 'ab'), xcolumns([3], 'c')])]
+    [(1, 'a'), (2, 'b'), (3, 'c')]
+    >>> [x for x in xfrom_columns([xcolumns([1, 2], 'ab')], 0)]
+    [1, 2]
+  """
+
+  __slots__ = ('__input', '__column', '__rows')
+
+  def __init__(self, input = None, column = None):
+    self.__input = input
+    self.__column = column
+    self.__rows = None
+
+  def __start(self):
+    column = self.__column
+    if column is None:
+      rows = map(xcolumns.rows, self.__input)
+    else:
+      rows = map(lambda x: _xvalues(x.columns[column]), self.__input)
+    self.__rows = itertools.chain.from_iterable(rows)
+
+  def __next__(self):
+    if self.__rows is None:
+      self.__start()
+    return next(self.__rows)
+
+  def set_input(self, input):
+    self.__input = input
+    return self
+
+  def set_column(self, column):
+    self.__column = column
+    return self
+
+  def describe(self):
+    return ('xfrom_columns', (self.__input,), {'column': self.__column})
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    if self.__rows is None:
+      self.__start()
+    return list(itertools.islice(self.__rows, n))
+
+class xmap (_xmapper):
+  """Applies a function to the rows of columnar streams until all of them
+  are done.
+
+  xmap takes a function and any number of columnar streams.  The
+  function is called with the fields of one row of every stream, in
+  order (so with one stream of two columns, it is called with two
+  arguments).  The output is a columnar stream with one column: the
+  results of the function.  When a stream is shorter than another,
+  its fields are replaced by the replacement value (by default None).
+  A typed column (an array.array or NumPy array) that is padded with
+  a replacement value its type cannot hold, such as None, is passed
+  to the function as a list.
+
+  The result column is a list; set_typecode makes it an array.array
+  of that typecode instead.  With set_vectorized(1), the function is
+  called once per output batch, with whole columns, and must return
+  a column (as a NumPy ufunc does).
+
+  Methods:
+    __init__(self, func = None, *inputs) --
+      Note that 'replace' is not a parameter; it *must* be set using
+        set_replace.
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_replace(self, replace),
+    set_typecode(self, typecode),
+    set_vectorized(self, vectorized) --
+      Must be called before iteration begins.
+      Returns self.
+    width(self) --
+      Returns the number of columns: 1.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import operator
+    >>> a = xto_columns([1, 2, 3], [4, 5, 6])
+    >>> [x for x in xfrom_columns(xmap(operator.add, a), 0)]
+    [5, 7, 9]
+    >>> a, b = xto_columns([2, 3]), xto_columns([5, 7, 11])
+    >>> [x for x in xfrom_columns(xmap(operator.mul, a, b).set_replace(1), 0)]
+    [10, 21, 11]
+  """
+
+  __slots__ = ('__replace',)
+
+  def __init__(self, func = None, *inputs):
+    _xmapper.__init__(self, func, inputs)
+    self.__replace = None
+
+  def size(self, readers):
+    return max([x.available() for x in readers] + [0])
+
+  def get_replace(self):
+    return self.__replace
+
+  def set_replace(self, replace):
+    self.__replace = replace
+    return self
+
+  def describe(self):
+    name, inputs, settings = _xmapper.describe(self)
+    settings['replace'] = self.__replace
+    return (name, inputs, settings)
+
+class xmap_trim (_xmapper):
+  """Applies a function to the rows of columnar streams until any of them
+  are done.
+
+  xmap_trim takes a function and any number of columnar streams, and
+  its output is that of xmap, up to the end of the shortest stream.
+  Each output batch is no longer than the current batch of any input,
+  so rows are never copied to line up the streams.
+
+  Methods:
+    __init__(self, func = None, *inputs)
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_typecode(self, typecode),
+    set_vectorized(self, vectorized) --
+      Must be called before iteration begins.
+      Returns self.
+    width(self) --
+      Returns the number of columns: 1.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import operator
+    >>> a, b = xto_columns([2, 3]), xto_columns([5, 7, 11])
+    >>> [x for x in xfrom_columns(xmap_trim(operator.mul, a, b), 0)]
+    [10, 21]
+  """
+
+  __slots__ = ()
+
+  def __init__(self, func = None, *inputs):
+    _xmapper.__init__(self, func, inputs)
+
+  def size(self, readers):
+    if not readers:
+      return 0
+    return min([x.available() for x in readers])
+
+class xfilter (xbase.xbase):
+  """Filters the rows of a columnar stream.
+
+  xfilter takes one columnar stream and a filtering function, which
+  is called with the fields of each row.  The output is a columnar
+  stream of the rows for which the function returns true, with all
+  their columns.  If the filtering function is None, the rows whose
+  first field is true are kept.
+
+  With set_vectorized(1), the function is called once per batch, with
+  whole columns, and must return a column of booleans.
+
+  Methods:
+    __init__(self, func = None, input = None)
+    set_input(self, input),
+    set_func(self, func),
+    set_vectorized(self, vectorized) --
+      Must be called before iteration begins.
+      Returns self.
+    width(self) --
+      Returns the number of columns of the input, or None if it does
+      not declare it.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> a = xto_columns([1, 2, 3, 4], 'abcd')
+    >>> [x for x in xfrom_columns(xfilter(lambda x, y: x % 2, a))]
+    [(1, 'a'), (3, 'c')]
+  """
+
+  __slots__ = ('__in', '__func', '__vectorized')
+
+  def __init__(self, func = None, input = None):
+    self.__in = iter(input)
+    self.__func = func
+    self.__vectorized = 0
+
+  def __next__(self):
+    while 1:
+      batch = next(self.__in)
+      columns = batch.columns
+      if not len(batch):
+        continue
+      if self.__func is None:
+        mask = columns[0]
+      elif self.__vectorized:
+        mask = self.__func(*columns)
+      else:
+        mask = map(self.__func, *columns)
+      ret = batch.compress(mask)
+      if len(ret):
+        return ret
+
+  def set_input(self, input):
+    self.__in = iter(input)
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_vectorized(self, vectorized):
+    self.__vectorized = vectorized
+    return self
+
+  def width(self):
+    return _xwidth(self.__in)
+
+  def describe(self):
+    return ('xcolumnar.xfilter', (self.__in,),
+            {'func': self.__func, 'vectorized': self.__vectorized})
+
+class xhead (xbase.xbase):
+  """Copy the first rows of a columnar stream.
+
+  xhead takes one columnar stream and a numeric parameter denoting how
+  many rows of output are to be generated, as xbasic.xhead does for
+  elements.  The last batch needed is sliced; no batch after it is
+  read.
+
+  Methods:
+    __init__(self, input = None, bound = 0)
+    set_input(self, input),
+    set_bound(self, bound) --
+      Must be called before iteration begins.
+      Returns self.
+    width(self) --
+      Returns the number of columns of the input, or None if it does
+      not declare it.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> a = xto_columns(range(10)).set_size(4)
+    >>> [len(x) for x in xhead(a, 6)]
+    [4, 2]
+  """
+
+  __slots__ = ('__in', '__bound')
+
+  def __init__(self, input = None, bound = 0):
+    self.__in = iter(input)
+    self.__bound = bound
+
+  def __next__(self):
+    if not self.__bound > 0:
+      raise StopIteration
+    batch = next(self.__in)
+    count, self.__bound = _xtake(self.__bound, len(batch))
+    if count < len(batch):
+      batch = batch.slice(0, count)
+    return batch
+
+  def set_input(self, input):
+    self.__in = iter(input)
+    return self
+
+  def set_bound(self, bound):
+    self.__bound = bound
+    return self
+
+  def width(self):
+    return _xwidth(self.__in)
+
+  def describe(self):
+    return ('xcolumnar.xhead', (self.__in,), {'bound': self.__bound})
@@ -6,40 +6,38 @@
 
 The definitions in this file must be at a reachable scope in all files
 defining PyX algorithms.  Thus, for any file containing a PyX algorithm,
-it should first do a 'from xcompatibility import *'.
+it should first do a 'from TBA.algorithms.xcompatibility import *'.
 
-Classes and functions are provided that allow PyX algorithms in
-versions of Python before 2.2.
+PyX algorithms implement the native iterator protocol ('__next__').
+This file provides the pieces of the Python 2 iterator world that PyX
+algorithms and their callers still rely on: the 'cmp' function (the
+default comparision object of every sorted algorithm), and
+'cmp_to_key' for turning any other comparision object into a key.
+
+Notes:
+  The PyX input restriction is unchanged: once an input has raised
+  StopIteration, any further calls to next() must also raise
+  StopIteration.  xbase.xbase also keeps the Python 2 spelling
+  'next()' as a method, for callers written against it.
 """
 
-import sys
-
-# Support for Pythons earlier than 2.2
-if sys.version_info[0] < 2 or (sys.version_info[0] == 2 and sys.version_info[1] < 2):
-  SUPPORT_SEQUENCE_ITER = 1
-else:
-  SUPPORT_SEQUENCE_ITER = 0
-
-#
-# Provide iterators if pre-2.2
-#
-
-if SUPPORT_SEQUENCE_ITER:
-  class StopIteration(Exception): pass
-  class __iter:
-    def __init__(self, seq):
-      self.__seq = seq
-      self.__i = -1
-    def __iter__(self): return self
-    def next(self):
-      # Note: we increment i *first* to allow xreadlines to work with
-      #   this class properly.
-      self.__i += 1
-      try:
-        return self.__seq[self.__i]
-      except IndexError:
-        raise StopIteration
-  def iter(seq):
-    if hasattr(seq, '__iter__'):
-      return seq.__iter__()
-    return __iter(seq)
+from functools import cmp_to_key
+
+__all__ = ['cmp', 'cmp_to_key']
+
+def cmp(x, y):
+  """Compare two objects, as the Python 2 builtin 'cmp' did.
+
+  Returns a negative number if x < y, zero if x == y, and a positive
+  number if x > y.
+
+  PyX algorithms recognize this function by identity: when it is the
+  comparision object, they compare elements with the builtin operators
+  instead of calling it.
+  """
+
+  if x < y:
+    return -1
+  if x > y:
+    return 1
+  return 0
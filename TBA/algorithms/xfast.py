@@ -0,0 +1,411 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Compiled versions of the PyX algorithms in xbasic.
+
+Each class in this file has the same name, constructor, set_* methods
+and output as the class of the same name in xbasic.  The difference
+is in how the elements are produced: the first time iteration starts,
+the configured algorithm is compiled into an itertools object (or a
+generator, where itertools has no equivalent), and every element is
+then produced by that object without a Python-level method call.
+
+These classes are opt-in; to use them, import from xfast instead of
+xbasic:
+    from TBA.algorithms.xfast import xcat, xfilter, xmap
+
+When one compiled algorithm is the input of another, the outer one
+iterates the inner one's compiled object directly, so a whole
+pipeline of compiled algorithms runs as nested itertools objects.
+
+Notes:
+  As with xbasic, the set_* methods must be called before iteration
+  begins; once an algorithm has been compiled, changing its settings
+  has no effect.
+
+PyX Classes (each has its own __doc__):
+  xcat -- Append input sequences end-to-end.
+  xfilter -- Filter an input sequence.
+  xmap -- Apply a function to input sequences until all of them are done.
+  xmap_trim -- Apply a function to input sequences until any one is done.
+  xunique -- Remove consecutive runs of equal elements in a sequence.
+  xhead -- Copy part of an input sequence.
+  xtail -- Copy last part of an input sequence.
+  xfill -- Pad the ending of an input sequence.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+import itertools
+import operator
+
+#
+# Helper functions
+#
+
+def _xcount(bound):
+  """Return how many times 'bound' can be decremented by 1 while > 0."""
+
+  if isinstance(bound, int):
+    return max(bound, 0)
+  n = 0
+  while bound > 0:
+    bound -= 1
+    n += 1
+  return n
+
+class _xcompiled (xbase.xbase):
+  """Base class for PyX algorithms compiled on first use.
+
+  Derived classes define compile(), which returns an iterator over
+  the output sequence.  It is called once, the first time either
+  __iter__ or __next__ is called.
+  """
+
+  __slots__ = ('__it',)
+
+  def __iter__(self):
+    try:
+      return self.__it
+    except AttributeError:
+      it = self.__it = self.compile()
+      return it
+
+  def __next__(self):
+    try:
+      it = self.__it
+    except AttributeError:
+      it = self.__iter__()
+    return next(it)
+
+#
+# Pipe Algorithm classes
+#
+
+class xcat (_xcompiled):
+  """Append input sequences end-to-end.
+
+  Compiles to itertools.chain.  See xbasic.xcat.
+
+  Methods:
+    __init__(self, *inputs)
+    set_inputs(self, *inputs) --
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in',)
+
+  def __init__(self, *inputs):
+    self.__in = inputs
+
+  def compile(self):
+    return itertools.chain(*self.__in)
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def describe(self):
+    return ('xcat', tuple(self.__in), {})
+
+class xfilter (_xcompiled):
+  """Filters an input sequence.
+
+  Compiles to the builtin 'filter'.  See xbasic.xfilter.
+
+  Methods:
+    __init__(self, func = None, input = None)
+    set_input(self, input),
+    set_func(self, func) --
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__func')
+
+  def __init__(self, func = None, input = None):
+    self.__in = input
+    self.__func = func
+
+  def compile(self):
+    return filter(self.__func, self.__in)
+
+  def set_input(self, input):
+    self.__in = input
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def describe(self):
+    return ('xfilter', (self.__in,), {'func': self.__func})
+
+class xmap (_xcompiled):
+  """Applies a function over input sequences until all of them are done.
+
+  Compiles to the builtin 'map' for a single input, and to
+  itertools.starmap over itertools.zip_longest otherwise.  See
+  xbasic.xmap.
+
+  Methods:
+    __init__(self, func = None, *inputs) --
+      Note that 'replace' is not a parameter; it *must* be set using
+        set_replace.
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_replace(self, replace) --
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__func', '__replace')
+
+  def __init__(self, func = None, *inputs):
+    self.__in = inputs
+    self.__func = func
+    self.__replace = None
+
+  def compile(self):
+    if len(self.__in) == 1:
+      return map(self.__func, self.__in[0])
+    return itertools.starmap(self.__func,
+        itertools.zip_longest(*self.__in, fillvalue = self.__replace))
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_replace(self, replace):
+    self.__replace = replace
+    return self
+
+  def describe(self):
+    return ('xmap', tuple(self.__in), {'func': self.__func, 'replace': self.__replace})
+
+class xmap_trim (_xcompiled):
+  """Applies a function over input sequences until any of them are done.
+
+  Compiles to the builtin 'map'.  See xbasic.xmap_trim.
+
+  Methods:
+    __init__(self, func = None, *inputs)
+    set_inputs(self, *inputs),
+    set_func(self, func) --
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__func')
+
+  def __init__(self, func = None, *inputs):
+    self.__in = inputs
+    self.__func = func
+
+  def compile(self):
+    if not self.__in:
+      # As in xbasic, a function of no inputs is called forever.
+      return itertools.starmap(self.__func, itertools.repeat(()))
+    return map(self.__func, *self.__in)
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def describe(self):
+    return ('xmap_trim', tuple(self.__in), {'func': self.__func})
+
+class xunique (_xcompiled):
+  """Removes consecutive equivalent values from a sequence.
+
+  Compiles to the first element of each group of itertools.groupby.
+  See xbasic.xunique.
+
+  Stability: The reduced value in the output sequence is the first
+  of the consecutive equivalent values in the input sequence.
+
+  Methods:
+    __init__(self, input = None, comp = cmp, key = None)
+    set_input(self, input),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__comp', '__key')
+
+  def __init__(self, input = None, comp = cmp, key = None):
+    self.__in = input
+    self.__comp, self.__key = comp, key
+
+  def compile(self):
+    groups = itertools.groupby(self.__in, xbase.xsort_key(self.__comp, self.__key))
+    return map(next, map(operator.itemgetter(1), groups))
+
+  def set_input(self, input):
+    self.__in = input
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xunique', (self.__in,), {'comp': self.__comp, 'key': self.__key})
+
+class xhead (_xcompiled):
+  """Copy part of an input sequence.
+
+  Compiles to itertools.islice.  See xbasic.xhead.
+
+  Methods:
+    __init__(self, input = None, bound = 0)
+    set_input(self, input),
+    set_bound(self, bound)
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__bound')
+
+  def __init__(self, input = None, bound = 0):
+    self.__in = input
+    self.__bound = bound
+
+  def compile(self):
+    return itertools.islice(self.__in, _xcount(self.__bound))
+
+  def set_input(self, input):
+    self.__in = input
+    return self
+
+  def set_bound(self, bound):
+    self.__bound = bound
+    return self
+
+  def describe(self):
+    return ('xhead', (self.__in,), {'bound': self.__bound})
+
+class xfill (_xcompiled):
+  """Pad the end of an input sequence.
+
+  Compiles to itertools.islice over the input followed by
+  itertools.repeat.  See xbasic.xfill.
+
+  Methods:
+    __init__(self, input = None, bound = 0, fill = None)
+    set_input(self, input),
+    set_bound(self, bound),
+    set_fill(self, fill)
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__bound', '__fill')
+
+  def __init__(self, input = None, bound = 0, fill = None):
+    self.__in = input
+    self.__bound = bound
+    self.__fill = fill
+
+  def compile(self):
+    return itertools.islice(itertools.chain(self.__in, itertools.repeat(self.__fill)),
+                            _xcount(self.__bound))
+
+  def set_input(self, input):
+    self.__in = input
+    return self
+
+  def set_bound(self, bound):
+    self.__bound = bound
+    return self
+
+  def set_fill(self, fill):
+    self.__fill = fill
+    return self
+
+  def describe(self):
+    return ('xfill', (self.__in,), {'bound': self.__bound, 'fill': self.__fill})
+
+class xtail (_xcompiled):
+  """Copy last part of an input sequence.
+
+  Compiles to itertools.islice, or over a sequence, to an iterator
+  starting at an index into it.  See xbasic.xtail.
+
+  Methods:
+    __init__(self, input = None, bound = 0)
+    set_input(self, input),
+    set_bound(self, bound)
+      Must be called before iteration begins.
+      Returns self.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+  """
+
+  __slots__ = ('__in', '__bound')
+
+  def __init__(self, input = None, bound = 0):
+    self.__in = input
+    self.__bound = bound
+
+  def compile(self):
+    if xbase._xis_sequence(self.__in):
+      return xbase._xseek(self.__in, _xcount(self.__bound))
+    return itertools.islice(self.__in, _xcount(self.__bound), None)
+
+  def set_input(self, input):
+    self.__in = input
+    return self
+
+  def set_bound(self, bound):
+    self.__bound = bound
+    return self
+
+  def describe(self):
+    return ('xtail', (self.__in,), {'bound': self.__bound})
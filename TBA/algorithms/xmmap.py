@@ -0,0 +1,264 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Memory-mapped file sources for PyX algorithms.
+
+A file object is a PyX input, but reading it allocates a new string
+for each line, copied out of the file's buffer.  The classes in this
+file map the whole file into memory instead (with mmap), and produce
+memoryview slices of the mapping, so no line or record is copied
+until it is used.
+
+The file is opened and mapped the first time an element is
+requested, and unmapped by close() (or when the source is garbage
+collected).  A memoryview slice is only valid while the mapping is;
+close() raises BufferError while any slice is still referenced.
+
+Both sources can be checkpointed (see xbase.xbase): their state is
+the offset, or record index, of the next element.
+
+memoryviews compare equal to each other (and to bytes), but are not
+ordered; to read lines into the algorithms in xsorted, give those
+algorithms the key function 'bytes'.
+
+PyX Classes (each has its own __doc__):
+  xmmap_lines -- Lines of a file, as memoryviews.
+  xmmap_records -- Fixed-width records of a file, decoded or as memoryviews.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+import mmap
+import operator
+import os
+import struct
+
+#
+# Helper classes
+#
+
+class _xmapped (xbase.xbase):
+  """Base class for sources reading a memory-mapped file.
+
+  Derived classes call map() before reading self.view.
+  """
+
+  __slots__ = ('__path', '__map', 'view')
+
+  def __init__(self, path):
+    self.__path = path
+    self.__map = None
+    self.view = None
+
+  def map(self):
+    with open(self.__path, 'rb') as file:
+      if os.fstat(file.fileno()).st_size:
+        self.__map = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+        self.view = memoryview(self.__map)
+      else:
+        # An empty file cannot be mapped
+        self.view = memoryview(b'')
+
+  def close(self):
+    if self.view is not None:
+      self.view.release()
+      self.view = None
+    if self.__map is not None:
+      self.__map.close()
+      self.__map = None
+
+  def set_path(self, path):
+    self.__path = path
+    return self
+
+  def get_path(self):
+    return self.__path
+
+#
+# Pipe Algorithm classes
+#
+
+class xmmap_lines (_xmapped):
+  """Lines of a file, as memoryviews.
+
+  The output sequence is the lines of the file at 'path', each a
+  memoryview slice of the mapped file, including its line ending (as
+  when iterating over a file opened in binary mode).
+
+  Methods:
+    __init__(self, path = None)
+    set_path(self, path) --
+      Must be called before iteration begins.
+      Returns self.
+    close(self) --
+      Unmaps the file.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+
+  Examples:
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile(delete = False) as file:
+    ...   n = file.write(b'one\\ntwo\\nthree')
+    >>> [bytes(x) for x in xmmap_lines(file.name)]
+    [b'one\\n', b'two\\n', b'three']
+  """
+
+  __slots__ = ('__pos',)
+
+  def __init__(self, path = None):
+    _xmapped.__init__(self, path)
+    self.__pos = 0
+
+  def __next__(self):
+    view = self.view
+    if view is None:
+      self.map()
+      view = self.view
+    pos = self.__pos
+    if pos >= len(view):
+      raise StopIteration
+    end = view.obj.find(b'\n', pos) + 1
+    if not end:
+      end = len(view)
+    self.__pos = end
+    return view[pos:end]
+
+  def describe(self):
+    return ('xmmap_lines', (), {'path': self.get_path()})
+
+  def snapshot(self):
+    return self.__pos
+
+  def restore(self, state):
+    self.__pos = state
+    return self
+
+class xmmap_records (_xmapped):
+  """Fixed-width records of a file, decoded or as memoryviews.
+
+  The file at 'path' is read as an array of records, each in the
+  struct module format 'struct_fmt'.  The output sequence is the
+  records, each decoded into a tuple by struct (as struct.iter_unpack
+  does).  After set_raw(1), each record is a memoryview slice of the
+  mapped file instead.
+
+  An xmmap_records is also a sequence: len() is the number of records,
+  and indexing decodes just the record asked for.  The algorithms in
+  xsorted recognize sequences, and search them by bisection instead of
+  reading every element; so a file of records sorted by their first
+  field can be joined with a short input while reading only a few
+  records of the file.  Indexing does not depend on, or change, how
+  far the output sequence has been read.
+
+  Methods:
+    __init__(self, path = None, struct_fmt = None)
+    set_path(self, path),
+    set_struct_fmt(self, struct_fmt),
+    set_raw(self, raw) --
+      Must be called before iteration begins.
+      Returns self.
+    __len__(self),
+    __getitem__(self, index) --
+      Sequence access to the records.
+    close(self) --
+      Unmaps the file.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+
+  Notes:
+    Raises ValueError when the file is first read, if its size is not
+    a multiple of the record size.
+
+  Examples:
+    >>> import struct, tempfile
+    >>> with tempfile.NamedTemporaryFile(delete = False) as file:
+    ...   n = file.write(struct.pack('<3i', 2, 3, 5))
+    >>> r = xmmap_records(file.name, '<i')
+    >>> len(r), r[-1]
+    (3, (5,))
+    >>> [x for x in r]
+    [(2,), (3,), (5,)]
+  """
+
+  __slots__ = ('__fmt', '__raw', '__start', '__it', '__struct', '__size', '__len')
+
+  def __init__(self, path = None, struct_fmt = None):
+    _xmapped.__init__(self, path)
+    self.__fmt = struct_fmt
+    self.__raw = 0
+    self.__start = 0
+    self.__it = None
+
+  def map(self):
+    _xmapped.map(self)
+    self.__struct = struct.Struct(self.__fmt)
+    self.__size = self.__struct.size
+    self.__len, rest = divmod(len(self.view), self.__size)
+    if rest:
+      raise ValueError('size of %r is not a multiple of the record size %d'
+                       % (self.get_path(), self.__size))
+
+  def __len__(self):
+    if self.view is None:
+      self.map()
+    return self.__len
+
+  def __getitem__(self, index):
+    if self.view is None:
+      self.map()
+    if index < 0:
+      index += self.__len
+    if not 0 <= index < self.__len:
+      raise IndexError('record index out of range')
+    start = index * self.__size
+    if self.__raw:
+      return self.view[start:start + self.__size]
+    return self.__struct.unpack_from(self.view, start)
+
+  def __begin(self):
+    if self.view is None:
+      self.map()
+    start = self.__start * self.__size
+    # Both iterators know how many records are left, for snapshot()
+    if self.__raw:
+      self.__it = iter(range(start, len(self.view), self.__size))
+    else:
+      self.__it = self.__struct.iter_unpack(self.view[start:])
+    return self.__it
+
+  def __next__(self):
+    it = self.__it
+    if it is None:
+      it = self.__begin()
+    if self.__raw:
+      start = next(it)
+      return self.view[start:start + self.__size]
+    return next(it)
+
+  def set_struct_fmt(self, struct_fmt):
+    self.__fmt = struct_fmt
+    return self
+
+  def set_raw(self, raw):
+    self.__raw = raw
+    return self
+
+  def describe(self):
+    return ('xmmap_records', (),
+            {'path': self.get_path(), 'struct_fmt': self.__fmt, 'raw': self.__raw})
+
+  def snapshot(self):
+    if self.__it is None:
+      return self.__start
+    return self.__len - operator.length_hint(self.__it)
+
+  def restore(self, state):
+    self.__start = state
+    return self
@@ -0,0 +1,498 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""NumPy versions of some PyX algorithms.
+
+Each class in this file has the same name, constructor, set_* methods
+and output as the class of the same name in xbasic or xsorted.  The
+difference is in how the output is computed: when the inputs are
+one-dimensional NumPy arrays (and the settings allow it), the whole
+output sequence is computed at once by NumPy, instead of one element
+at a time.  Otherwise, the class falls back to the pure-Python
+algorithm (the xfast or xsorted class of the same name), so these
+classes may be used whether or not their inputs are arrays.
+
+NumPy itself is optional: if it cannot be imported, this module still
+loads, and every class always falls back.
+
+These classes are opt-in; to use them, import from xnumpy:
+    from TBA.algorithms.xnumpy import xmap, xset_intersection
+
+Vectorized forms:
+  xmap, xfilter --
+    When every input is an array and the function is a NumPy ufunc
+    taking that many arguments, the function is called once, on the
+    whole arrays.  Other functions that work on whole arrays may be
+    declared with set_vectorized(1).
+  xset_union, xset_intersection, xset_difference,
+  xset_symmetric_difference --
+    When both inputs are sorted, unique arrays of numbers (booleans,
+    integers or floats) of the same dtype, and neither a comparision
+    object nor a key function is given, the output is computed with
+    searchsorted: each
+    element of one array is looked up in the other, at O(log n) cost
+    with no Python-level loop.  Unions are then merged by NumPy's
+    stable sort.
+
+Every class also has an array() method, which returns the output
+sequence as a NumPy array.  Iterating produces the elements of that
+array, as NumPy scalars; the pure-Python algorithms produce NumPy
+scalars too when their inputs are arrays, so the element types do not
+depend on whether the output was vectorized.
+
+PyX Classes (each has its own __doc__):
+  xmap -- Apply a function to input sequences until all of them are done.
+  xfilter -- Filter an input sequence.
+  xset_union -- Union two sorted, unique sequences (|).
+  xset_intersection -- Intersect two sorted, unique sequences (&).
+  xset_difference -- Difference two sorted, unique sequences (&~).
+  xset_symmetric_difference -- Symm. diff. two sorted, unique sequences (^).
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xfast, xsorted
+from TBA.algorithms.xfast import _xcompiled
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+#
+# Helper functions
+#
+
+def _xarrays(inputs, kinds = None):
+  """Return true if every input is a one-dimensional NumPy array.
+
+  If 'kinds' is given, the dtype kind of every array must also be
+  one of its characters.
+  """
+
+  if numpy is None:
+    return 0
+  for x in inputs:
+    if not isinstance(x, numpy.ndarray) or x.ndim != 1:
+      return 0
+    if kinds is not None and x.dtype.kind not in kinds:
+      return 0
+  return 1
+
+def _xufunc(func, nin):
+  """Return true if 'func' is a NumPy ufunc of 'nin' arguments and one result."""
+
+  return isinstance(func, numpy.ufunc) and func.nin == nin and func.nout == 1
+
+def _xcall(func, inputs, size):
+  """Call a vectorized function, and check that it returned 'size' elements."""
+
+  ret = numpy.asarray(func(*inputs))
+  if ret.shape != (size,):
+    raise ValueError('vectorized function returned shape %r for %d elements'
+                     % (ret.shape, size))
+  return ret
+
+def _xholds(inputs, value):
+  """Return true if the dtype of every array can hold 'value' unpromoted."""
+
+  try:
+    for x in inputs:
+      if numpy.result_type(x.dtype, value) != x.dtype or x.dtype.type(value) != value:
+        return 0
+  except (TypeError, ValueError, OverflowError):
+    return 0
+  return 1
+
+def _xfind(a, b):
+  """Return a mask of the elements of sorted array b that are in sorted array a."""
+
+  if not len(a):
+    return numpy.zeros(len(b), bool)
+  pos = numpy.searchsorted(a, b)
+  numpy.minimum(pos, len(a) - 1, out = pos)
+  return a[pos] == b
+
+def _xinsert(a, b):
+  """Merge sorted array b, none of whose elements are in a, into sorted array a."""
+
+  # NumPy's stable sort finds the two sorted runs and merges them in
+  #  linear time, which beats inserting at searchsorted positions.
+  ret = numpy.concatenate((a, b))
+  ret.sort(kind = 'stable')
+  return ret
+
+_xnumbers = 'biuf'
+
+class _xvector (_xcompiled):
+  """Base class for PyX algorithms with a NumPy form.
+
+  Derived classes define vector(), which returns the output sequence
+  as a NumPy array, or None if the inputs or settings do not allow
+  it; and scalar(), which returns the pure-Python PyX algorithm with
+  the same output sequence.
+  """
+
+  __slots__ = ()
+
+  def compile(self):
+    ret = self.vector()
+    if ret is None:
+      return iter(self.scalar())
+    return iter(ret)
+
+  def array(self):
+    if numpy is None:
+      raise ImportError('array() requires NumPy')
+    ret = self.vector()
+    if ret is None:
+      ret = numpy.array([x for x in self])
+    return ret
+
+#
+# Pipe Algorithm classes
+#
+
+class xmap (_xvector):
+  """Applies a function over input sequences until all of them are done.
+
+  See xbasic.xmap.  Vectorized when every input is an array and the
+  function is a ufunc (or is declared with set_vectorized); shorter
+  arrays are then padded with the replacement value, unless it is
+  None or their dtype cannot hold it (as an int64 array cannot hold
+  0.5), which would promote them.
+
+  Methods:
+    __init__(self, func = None, *inputs) --
+      Note that 'replace' is not a parameter; it *must* be set using
+        set_replace.
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_replace(self, replace),
+    set_vectorized(self, vectorized) --
+      Must be called before iteration begins.
+      Returns self.
+    vector(self) --
+      Returns the output as an array, or None if not vectorized.
+    array(self) --
+      Returns the output as an array.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import numpy
+    >>> xmap(numpy.add, numpy.array([1, 2, 3]), numpy.array([4, 5, 6])).array()
+    array([5, 7, 9])
+    >>> [int(x) for x in xmap(abs, numpy.array([-1, 2])).set_vectorized(1)]
+    [1, 2]
+  """
+
+  __slots__ = ('__in', '__func', '__replace', '__vectorized')
+
+  def __init__(self, func = None, *inputs):
+    self.__in = inputs
+    self.__func = func
+    self.__replace = None
+    self.__vectorized = 0
+
+  def vector(self):
+    inputs = self.__in
+    if not inputs or not _xarrays(inputs):
+      return None
+    if not self.__vectorized and not _xufunc(self.__func, len(inputs)):
+      return None
+    size = max([len(x) for x in inputs])
+    if min([len(x) for x in inputs]) != size:
+      if self.__replace is None or not _xholds(inputs, self.__replace):
+        return None
+      inputs = [numpy.concatenate((x, numpy.full(size - len(x), self.__replace, x.dtype)))
+                for x in inputs]
+    return _xcall(self.__func, inputs, size)
+
+  def scalar(self):
+    return xfast.xmap(self.__func, *self.__in).set_replace(self.__replace)
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_replace(self, replace):
+    self.__replace = replace
+    return self
+
+  def set_vectorized(self, vectorized):
+    self.__vectorized = vectorized
+    return self
+
+  def describe(self):
+    return ('xnumpy.xmap', tuple(self.__in),
+            {'func': self.__func, 'replace': self.__replace,
+             'vectorized': self.__vectorized})
+
+class xfilter (_xvector):
+  """Filters an input sequence.
+
+  See xbasic.xfilter.  Vectorized when the input is an array and the
+  function is None, a ufunc of one argument, or is declared with
+  set_vectorized; the result of the function is then used as a mask.
+
+  Methods:
+    __init__(self, func = None, input = None)
+    set_input(self, input),
+    set_func(self, func),
+    set_vectorized(self, vectorized) --
+      Must be called before iteration begins.
+      Returns self.
+    vector(self) --
+      Returns the output as an array, or None if not vectorized.
+    array(self) --
+      Returns the output as an array.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import numpy
+    >>> xfilter(None, numpy.array([0, 2, 0, 4])).array()
+    array([2, 4])
+    >>> [float(x) for x in xfilter(numpy.signbit, numpy.array([1.5, -2.0]))]
+    [-2.0]
+  """
+
+  __slots__ = ('__in', '__func', '__vectorized')
+
+  def __init__(self, func = None, input = None):
+    self.__in = input
+    self.__func = func
+    self.__vectorized = 0
+
+  def vector(self):
+    input, func = self.__in, self.__func
+    if not _xarrays([input]):
+      return None
+    if func is None:
+      return input[input.astype(bool)]
+    if not self.__vectorized and not _xufunc(func, 1):
+      return None
+    return input[_xcall(func, [input], len(input)).astype(bool)]
+
+  def scalar(self):
+    return xfast.xfilter(self.__func, self.__in)
+
+  def set_input(self, input):
+    self.__in = input
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_vectorized(self, vectorized):
+    self.__vectorized = vectorized
+    return self
+
+  def describe(self):
+    return ('xnumpy.xfilter', (self.__in,),
+            {'func': self.__func, 'vectorized': self.__vectorized})
+
+class _xset (_xvector):
+  """Base class for the sorted set algorithms.
+
+  Derived classes define 'algorithm' (the xsorted class) and
+  kernel(a, b), which computes the output from two sorted, unique
+  numeric arrays.
+  """
+
+  __slots__ = ('__input0', '__input1', '__comp', '__key')
+
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+
+  def vector(self):
+    if self.__comp is not cmp or self.__key is not None:
+      return None
+    if not _xarrays([self.__input0, self.__input1], _xnumbers):
+      return None
+    # NumPy would promote mixed dtypes (int32 and float64 to float64),
+    #  where the scalar algorithm keeps each element's own type.
+    if self.__input0.dtype != self.__input1.dtype:
+      return None
+    return self.kernel(self.__input0, self.__input1)
+
+  def scalar(self):
+    return self.algorithm(self.__input0, self.__input1, self.__comp, self.__key)
+
+  def set_input0(self, input0):
+    self.__input0 = input0
+    return self
+
+  def set_input1(self, input1):
+    self.__input1 = input1
+    return self
+
+  def set_inputs(self, input0, input1):
+    self.__input0, self.__input1 = input0, input1
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xnumpy.' + self.algorithm.__name__, (self.__input0, self.__input1),
+            {'comp': self.__comp, 'key': self.__key})
+
+class xset_union (_xset):
+  """Unions two sorted, unique sequences ("or").
+
+  See xsorted.xset_union.  Vectorized when both inputs are sorted,
+  unique numeric arrays of the same dtype and neither 'comp' nor
+  'key' is given.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    vector(self) --
+      Returns the output as an array, or None if not vectorized.
+    array(self) --
+      Returns the output as an array.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import numpy
+    >>> xset_union(numpy.array([1, 4]), numpy.array([2, 3, 4])).array()
+    array([1, 2, 3, 4])
+  """
+
+  __slots__ = ()
+
+  algorithm = xsorted.xset_union
+
+  def kernel(self, a, b):
+    return _xinsert(a, b[~_xfind(a, b)])
+
+class xset_intersection (_xset):
+  """Intersects two sorted, unique sequences ("and").
+
+  See xsorted.xset_intersection.  Vectorized when both inputs are
+  sorted, unique numeric arrays of the same dtype and neither 'comp'
+  nor 'key' is given; the elements of the shorter array are looked up in the
+  longer one.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    vector(self) --
+      Returns the output as an array, or None if not vectorized.
+    array(self) --
+      Returns the output as an array.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import numpy
+    >>> xset_intersection(numpy.array([1, 4]), numpy.array([2, 3, 4])).array()
+    array([4])
+  """
+
+  __slots__ = ()
+
+  algorithm = xsorted.xset_intersection
+
+  def kernel(self, a, b):
+    if len(a) <= len(b):
+      return a[_xfind(b, a)]
+    return b[_xfind(a, b)]
+
+class xset_difference (_xset):
+  """Differences two sorted, unique sequences ("and not").
+
+  See xsorted.xset_difference.  Vectorized when both inputs are
+  sorted, unique numeric arrays of the same dtype and neither 'comp'
+  nor 'key' is given.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    vector(self) --
+      Returns the output as an array, or None if not vectorized.
+    array(self) --
+      Returns the output as an array.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import numpy
+    >>> xset_difference(numpy.array([1, 4]), numpy.array([2, 3, 4])).array()
+    array([1])
+  """
+
+  __slots__ = ()
+
+  algorithm = xsorted.xset_difference
+
+  def kernel(self, a, b):
+    return a[~_xfind(b, a)]
+
+class xset_symmetric_difference (_xset):
+  """Symmetric differences two sorted, unique sequences ("xor").
+
+  See xsorted.xset_symmetric_difference.  Vectorized when both inputs
+  are sorted, unique numeric arrays of the same dtype and neither
+  'comp' nor 'key' is given.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    vector(self) --
+      Returns the output as an array, or None if not vectorized.
+    array(self) --
+      Returns the output as an array.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import numpy
+    >>> xset_symmetric_difference(numpy.array([1, 4]), numpy.array([2, 3, 4])).array()
+    array([1, 2, 3])
+  """
+
+  __slots__ = ()
+
+  algorithm = xsorted.xset_symmetric_difference
+
+  def kernel(self, a, b):
+    return _xinsert(a[~_xfind(b, a)], b[~_xfind(a, b)])
@@ -0,0 +1,316 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Parallel versions of the mapping PyX algorithms.
+
+xmap and xmap_trim call their function on the caller's thread, one
+element at a time.  The classes in this file call it on a pool of
+worker threads or processes instead, so that slow functions (file
+lookups, decompression, network requests) overlap.
+
+The inputs are still read on the caller's thread, as output is
+requested: at most 'max_inflight' calls are submitted ahead of the
+element being returned, so the inputs are never read far ahead,
+however long they are.
+
+If the function raises an exception, it is raised by __next__ at the
+position of the element whose call raised it; iteration may then
+continue with the next element, as with xmap.
+
+A pool the algorithm makes for itself is shut down when the output
+sequence is done.  An algorithm that is abandoned before then (by
+breaking out of a loop, or after an exception) must be closed, or
+the calls already submitted keep running and its workers stay alive
+until it is garbage collected; use it in a with statement, or call
+close():
+    with xmap_parallel(lookup, names) as results:
+      for x in results:
+        ...
+
+PyX Classes (each has its own __doc__):
+  xmap_parallel -- Apply a function to input sequences until all of
+    them are done, on a pool of workers.
+  xmap_trim_parallel -- Apply a function to input sequences until any
+    one is done, on a pool of workers.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+import collections
+import concurrent.futures
+import itertools
+import os
+
+#
+# Helper classes
+#
+
+class _xparallel (xbase.xbase):
+  """Base class for the parallel mapping algorithms.
+
+  Derived classes define arguments(inputs), which returns an iterator
+  over the argument tuples of the calls to the function.
+  """
+
+  __slots__ = ('__in', '__func', '__workers', '__executor', '__ordered',
+               '__max_inflight', '__pending', '__closed', '__owned',
+               '__limit', '__args', '__ready', '__pool')
+
+  def __init__(self, func, inputs, workers, executor, ordered, max_inflight):
+    self.__in = inputs
+    self.__func = func
+    self.__workers = workers
+    self.__executor = executor
+    self.__ordered = ordered
+    self.set_max_inflight(max_inflight)
+    self.__pending = None
+    self.__closed = 0
+
+  def __start(self):
+    executor, workers = self.__executor, self.__workers
+    if executor == 'thread':
+      self.__pool = concurrent.futures.ThreadPoolExecutor(workers)
+    elif executor == 'process':
+      self.__pool = concurrent.futures.ProcessPoolExecutor(workers)
+    elif isinstance(executor, str):
+      raise ValueError("executor must be 'thread', 'process' or an Executor, not %r"
+                       % (executor,))
+    else:
+      self.__pool = executor
+    self.__owned = isinstance(executor, str)
+    self.__limit = self.__max_inflight
+    if self.__limit is None:
+      self.__limit = 2 * (workers or os.cpu_count() or 1)
+    self.__args = self.arguments(self.__in)
+    self.__pending = collections.deque()
+    self.__ready = collections.deque()
+
+  def __fill(self):
+    # Submit calls until 'max_inflight' of them are waiting to be returned.
+    pending, ready = self.__pending, self.__ready
+    while self.__args is not None and len(pending) + len(ready) < self.__limit:
+      try:
+        x = next(self.__args)
+      except StopIteration:
+        self.__args = None
+        break
+      pending.append(self.__pool.submit(self.__func, *x))
+
+  def __wait(self):
+    # Move the calls that are done from 'pending' to 'ready', in the
+    #  order in which they were submitted.
+    done, not_done = concurrent.futures.wait(self.__pending,
+        return_when = concurrent.futures.FIRST_COMPLETED)
+    for x in self.__pending:
+      if x in done:
+        self.__ready.append(x)
+    self.__pending = collections.deque([x for x in self.__pending if x in not_done])
+
+  def __next__(self):
+    if self.__closed:
+      raise StopIteration
+    if self.__pending is None:
+      self.__start()
+    self.__fill()
+    if self.__ordered:
+      if not self.__pending:
+        self.close()
+        raise StopIteration
+      future = self.__pending.popleft()
+    else:
+      if not self.__ready:
+        if not self.__pending:
+          self.close()
+          raise StopIteration
+        self.__wait()
+      future = self.__ready.popleft()
+    return future.result()
+
+  def close(self):
+    if not self.__closed and self.__pending is not None:
+      for x in self.__pending:
+        x.cancel()
+      self.__pending.clear()
+      self.__ready.clear()
+      self.__args = None
+      if self.__owned:
+        self.__pool.shutdown(wait = False)
+      self.__pool = None
+    self.__closed = 1
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def __del__(self):
+    try:
+      self.close()
+    except AttributeError:
+      # __init__ did not finish
+      pass
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_func(self, func):
+    self.__func = func
+    return self
+
+  def set_workers(self, workers):
+    self.__workers = workers
+    return self
+
+  def set_executor(self, executor):
+    self.__executor = executor
+    return self
+
+  def set_ordered(self, ordered):
+    self.__ordered = ordered
+    return self
+
+  def set_max_inflight(self, max_inflight):
+    if max_inflight is not None and max_inflight < 1:
+      raise ValueError('max_inflight must be at least 1, not %r' % (max_inflight,))
+    self.__max_inflight = max_inflight
+    return self
+
+  def describe(self):
+    return (self.__class__.__name__, tuple(self.__in),
+            {'func': self.__func, 'workers': self.__workers,
+             'executor': self.__executor, 'ordered': self.__ordered,
+             'max_inflight': self.__max_inflight})
+
+#
+# Pipe Algorithm classes
+#
+
+class xmap_parallel (_xparallel):
+  """Applies a function over input sequences until all of them are done,
+  on a pool of workers.
+
+  xmap_parallel takes the same function, input sequences and
+  replacement value as xbasic.xmap, and its output sequence is the
+  same, except that with 'ordered' false, the results are output in
+  the order in which the calls finish.
+
+  Other settings:
+    workers --
+      The number of worker threads or processes.  Defaults to None,
+      which lets the pool choose.
+    executor --
+      'thread' (the default) for a pool of threads, 'process' for a
+      pool of processes, or a concurrent.futures.Executor to use.  A
+      pool made for 'thread' or 'process' is shut down when the
+      output sequence is done or close() is called (so an algorithm
+      abandoned before then must be closed); an Executor that is
+      passed in is left running.  With processes, the
+      function, its arguments and its results must be picklable.
+    ordered --
+      If true (the default), the results are output in input order.
+    max_inflight --
+      The largest number of calls that may be submitted but not yet
+      output, at least 1.  Defaults to None, which means twice the
+      number of workers (or of CPUs, if 'workers' is None).
+
+  Methods:
+    __init__(self, func = None, *inputs, workers = None,
+             executor = 'thread', ordered = 1, max_inflight = None) --
+      Note that 'replace' is not a parameter; it *must* be set using
+        set_replace.
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_replace(self, replace),
+    set_workers(self, workers),
+    set_executor(self, executor),
+    set_ordered(self, ordered),
+    set_max_inflight(self, max_inflight) --
+      Must be called before iteration begins.
+      Returns self.
+    close(self) --
+      Cancels the calls that have not started, shuts down a pool
+      that was made for 'thread' or 'process', and ends the output
+      sequence.  Also called when a with statement ends, and when
+      the algorithm is garbage collected.
+    __enter__(self), __exit__(self, *exc_info) --
+      Use the algorithm as a context manager; see the module __doc__.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import operator
+    >>> [x for x in xmap_parallel(operator.add, [1, 2, 3], [4, 5, 6], workers = 2)]
+    [5, 7, 9]
+    >>> [x for x in xmap_parallel(operator.mul, [2, 3], [5, 7, 11]).set_replace(1)]
+    [10, 21, 11]
+  """
+
+  __slots__ = ('__replace',)
+
+  def __init__(self, func = None, *inputs, workers = None, executor = 'thread',
+               ordered = 1, max_inflight = None):
+    _xparallel.__init__(self, func, inputs, workers, executor, ordered, max_inflight)
+    self.__replace = None
+
+  def arguments(self, inputs):
+    return itertools.zip_longest(*inputs, fillvalue = self.__replace)
+
+  def set_replace(self, replace):
+    self.__replace = replace
+    return self
+
+  def describe(self):
+    name, inputs, settings = _xparallel.describe(self)
+    settings['replace'] = self.__replace
+    return (name, inputs, settings)
+
+class xmap_trim_parallel (_xparallel):
+  """Applies a function over input sequences until any of them are done,
+  on a pool of workers.
+
+  xmap_trim_parallel takes the same function and input sequences as
+  xbasic.xmap_trim, and its output sequence is the same, except that
+  with 'ordered' false, the results are output in the order in which
+  the calls finish.  The other settings are those of xmap_parallel.
+
+  Methods:
+    __init__(self, func = None, *inputs, workers = None,
+             executor = 'thread', ordered = 1, max_inflight = None)
+    set_inputs(self, *inputs),
+    set_func(self, func),
+    set_workers(self, workers),
+    set_executor(self, executor),
+    set_ordered(self, ordered),
+    set_max_inflight(self, max_inflight) --
+      Must be called before iteration begins.
+      Returns self.
+    close(self) --
+      Cancels the calls that have not started, shuts down a pool
+      that was made for 'thread' or 'process', and ends the output
+      sequence.  Also called when a with statement ends, and when
+      the algorithm is garbage collected.
+    __enter__(self), __exit__(self, *exc_info) --
+      Use the algorithm as a context manager; see the module __doc__.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import operator
+    >>> [x for x in xmap_trim_parallel(operator.mul, [2, 3], [5, 7, 11])]
+    [10, 21]
+  """
+
+  __slots__ = ()
+
+  def __init__(self, func = None, *inputs, workers = None, executor = 'thread',
+               ordered = 1, max_inflight = None):
+    _xparallel.__init__(self, func, inputs, workers, executor, ordered, max_inflight)
+
+  def arguments(self, inputs):
+    if not inputs:
+      # As in xbasic, a function of no inputs is called forever.
+      return itertools.repeat(())
+    return zip(*inputs)
@@ -0,0 +1,292 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Fusion of pipelines of PyX algorithms.
+
+A pipeline built from xbasic (or xfast) algorithms, such as
+    xhead(xfill(xcat('R-', xtail(codes, 1)), 5, '0'), 5)
+passes every element through one __next__ call per stage.  xpipeline
+takes the outermost algorithm of such a pipeline, inspects the stages
+below it (through their describe() methods), and replaces adjacent
+stages by fused ones:
+  - a run of xfilter, xmap and xmap_trim stages on one input becomes
+    a single loop that applies every function in turn;
+  - a run of xhead and xtail stages becomes a single islice;
+  - xfill becomes a padded chain followed by an islice, and fuses
+    with the xhead and xtail stages around it;
+  - nested xcat stages become a single chain.
+Stages that cannot be fused (for instance the xsorted algorithms) are
+kept as they are, and become the sources of the fused stages above
+them.
+
+The fused plan can be inspected with plan() before iteration.
+
+PyX Classes (each has its own __doc__):
+  xpipeline -- Run a pipeline of PyX algorithms as fused loops.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+from TBA.algorithms.xfast import _xcompiled, _xcount
+import itertools
+import operator
+
+#
+# Plan construction
+#
+
+class _xstep:
+  """One step of a fused plan.
+
+  'op' describes the operation, 'stages' names the algorithms it
+  replaces (outermost first), 'inputs' holds the steps feeding it,
+  and 'build' makes its iterator from the iterators of its inputs.
+  """
+
+  def __init__(self, op, stages, inputs, build):
+    self.op, self.stages, self.inputs, self.build = op, stages, inputs, build
+
+def _xleaf(input):
+  """Return a step that iterates 'input' as it is."""
+
+  if isinstance(input, xbase.xbase):
+    label = input.describe()[0]
+  else:
+    label = type(input).__name__
+  return _xstep(label, [], [], lambda inputs: iter(input))
+
+# Stages with one input that may be fused with the stages around them.
+_xlinear = ('xfilter', 'xmap', 'xmap_trim', 'xhead', 'xtail', 'xfill', 'xunique')
+
+def _xoptimize(input):
+  """Return the fused plan for a PyX input."""
+
+  if not isinstance(input, xbase.xbase):
+    return _xleaf(input)
+  name, inputs, settings = input.describe()
+  if name == 'xpipeline':
+    return _xoptimize(inputs[0])
+  if name == 'xcat':
+    stages, steps = ['xcat'], []
+    for x in inputs:
+      step = _xoptimize(x)
+      if step.op == 'chain':
+        stages.extend(step.stages)
+        steps.extend(step.inputs)
+      else:
+        steps.append(step)
+    return _xstep('chain', stages, steps, lambda its: itertools.chain(*its))
+  if name in _xlinear and len(inputs) == 1:
+    # Walk down the run of single-input stages to the first one that
+    #  cannot be fused; it becomes the source of the fused steps.
+    ops = []
+    while name in _xlinear and len(inputs) == 1:
+      ops.append((name, settings))
+      input = inputs[0]
+      if not isinstance(input, xbase.xbase):
+        break
+      name, inputs, settings = input.describe()
+    ops.reverse()
+    return _xfuse(ops, _xoptimize(input))
+  if name == 'xmap':
+    func, replace = settings['func'], settings['replace']
+    return _xstep('starmap(zip_longest)', [name], [_xoptimize(x) for x in inputs],
+                  lambda its: itertools.starmap(func,
+                      itertools.zip_longest(*its, fillvalue = replace)))
+  if name == 'xmap_trim':
+    func = settings['func']
+    if not inputs:
+      return _xstep('starmap(repeat)', [name], [],
+                    lambda its: itertools.starmap(func, itertools.repeat(())))
+    return _xstep('map', [name], [_xoptimize(x) for x in inputs],
+                  lambda its: map(func, *its))
+  return _xleaf(input)
+
+def _xprimitives(ops):
+  """Translate (name, settings) pairs into primitive operations."""
+
+  ret = []
+  for name, settings in ops:
+    if name == 'xfilter':
+      ret.append(('filter', name, settings['func']))
+    elif name in ('xmap', 'xmap_trim'):
+      ret.append(('map', name, settings['func']))
+    elif name == 'xhead':
+      ret.append(('slice', name, (0, _xcount(settings['bound']))))
+    elif name == 'xtail':
+      ret.append(('slice', name, (_xcount(settings['bound']), None)))
+    elif name == 'xfill':
+      ret.append(('pad', name, settings['fill']))
+      ret.append(('slice', None, (0, _xcount(settings['bound']))))
+    elif name == 'xunique':
+      ret.append(('unique', name, xbase.xsort_key(settings['comp'], settings['key'])))
+  return ret
+
+def _xcompose(inner, outer):
+  """Return the single slice equivalent to slicing by 'inner', then 'outer'."""
+
+  (c, d), (a, b) = inner, outer
+  start, stop = c + a, d
+  if b is not None and (stop is None or c + b < stop):
+    stop = c + b
+  if stop is not None and stop < start:
+    # Empty; consume no more of the source than the inner slice did.
+    start = stop
+  return (start, stop)
+
+def _xfuse(ops, source):
+  """Return a plan applying 'ops' (innermost first) to 'source'."""
+
+  # Merge adjacent primitives: [kind, stage names, argument]
+  merged = []
+  for kind, stage, arg in _xprimitives(ops):
+    stages = stage and [stage] or []
+    if merged and kind in ('filter', 'map') and merged[-1][0] == 'loop':
+      merged[-1][1][:0] = stages
+      merged[-1][2].append((kind, arg))
+    elif kind in ('filter', 'map'):
+      merged.append(['loop', stages, [(kind, arg)]])
+    elif merged and kind == 'slice' and merged[-1][0] == 'slice':
+      merged[-1][1][:0] = stages
+      merged[-1][2] = _xcompose(merged[-1][2], arg)
+    else:
+      merged.append([kind, stages, arg])
+  step = source
+  for kind, stages, arg in merged:
+    step = _xmake(kind, stages, arg, step)
+  return step
+
+def _xmake(kind, stages, arg, source):
+  """Return the step for one merged primitive over 'source'."""
+
+  if kind == 'loop':
+    if len(arg) == 1:
+      op, func = arg[0]
+      if op == 'map':
+        build = lambda its: map(func, its[0])
+      else:
+        build = lambda its: filter(func, its[0])
+      return _xstep(op, stages, [source], build)
+    loop = _xloop(tuple([(op, func is None) for op, func in arg]))
+    funcs = [func for op, func in arg]
+    label = 'loop(%s)' % ', '.join([op for op, func in arg])
+    return _xstep(label, stages, [source], lambda its: loop(its[0], *funcs))
+  if kind == 'slice':
+    start, stop = arg
+    return _xstep('islice(%r, %r)' % (start, stop), stages, [source],
+                  lambda its: itertools.islice(its[0], start, stop))
+  if kind == 'pad':
+    return _xstep('pad(%r)' % (arg,), stages, [source],
+                  lambda its: itertools.chain(its[0], itertools.repeat(arg)))
+  return _xstep('groupby', stages, [source],
+                lambda its: map(next, map(operator.itemgetter(1),
+                                          itertools.groupby(its[0], arg))))
+
+_xloops = {}
+
+def _xloop(shape):
+  """Return a generator function running a run of map/filter steps.
+
+  'shape' is a tuple of (kind, is_none) pairs, innermost first.  The
+  generated function takes the source and one function per step, and
+  runs all of the steps in a single loop.  Functions are cached by
+  shape.
+  """
+
+  try:
+    return _xloops[shape]
+  except KeyError:
+    pass
+  names = ['f%d' % i for i in range(len(shape))]
+  lines = ['def loop(src, %s):' % ', '.join(names), '  for x in src:']
+  for name, (kind, is_none) in zip(names, shape):
+    if kind == 'map':
+      lines.append('    x = %s(x)' % name)
+    elif is_none:
+      lines.append('    if not x: continue')
+    else:
+      lines.append('    if not %s(x): continue' % name)
+  lines.append('    yield x')
+  namespace = {}
+  exec('\n'.join(lines) + '\n', namespace)
+  ret = _xloops[shape] = namespace['loop']
+  return ret
+
+def _xbuild(step):
+  """Return the iterator for a plan."""
+
+  return step.build([_xbuild(x) for x in step.inputs])
+
+def _xformat(step, depth, lines):
+  text = step.op
+  if step.stages:
+    text += ' <- ' + ', '.join(step.stages)
+  lines.append('  ' * depth + text)
+  for x in step.inputs:
+    _xformat(x, depth + 1, lines)
+
+#
+# Pipe Algorithm classes
+#
+
+class xpipeline (_xcompiled):
+  """Runs a pipeline of PyX algorithms as fused loops.
+
+  xpipeline takes the outermost algorithm of a pipeline.  Its output
+  sequence is the output sequence of that algorithm, produced by the
+  fused plan described in this module's __doc__.
+
+  The stages of the pipeline must not have been iterated yet.
+
+  Methods:
+    __init__(self, stage = None)
+    set_stage(self, stage) --
+      Must be called before iteration begins.
+      Returns self.
+    plan(self) --
+      Returns the fused plan as a string: one line per step, with the
+      algorithms each step replaces, and each step's inputs indented
+      below it.
+    compile(self) --
+      Returns the compiled iterator.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> from TBA.algorithms.xbasic import xhead, xtail, xmap, xfilter
+    >>> p = xpipeline(xhead(xtail(xmap(abs, xfilter(None, [0, -1, 2, -3])), 1), 5))
+    >>> print(p.plan())
+    islice(1, 6) <- xhead, xtail
+      loop(filter, map) <- xmap, xfilter
+        list_iterator
+    >>> [x for x in p]
+    [2, 3]
+  """
+
+  __slots__ = ('__stage', '__plan')
+
+  def __init__(self, stage = None):
+    self.__stage = stage
+    self.__plan = None
+
+  def __optimize(self):
+    if self.__plan is None:
+      self.__plan = _xoptimize(self.__stage)
+    return self.__plan
+
+  def compile(self):
+    return _xbuild(self.__optimize())
+
+  def plan(self):
+    lines = []
+    _xformat(self.__optimize(), 0, lines)
+    return '\n'.join(lines)
+
+  def set_stage(self, stage):
+    self.__stage = stage
+    self.__plan = None
+    return self
+
+  def describe(self):
+    return ('xpipeline', (self.__stage,), {})
@@ -0,0 +1,275 @@
+# Copyright (C) 2001, Stephen Cleary
+# All rights reserved.
+# See the file 'COPYRIGHT' for copyright and disclaimer information
+
+"""Per-stage profiling of pipelines of PyX algorithms.
+
+In a pipeline such as
+    xmerge(xfilter(ok, a), xmap(parse, b))
+every stage is just a __next__ call inside the stage above it, so a
+profiler sees one long chain of calls.  xprofile takes the outermost
+algorithm of a pipeline, walks the stages below it (through their
+describe() methods), and puts a probe on every edge of the pipeline:
+each probe counts the elements (or batches) passing up through it,
+and times the calls that produce them.  The functions, key functions
+and comparision objects given to the stages are wrapped to count
+their calls.
+
+Nothing is instrumented unless xprofile is used; the algorithms
+themselves keep no counters.  The instrumentation is done in place,
+through each stage's set_input (or set_inputs) and set_func,
+set_key and set_comp methods, so a profiled pipeline must not also be
+read directly.  Stages that do not describe their inputs, or have no
+method to set them, are profiled as a whole.
+
+For each stage, the report gives:
+  in -- the elements read from its inputs;
+  out -- the elements it produced;
+  selectivity -- out as a percentage of in (how much an xfilter or
+    xset_* algorithm keeps);
+  calls -- calls to its functions, key functions and comparision
+    objects;
+  time -- the time spent producing its output, including its inputs;
+  self -- that time, less the time spent in its inputs.
+Times include the probes' own overhead.  A probe hides the len() and
+indexing of a sequence, so sorted algorithms read profiled sequences
+one element at a time instead of searching them.
+
+PyX Classes (each has its own __doc__):
+  xprofile -- Run a pipeline of PyX algorithms, profiling each stage.
+"""
+
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+import operator
+import time
+
+#
+# Helper classes
+#
+
+class _xnode:
+  """Counters of one stage of a profiled pipeline."""
+
+  __slots__ = ('name', 'out', 'time', 'counters', 'inputs')
+
+  def __init__(self, name):
+    self.name = name
+    self.out = 0
+    self.time = 0.0
+    self.counters = []
+    self.inputs = []
+
+  def stats(self):
+    counts = {'out': self.out, 'time': self.time,
+              'calls': sum([x.count for x in self.counters])}
+    if self.inputs:
+      counts['in'] = sum([x.out for x in self.inputs])
+      counts['self_time'] = self.time - sum([x.time for x in self.inputs])
+    else:
+      counts['in'] = None
+      counts['self_time'] = self.time
+    return (self.name, counts, [x.stats() for x in self.inputs])
+
+class _xcounter:
+  """Function wrapper counting its calls."""
+
+  __slots__ = ('func', 'count')
+
+  def __init__(self, func):
+    self.func = func
+    self.count = 0
+
+  def __call__(self, *args):
+    self.count += 1
+    return self.func(*args)
+
+class _xprobe (xbase.xbase):
+  """PyX input counting and timing the elements read through it."""
+
+  __slots__ = ('__in', '__node')
+
+  def __init__(self, input, node):
+    self.__in = iter(input)
+    self.__node = node
+
+  def __next__(self):
+    node = self.__node
+    start = time.perf_counter()
+    try:
+      ret = next(self.__in)
+    finally:
+      node.time += time.perf_counter() - start
+    node.out += 1
+    return ret
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    node = self.__node
+    start = time.perf_counter()
+    try:
+      ret = xbase.xbatch(self.__in, n)
+    finally:
+      node.time += time.perf_counter() - start
+    node.out += len(ret)
+    return ret
+
+  def __length_hint__(self):
+    hint = operator.length_hint(self.__in, -1)
+    if hint < 0:
+      return NotImplemented
+    return hint
+
+  def describe(self):
+    return ('xprobe', (self.__in,), {})
+
+  def snapshot(self):
+    return xbase.xsnapshot(self.__in)
+
+  def restore(self, state):
+    xbase.xrestore(self.__in, state)
+    return self
+
+#
+# Helper functions
+#
+
+# Settings that hold functions, and are set through set_<name>.
+_xcounted = ('func', 'key', 'comp')
+
+def _xinstrument(input):
+  """Instrument a PyX input; return (probe over it, its _xnode)."""
+
+  if not isinstance(input, xbase.xbase):
+    node = _xnode(type(input).__name__)
+    return (_xprobe(input, node), node)
+  name, inputs, settings = input.describe()
+  node = _xnode(name)
+  if inputs:
+    if hasattr(input, 'set_inputs'):
+      setter = input.set_inputs
+    elif hasattr(input, 'set_input') and len(inputs) == 1:
+      setter = input.set_input
+    else:
+      setter = None
+    if setter is not None:
+      probes = []
+      for x in inputs:
+        probe, child = _xinstrument(x)
+        probes.append(probe)
+        node.inputs.append(child)
+      setter(*probes)
+  for key in _xcounted:
+    func = settings.get(key)
+    if func is None or (key == 'comp' and func is cmp):
+      continue
+    if hasattr(input, 'set_' + key):
+      counter = _xcounter(func)
+      getattr(input, 'set_' + key)(counter)
+      node.counters.append(counter)
+  return (_xprobe(input, node), node)
+
+def _xms(seconds):
+  return '%.3f ms' % (seconds * 1000.0)
+
+def _xformat(stats, depth, lines):
+  name, counts, inputs = stats
+  fields = []
+  if counts['in'] is not None:
+    fields.append('in %d' % counts['in'])
+  out = 'out %d' % counts['out']
+  if counts['in']:
+    out += ' (%.1f%%)' % (100.0 * counts['out'] / counts['in'])
+  fields.append(out)
+  if counts['calls']:
+    fields.append('calls %d' % counts['calls'])
+  fields.append('time ' + _xms(counts['time']))
+  if inputs:
+    fields.append('self ' + _xms(counts['self_time']))
+  lines.append('  ' * depth + name + ': ' + ', '.join(fields))
+  for x in inputs:
+    _xformat(x, depth + 1, lines)
+
+#
+# Pipe Algorithm classes
+#
+
+class xprofile (xbase.xbase):
+  """Runs a pipeline of PyX algorithms, profiling each stage.
+
+  xprofile takes the outermost algorithm of a pipeline.  Its output
+  sequence is the output sequence of that algorithm, read through the
+  probes described in this module's __doc__.
+
+  The stages of the pipeline must not have been iterated yet; they
+  are instrumented the first time any method below is called.
+
+  Methods:
+    __init__(self, stage = None)
+    set_stage(self, stage) --
+      Must be called before iteration begins.
+      Returns self.
+    stats(self) --
+      Returns the counters so far, as a tree of tuples
+      (name, counts, inputs): 'counts' is a dictionary with the
+      keys 'in' (None for a source that is not a PyX algorithm),
+      'out', 'calls', 'time' and 'self_time', in seconds; 'inputs'
+      is a list of the same tuples for the stage's inputs.
+    report(self) --
+      Returns the counters so far as a string: one line per stage,
+      with each stage's inputs indented below it.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
+
+  Examples:
+    >>> from TBA.algorithms.xbasic import xfilter, xmap
+    >>> p = xprofile(xmap(abs, xfilter(None, [0, -1, 2, 0, -3])))
+    >>> [x for x in p]
+    [1, 2, 3]
+    >>> name, counts, inputs = p.stats()
+    >>> name, counts['in'], counts['out'], counts['calls']
+    ('xmap', 3, 3, 3)
+    >>> name, counts, inputs = inputs[0]
+    >>> name, counts['in'], counts['out'], counts['calls']
+    ('xfilter', 5, 3, 0)
+  """
+
+  __slots__ = ('__stage', '__probe', '__node')
+
+  def __init__(self, stage = None):
+    self.set_stage(stage)
+
+  def __instrument(self):
+    self.__probe, self.__node = _xinstrument(self.__stage)
+    return self.__probe
+
+  def __next__(self):
+    probe = self.__probe
+    if probe is None:
+      probe = self.__instrument()
+    return next(probe)
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    probe = self.__probe
+    if probe is None:
+      probe = self.__instrument()
+    return probe.next_batch(n)
+
+  def stats(self):
+    if self.__probe is None:
+      self.__instrument()
+    return self.__node.stats()
+
+  def report(self):
+    lines = []
+    _xformat(self.stats(), 0, lines)
+    return '\n'.join(lines)
+
+  def set_stage(self, stage):
+    self.__stage = stage
+    self.__probe = None
+    return self
+
+  def describe(self):
+    return ('xprofile', (self.__stage,), {})
@@ -13,18 +13,238 @@ Definitions:
     from its own PyX input(s).
 
 Notes:
-  Any sequence type, xrange, and xreadlines are PyX inputs.
+  Any sequence type, range, and file objects are PyX inputs.
 
 PyX Classes (each has its own __doc__):
   xmerge -- Merge two sorted sequences.
+  xmerge_many -- Merge any number of sorted sequences.
+  xsort -- Sort a sequence, spilling sorted runs to temporary files.
   xset_union -- Union two sorted, unique sequences (|).
   xset_intersection -- Intersect two sorted, unique sequences (&).
   xset_difference -- Difference two sorted, unique sequences (&~).
   xset_symmetric_difference -- Symm. diff. two sorted, unique sequences (^).
+  xset_union_many -- Union any number of sorted, unique sequences.
+  xset_intersection_many -- Intersect any number of sorted, unique sequences.
+  xset_difference_many -- Difference any number of sorted, unique sequences.
+  xset_symmetric_difference_many -- Symm. diff. any number of sorted,
+    unique sequences.
+  xjoin -- Join two sorted sequences of records on their keys.
+
+Checkpointing:
+  xmerge, xmerge_many and the xset_* algorithms (except
+  xset_difference_many) define snapshot() and restore(), so a long
+  merge over files can be resumed; see xbase.xbase.  Sorted inputs
+  that are sequences are checkpointed by index, without reading them.
 """
 
-from xcompatibility import *
-import xbase
+from TBA.algorithms.xcompatibility import *
+from TBA.algorithms import xbase
+import bisect
+import heapq
+import pickle
+import sys
+import tempfile
+
+# The default memory limit of xsort, in bytes.
+XSORT_MEMORY = 64 * 1024 * 1024
+
+# The largest number of runs xsort merges at once.
+XSORT_FANIN = 64
+
+#
+# Helper functions
+#
+
+def _xheap_start(inputs, key):
+  """Return a heap holding the first element of each input.
+
+  Each heap entry is [key, index, value, iterator]; the index is
+  unique, so the values themselves are never compared, and ties
+  between keys go to the earliest input.
+  """
+
+  heap = []
+  for i in range(len(inputs)):
+    it = iter(inputs[i])
+    try:
+      x = next(it)
+    except StopIteration:
+      continue
+    if key is None:
+      heap.append([x, i, x, it])
+    else:
+      heap.append([key(x), i, x, it])
+  heapq.heapify(heap)
+  return heap
+
+def _xheap_advance(heap, key):
+  """Replace the top entry of a heap with the next element of its input."""
+
+  top = heap[0]
+  it = top[3]
+  try:
+    x = next(it)
+  except StopIteration:
+    heapq.heappop(heap)
+    return
+  if key is None:
+    heapq.heapreplace(heap, [x, top[1], x, it])
+  else:
+    heapq.heapreplace(heap, [key(x), top[1], x, it])
+
+def _xheap_snapshot(heap):
+  """Return the state of a heap from _xheap_start, for _xheap_restore.
+
+  The state holds the index, buffered element and position of each
+  input still in the heap; the other inputs are done.
+  """
+
+  return [(x[1], xbase._xsaved(x[2]), xbase.xsnapshot(x[3])) for x in heap]
+
+def _xheap_restore(inputs, key, state):
+  """Return a heap over 'inputs' in the state from _xheap_snapshot."""
+
+  heap = []
+  for i, x, pos in state:
+    it = xbase.xrestore(iter(inputs[i]), pos)
+    if key is None:
+      heap.append([x, i, x, it])
+    else:
+      heap.append([key(x), i, x, it])
+  heapq.heapify(heap)
+  return heap
+
+class _xstream_cursor (xbase.xsingle_buffer):
+  """Sorted PyX input with a single-element buffer and a seek operation.
+
+  "seek(k)" steps forward one element at a time.
+  """
+
+  __slots__ = ()
+
+  def seek(self, k):
+    """Skip elements whose keys are less than 'k'; return the new key."""
+    c = self.get_key()
+    while c < k:
+      self.next()
+      c = self.get_key()
+    return c
+
+class _xsequence_cursor:
+  """Sorted sequence with the same interface as _xstream_cursor.
+
+  "seek(k)" gallops: it probes exponentially increasing distances
+  ahead, then binary searches the last gap, so skipping n elements
+  costs O(log n) comparisions.
+  """
+
+  __slots__ = ('__seq', '__len', '__key', '__pos', '__key_pos', '__k')
+
+  def __init__(self, seq, key):
+    self.__seq = seq
+    self.__len = len(seq)
+    self.__key = key
+    self.__pos = 0
+    self.__key_pos = -1
+
+  def __key_at(self, i):
+    if self.__key is None:
+      return self.__seq[i]
+    return self.__key(self.__seq[i])
+
+  def get_key(self):
+    i = self.__pos
+    if i >= self.__len:
+      raise StopIteration
+    if self.__key is None:
+      return self.__seq[i]
+    if self.__key_pos != i:
+      self.__k = self.__key(self.__seq[i])
+      self.__key_pos = i
+    return self.__k
+
+  def get(self):
+    if self.__pos >= self.__len:
+      raise StopIteration
+    return self.__seq[self.__pos]
+
+  def next(self):
+    self.__pos += 1
+    return self
+
+  def consume(self):
+    ret = self.get()
+    self.__pos += 1
+    return ret
+
+  def seek(self, k):
+    """Skip elements whose keys are less than 'k'; return the new key."""
+    lo, n = self.__pos, self.__len
+    # Invariant: keys before 'lo' are less than 'k'; the key at 'hi'
+    #  (if any) is not.
+    hi, step = lo, 1
+    while hi < n and self.__key_at(hi) < k:
+      lo = hi + 1
+      hi += step
+      step += step
+    if hi > n:
+      hi = n
+    if self.__key is None:
+      lo = bisect.bisect_left(self.__seq, k, lo, hi)
+    else:
+      while lo < hi:
+        mid = (lo + hi) // 2
+        if self.__key_at(mid) < k:
+          lo = mid + 1
+        else:
+          hi = mid
+    self.__pos = lo
+    return self.get_key()
+
+  def __len__(self):
+    return max(self.__len - self.__pos, 0)
+
+  def snapshot(self):
+    return self.__pos
+
+  def restore(self, state):
+    self.__pos = state
+    self.__key_pos = -1
+    return self
+
+def _xcursor(input, key):
+  """Wrap a sorted PyX input in the appropriate cursor class."""
+
+  if xbase._xis_sequence(input):
+    return _xsequence_cursor(input, key)
+  return _xstream_cursor(input, key)
+
+def _xspill(input, dir):
+  """Write a PyX input to a new temporary file, and return the file.
+
+  The file holds a sequence of pickled lists (one per batch of the
+  input), and is rewound, ready for _xrun.
+  """
+
+  file = tempfile.TemporaryFile(dir = dir)
+  for batch in xbase.xbatches(input):
+    pickle.dump(batch, file, pickle.HIGHEST_PROTOCOL)
+  file.seek(0)
+  return file
+
+def _xrun(file):
+  """Generate the elements written to a file by _xspill, then close it."""
+
+  try:
+    while 1:
+      try:
+        batch = pickle.load(file)
+      except EOFError:
+        return
+      for x in batch:
+        yield x
+  finally:
+    file.close()
 
 #
 # Pipe Algorithm classes
@@ -34,7 +254,9 @@ class xmerge (xbase.xbase):
   """Merges two sorted sequences.
 
   Produces a sorted sequence.  Optionally can take a comparision
-  object.
+  object and/or a key function; if a key function is given, it is
+  called exactly once for each element, and the comparision object
+  is applied to the keys.
 
   Stability: If equivalent elements occur in both input sequences,
   the output sequence contains all equivalent elements from the
@@ -42,85 +264,428 @@ class xmerge (xbase.xbase):
   the second input sequence.
 
   Methods:
-    __init__(self, input0 = None, input1 = None, comp = cmp)
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
     set_input0(self, input0),
     set_input1(self, input1),
     set_inputs(self, input0, input1),
-    set_comp(self, comp) --
+    set_comp(self, comp),
+    set_key(self, key) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
 
   Examples:
     >>> [x for x in xmerge([1, 4], [2, 3, 4])]
     [1, 2, 3, 4, 4]
+    >>> [x for x in xmerge(['a', 'B'], ['A', 'b'], key = str.lower)]
+    ['a', 'A', 'B', 'b']
     >>> a = []
     >>> b = []
     >>> [x for x in xmerge([a], [b])]
     [[], []]
-    >>> result = xunique([a], [b])[0]
+    >>> result = next(xmerge([a], [b]))
     >>> result
     []
     >>> result is a
-    1
+    True
     >>> result is b
-    0
+    False
   """
 
-  def __init__(self, input0 = None, input1 = None, comp = cmp):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
-    self.__comp = comp
+  __slots__ = ('__in0', '__in1', '__input0', '__input1', '__comp', '__key')
 
-  def next(self):
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    self.__in0 = xbase.xsingle_buffer(self.__input0, key)
+    self.__in1 = xbase.xsingle_buffer(self.__input1, key)
+
+  def __next__(self):
+    if self.__in0 is None:
+      self.__start()
     try:
-      x = self.__in0.get()
+      x = self.__in0.get_key()
     except StopIteration:
       return self.__in1.consume()
     try:
-      y = self.__in1.get()
+      y = self.__in1.get_key()
     except StopIteration:
-      self.__in0.next()
-      return x
-    if self.__comp(x, y) > 0:
-      self.__in1.next()
-      return y
+      return self.__in0.consume()
+    if y < x:
+      return self.__in1.consume()
     else:
-      self.__in0.next()
-      return x
+      return self.__in0.consume()
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    if self.__in0 is None:
+      self.__start()
+    in0, in1 = self.__in0, self.__in1
+    ret = []
+    append = ret.append
+    # Keep both keys at hand; only the input that moved is read again.
+    try:
+      x = in0.get_key()
+    except StopIteration:
+      return in1.consume_batch(n)
+    try:
+      y = in1.get_key()
+    except StopIteration:
+      return in0.consume_batch(n)
+    while n:
+      n -= 1
+      if y < x:
+        append(in1.consume())
+        try:
+          y = in1.get_key()
+        except StopIteration:
+          ret.extend(in0.consume_batch(n))
+          break
+      else:
+        append(in0.consume())
+        try:
+          x = in0.get_key()
+        except StopIteration:
+          ret.extend(in1.consume_batch(n))
+          break
+    return ret
 
   def set_input0(self, input0):
-    self.__in0 = xbase.xsingle_buffer(input0)
+    self.__input0 = input0
     return self
 
   def set_input1(self, input1):
-    self.__in1 = xbase.xsingle_buffer(input1)
+    self.__input1 = input1
     return self
 
   def set_inputs(self, input0, input1):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
+    self.__input0, self.__input1 = input0, input1
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xmerge', (self.__input0, self.__input1), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__in0 is None:
+      return None
+    return (self.__in0.snapshot(), self.__in1.snapshot())
+
+  def restore(self, state):
+    if state is not None:
+      self.__start()
+      self.__in0.restore(state[0])
+      self.__in1.restore(state[1])
+    return self
+
+class xmerge_many (xbase.xbase):
+  """Merges any number of sorted sequences.
+
+  Produces a sorted sequence.  Optionally can take a comparision
+  object and/or a key function; if a key function is given, it is
+  called exactly once for each element, and the comparision object
+  is applied to the keys.
+
+  Unlike a chain of xmerge objects, each element costs O(log k)
+  comparisions, where k is the number of input sequences.
+
+  Stability: If equivalent elements occur in more than one input
+  sequence, the output sequence contains all equivalent elements from
+  the first input sequence, followed by all equivalent elements from
+  the second input sequence, and so on.
+
+  Methods:
+    __init__(self, *inputs, comp = cmp, key = None)
+    set_inputs(self, *inputs),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xmerge_many([1, 4], [2, 3, 4], [0, 4])]
+    [0, 1, 2, 3, 4, 4, 4]
+    >>> [x for x in xmerge_many(['b', 'C'], ['A', 'c'], key = str.lower)]
+    ['A', 'b', 'C', 'c']
+  """
+
+  __slots__ = ('__in', '__heap', '__sort_key', '__comp', '__key')
+
+  def __init__(self, *inputs, comp = cmp, key = None):
+    self.__in = inputs
+    self.__comp, self.__key = comp, key
+    self.__heap = None
+
+  def __start(self):
+    self.__sort_key = xbase.xsort_key(self.__comp, self.__key)
+    self.__heap = _xheap_start(self.__in, self.__sort_key)
+    return self.__heap
+
+  def __next__(self):
+    heap = self.__heap
+    if heap is None:
+      heap = self.__start()
+    if not heap:
+      raise StopIteration
+    top = heap[0]
+    ret = top[2]
+    it = top[3]
+    try:
+      x = next(it)
+    except StopIteration:
+      heapq.heappop(heap)
+      return ret
+    key = self.__sort_key
+    if key is None:
+      heapq.heapreplace(heap, [x, top[1], x, it])
+    else:
+      heapq.heapreplace(heap, [key(x), top[1], x, it])
+    return ret
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    heap = self.__heap
+    if heap is None:
+      heap = self.__start()
+    key = self.__sort_key
+    heapreplace = heapq.heapreplace
+    ret = []
+    append = ret.append
+    while heap and n:
+      top = heap[0]
+      append(top[2])
+      n -= 1
+      it = top[3]
+      if len(heap) == 1:
+        # Only one input is left; read the rest of the batch from it
+        #  directly, then load its next element back into the heap.
+        rest = xbase.xbatch(it, n)
+        ret.extend(rest)
+        if len(rest) < n:
+          heap.pop()
+        else:
+          _xheap_advance(heap, key)
+        break
+      try:
+        x = next(it)
+      except StopIteration:
+        heapq.heappop(heap)
+        continue
+      # Reuse the top entry in place; heapreplace sifts it back down.
+      if key is None:
+        top[0] = x
+      else:
+        top[0] = key(x)
+      top[2] = x
+      heapreplace(heap, top)
+    return ret
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xmerge_many', tuple(self.__in), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__heap is None:
+      return None
+    return _xheap_snapshot(self.__heap)
+
+  def restore(self, state):
+    if state is not None:
+      self.__sort_key = xbase.xsort_key(self.__comp, self.__key)
+      self.__heap = _xheap_restore(self.__in, self.__sort_key, state)
+    return self
+
+class xsort (xbase.xbase):
+  """Sorts a sequence, spilling sorted runs to temporary files.
+
+  Produces a sorted sequence, suitable as an input of the other
+  algorithms in this file.  Optionally can take a comparision object
+  and/or a key function, as xmerge does.
+
+  The input is read the first time an element is requested.  While
+  reading, the elements are collected in memory; each time their
+  size reaches 'max_memory' bytes, they are sorted and written as a
+  run to a temporary file.  Runs are merged with xmerge_many,
+  XSORT_FANIN at a time: while reading, whenever that many runs of
+  the same size have been written, and once more as the output is
+  read.  If the whole input fits in memory, no file is written.
+
+  The size of an element is measured with sys.getsizeof, so only the
+  outer object of a container is counted; 'max_memory' should leave
+  room for that.  Runs are stored as pickled batches of elements, so
+  elements that are spilled must be picklable.  Temporary files are
+  created in the directory given to set_tempdir, or in the default
+  temporary directory, and are removed when their run is exhausted
+  or garbage-collected.
+
+  If a key function is given, it is called once for each element
+  when its run is sorted, and again when the runs are merged.
+
+  Stability: Equivalent elements are output in the order in which
+  they occur in the input sequence.
+
+  Methods:
+    __init__(self, input = None, comp = cmp, key = None,
+             max_memory = XSORT_MEMORY)
+    set_input(self, input),
+    set_comp(self, comp),
+    set_key(self, key),
+    set_max_memory(self, max_memory),
+    set_tempdir(self, tempdir) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    next_batch(self, n) --
+      Returns the next batch of output; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xsort([3, 1, 2])]
+    [1, 2, 3]
+    >>> [x for x in xsort(['b', 'C', 'a'], key = str.lower, max_memory = 100)]
+    ['a', 'b', 'C']
+  """
+
+  __slots__ = ('__input', '__max_memory', '__tempdir', '__out', '__comp',
+               '__key')
+
+  def __init__(self, input = None, comp = cmp, key = None, max_memory = XSORT_MEMORY):
+    self.__input = input
+    self.__comp, self.__key = comp, key
+    self.__max_memory = max_memory
+    self.__tempdir = None
+    self.__out = None
+
+  def __merge(self, runs):
+    return xmerge_many(*[_xrun(x) for x in runs], comp = self.__comp, key = self.__key)
+
+  def __spill(self, runs, input, level):
+    runs.append((level, _xspill(input, self.__tempdir)))
+    # Once the last XSORT_FANIN runs are of one level, merge them into
+    #  a run of the next level.  Merging neighbours keeps equivalent
+    #  elements in order, and keeps the number of runs (and of open
+    #  files) logarithmic in the size of the input.
+    while len(runs) >= XSORT_FANIN and runs[-XSORT_FANIN][0] == runs[-1][0]:
+      level = runs[-1][0]
+      group = [x for l, x in runs[-XSORT_FANIN:]]
+      del runs[-XSORT_FANIN:]
+      runs.append((level + 1, _xspill(self.__merge(group), self.__tempdir)))
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    runs, items, size = [], [], 0
+    for batch in xbase.xbatches(self.__input):
+      items.extend(batch)
+      size += sum(map(sys.getsizeof, batch))
+      if size >= self.__max_memory:
+        items.sort(key = key)
+        self.__spill(runs, items, 0)
+        items, size = [], 0
+    items.sort(key = key)
+    if not runs:
+      self.__out = iter(items)
+      return
+    if items:
+      self.__spill(runs, items, 0)
+    del items
+    runs = [x for l, x in runs]
+    while len(runs) > XSORT_FANIN:
+      runs = [_xspill(self.__merge(runs[i:i + XSORT_FANIN]), self.__tempdir)
+              for i in range(0, len(runs), XSORT_FANIN)]
+    self.__out = self.__merge(runs)
+
+  def __next__(self):
+    if self.__out is None:
+      self.__start()
+    return next(self.__out)
+
+  def next_batch(self, n = xbase.XBATCH_SIZE):
+    if self.__out is None:
+      self.__start()
+    return xbase.xbatch(self.__out, n)
+
+  def set_input(self, input):
+    self.__input = input
     return self
 
   def set_comp(self, comp):
     self.__comp = comp
     return self
 
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xsort', (self.__input,),
+            {'comp': self.__comp, 'key': self.__key, 'max_memory': self.__max_memory,
+             'tempdir': self.__tempdir})
+
+  def set_max_memory(self, max_memory):
+    self.__max_memory = max_memory
+    return self
+
+  def set_tempdir(self, tempdir):
+    self.__tempdir = tempdir
+    return self
+
 class xset_union (xbase.xbase):
   """Unions two sorted, unique sequences ("or").
 
   Produces a sorted, unique sequence.  Optionally can take a
-  comparision object.
+  comparision object and/or a key function, as xmerge does.
 
   Stability: If equivalent elements occur in both input sequences,
   the output sequence contains the element from the first input
   sequence.
 
   Methods:
-    __init__(self, input0 = None, input1 = None, comp = cmp)
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
     set_input0(self, input0),
     set_input1(self, input1),
     set_inputs(self, input0, input1),
-    set_comp(self, comp) --
+    set_comp(self, comp),
+    set_key(self, key) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
 
   Examples:
     >>> [x for x in xset_union([1, 4], [2, 3, 4])]
@@ -129,74 +694,109 @@ class xset_union (xbase.xbase):
     >>> b = []
     >>> [x for x in xset_union([a], [b])]
     [[]]
-    >>> result = xset_union([a], [b])[0]
+    >>> result = next(xset_union([a], [b]))
     >>> result
     []
     >>> result is a
-    1
+    True
     >>> result is b
-    0
+    False
   """
 
-  def __init__(self, input0 = None, input1 = None, comp = cmp):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
-    self.__comp = comp
+  __slots__ = ('__in0', '__input0', '__input1', '__comp', '__key', '__in1')
 
-  def next(self):
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    self.__in0 = xbase.xsingle_buffer(self.__input0, key)
+    self.__in1 = xbase.xsingle_buffer(self.__input1, key)
+
+  def __next__(self):
+    if self.__in0 is None:
+      self.__start()
     try:
-      x = self.__in0.get()
+      x = self.__in0.get_key()
     except StopIteration:
       return self.__in1.consume()
     try:
-      y = self.__in1.get()
+      y = self.__in1.get_key()
     except StopIteration:
-      self.__in0.next()
-      return x
-    c = self.__comp(x, y)
-    if c > 0:
-      self.__in1.next()
-      return y
-    elif c < 0:
-      self.__in0.next()
-      return x
+      return self.__in0.consume()
+    if y < x:
+      return self.__in1.consume()
+    elif x < y:
+      return self.__in0.consume()
     else:
-      self.__in0.next()
       self.__in1.next()
-      return x
+      return self.__in0.consume()
 
   def set_input0(self, input0):
-    self.__in0 = xbase.xsingle_buffer(input0)
+    self.__input0 = input0
     return self
 
   def set_input1(self, input1):
-    self.__in1 = xbase.xsingle_buffer(input1)
+    self.__input1 = input1
     return self
 
   def set_inputs(self, input0, input1):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
+    self.__input0, self.__input1 = input0, input1
     return self
 
   def set_comp(self, comp):
     self.__comp = comp
     return self
 
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_union', (self.__input0, self.__input1), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__in0 is None:
+      return None
+    return (self.__in0.snapshot(), self.__in1.snapshot())
+
+  def restore(self, state):
+    if state is not None:
+      self.__start()
+      self.__in0.restore(state[0])
+      self.__in1.restore(state[1])
+    return self
+
 class xset_intersection (xbase.xbase):
   """Intersects two sorted, unique sequences ("and").
 
   Produces a sorted, unique sequence.  Optionally can take a
-  comparision object.
+  comparision object and/or a key function, as xmerge does.
+
+  If an input is a sequence (supports len() and indexing), it is
+  advanced by galloping search instead of one element at a time, so
+  intersecting m elements with n elements costs O(m log(n/m))
+  comparisions.  Other inputs are read one element at a time.
 
   Stability: All elements in the output sequence are copied
   from the first input sequence.
 
   Methods:
-    __init__(self, input0 = None, input1 = None, comp = cmp)
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
     set_input0(self, input0),
     set_input1(self, input1),
     set_inputs(self, input0, input1),
-    set_comp(self, comp) --
+    set_comp(self, comp),
+    set_key(self, key) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
 
   Examples:
     >>> [x for x in xset_intersection([1, 4], [2, 3, 4])]
@@ -205,64 +805,102 @@ class xset_intersection (xbase.xbase):
     >>> b = []
     >>> [x for x in xset_intersection([a], [b])]
     [[]]
-    >>> result = xset_intersection([a], [b])[0]
+    >>> result = next(xset_intersection([a], [b]))
     >>> result
     []
     >>> result is a
-    1
+    True
     >>> result is b
-    0
+    False
   """
 
-  def __init__(self, input0 = None, input1 = None, comp = cmp):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
-    self.__comp = comp
+  __slots__ = ('__in0', '__input0', '__input1', '__comp', '__key', '__in1')
 
-  def next(self):
-    x, y = self.__in0.get(), self.__in1.get()
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    self.__in0 = _xcursor(self.__input0, key)
+    self.__in1 = _xcursor(self.__input1, key)
+
+  def __next__(self):
+    if self.__in0 is None:
+      self.__start()
+    in0, in1 = self.__in0, self.__in1
+    x = in0.get_key()
     while 1:
-      c = self.__comp(x, y)
-      if c > 0:
-        self.__in1.next()
-        y = self.__in1.get()
-      elif c < 0:
-        self.__in0.next()
-        x = self.__in0.get()
-      else:
-        self.__in0.next()
-        self.__in1.next()
-        return x
+      y = in1.seek(x)
+      if y == x:
+        break
+      x = in0.seek(y)
+      if x == y:
+        break
+    ret = in0.get()
+    in0.next()
+    in1.next()
+    return ret
 
   def set_input0(self, input0):
-    self.__in0 = xbase.xsingle_buffer(input0)
+    self.__input0 = input0
     return self
 
   def set_input1(self, input1):
-    self.__in1 = xbase.xsingle_buffer(input1)
+    self.__input1 = input1
     return self
 
   def set_inputs(self, input0, input1):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
+    self.__input0, self.__input1 = input0, input1
     return self
 
   def set_comp(self, comp):
     self.__comp = comp
     return self
 
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_intersection', (self.__input0, self.__input1), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__in0 is None:
+      return None
+    return (self.__in0.snapshot(), self.__in1.snapshot())
+
+  def restore(self, state):
+    if state is not None:
+      self.__start()
+      self.__in0.restore(state[0])
+      self.__in1.restore(state[1])
+    return self
+
 class xset_difference (xbase.xbase):
   """Calculates the difference of two sorted, unique sequences ("and not").
 
   Produces a sorted, unique sequence.  Optionally can take a
-  comparision object.
+  comparision object and/or a key function, as xmerge does.
+
+  If the second input is a sequence (supports len() and indexing), it
+  is advanced by galloping search instead of one element at a time.
 
   Methods:
-    __init__(self, input0 = None, input1 = None, comp = cmp)
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
     set_input0(self, input0),
     set_input1(self, input1),
     set_inputs(self, input0, input1),
-    set_comp(self, comp) --
+    set_comp(self, comp),
+    set_key(self, key) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
 
   Examples:
     >>> [x for x in xset_difference([1, 4], [2, 3, 4])]
@@ -271,100 +909,657 @@ class xset_difference (xbase.xbase):
     [2, 3]
   """
 
-  def __init__(self, input0 = None, input1 = None, comp = cmp):
-    self.__in0, self.__in1 = iter(input0), xbase.xsingle_buffer(input1)
-    self.__comp = comp
+  __slots__ = ('__in0', '__input0', '__input1', '__comp', '__key', '__in1')
 
-  def next(self):
-    x = self.__in0.next()
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    self.__in0 = _xstream_cursor(self.__input0, key)
+    self.__in1 = _xcursor(self.__input1, key)
+
+  def __next__(self):
+    if self.__in0 is None:
+      self.__start()
+    in0, in1 = self.__in0, self.__in1
     while 1:
+      x = in0.get_key()
       try:
-        y = self.__in1.get()
+        y = in1.seek(x)
       except StopIteration:
-        return x
-      c = self.__comp(x, y)
-      if c > 0:
-        self.__in1.next()
-      elif c < 0:
-        return x
+        return in0.consume()
+      if y == x:
+        in0.next()
+        in1.next()
       else:
-        x = self.__in0.next()
-        self.__in1.next()
+        return in0.consume()
 
   def set_input0(self, input0):
-    self.__in0 = iter(input0)
+    self.__input0 = input0
     return self
 
   def set_input1(self, input1):
-    self.__in1 = xbase.xsingle_buffer(input1)
+    self.__input1 = input1
     return self
 
   def set_inputs(self, input0, input1):
-    self.__in0, self.__in1 = iter(input0), xbase.xsingle_buffer(input1)
+    self.__input0, self.__input1 = input0, input1
     return self
 
   def set_comp(self, comp):
     self.__comp = comp
     return self
 
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_difference', (self.__input0, self.__input1), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__in0 is None:
+      return None
+    return (self.__in0.snapshot(), self.__in1.snapshot())
+
+  def restore(self, state):
+    if state is not None:
+      self.__start()
+      self.__in0.restore(state[0])
+      self.__in1.restore(state[1])
+    return self
+
 class xset_symmetric_difference (xbase.xbase):
   """Calculates the symm. diff. of two sorted, unique sequences ("xor").
 
   Produces a sorted, unique sequence.  Optionally can take a
-  comparision object.
+  comparision object and/or a key function, as xmerge does.
 
   Methods:
-    __init__(self, input0 = None, input1 = None, comp = cmp)
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None)
     set_input0(self, input0),
     set_input1(self, input1),
     set_inputs(self, input0, input1),
-    set_comp(self, comp) --
+    set_comp(self, comp),
+    set_key(self, key) --
       Must be called before iteration begins.
       Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
 
   Example:
     >>> [x for x in xset_symmetric_difference([1, 4], [2, 3, 4])]
     [1, 2, 3]
   """
 
-  def __init__(self, input0 = None, input1 = None, comp = cmp):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
-    self.__comp = comp
+  __slots__ = ('__in0', '__input0', '__input1', '__comp', '__key', '__in1')
 
-  def next(self):
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    self.__in0 = xbase.xsingle_buffer(self.__input0, key)
+    self.__in1 = xbase.xsingle_buffer(self.__input1, key)
+
+  def __next__(self):
+    if self.__in0 is None:
+      self.__start()
     while 1:
       try:
-        x = self.__in0.get()
+        x = self.__in0.get_key()
       except StopIteration:
         return self.__in1.consume()
       try:
-        y = self.__in1.get()
+        y = self.__in1.get_key()
       except StopIteration:
-        self.__in0.next()
-        return x
-      c = self.__comp(x, y)
-      if c > 0:
-        self.__in1.next()
-        return y
-      elif c < 0:
-        self.__in0.next()
-        return x
+        return self.__in0.consume()
+      if y < x:
+        return self.__in1.consume()
+      elif x < y:
+        return self.__in0.consume()
       else:
         self.__in0.next()
         self.__in1.next()
 
   def set_input0(self, input0):
-    self.__in0 = xbase.xsingle_buffer(input0)
+    self.__input0 = input0
+    return self
+
+  def set_input1(self, input1):
+    self.__input1 = input1
+    return self
+
+  def set_inputs(self, input0, input1):
+    self.__input0, self.__input1 = input0, input1
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_symmetric_difference', (self.__input0, self.__input1), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__in0 is None:
+      return None
+    return (self.__in0.snapshot(), self.__in1.snapshot())
+
+  def restore(self, state):
+    if state is not None:
+      self.__start()
+      self.__in0.restore(state[0])
+      self.__in1.restore(state[1])
+    return self
+
+class xset_union_many (xbase.xbase):
+  """Unions any number of sorted, unique sequences ("or").
+
+  Produces a sorted, unique sequence.  Optionally can take a
+  comparision object and/or a key function, as xmerge_many does.
+  The inputs are merged through a heap, so each element costs
+  O(log k) comparisions, where k is the number of input sequences.
+
+  Stability: If equivalent elements occur in more than one input
+  sequence, the output sequence contains the element from the first
+  of those input sequences.
+
+  Methods:
+    __init__(self, *inputs, comp = cmp, key = None)
+    set_inputs(self, *inputs),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xset_union_many([1, 4], [2, 3, 4], [0, 4])]
+    [0, 1, 2, 3, 4]
+  """
+
+  __slots__ = ('__in', '__heap', '__comp', '__key', '__sort_key')
+
+  def __init__(self, *inputs, comp = cmp, key = None):
+    self.__in = inputs
+    self.__comp, self.__key = comp, key
+    self.__heap = None
+
+  def __next__(self):
+    heap = self.__heap
+    if heap is None:
+      self.__sort_key = xbase.xsort_key(self.__comp, self.__key)
+      heap = self.__heap = _xheap_start(self.__in, self.__sort_key)
+    if not heap:
+      raise StopIteration
+    k, ret = heap[0][0], heap[0][2]
+    _xheap_advance(heap, self.__sort_key)
+    while heap and heap[0][0] == k:
+      _xheap_advance(heap, self.__sort_key)
+    return ret
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_union_many', tuple(self.__in), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__heap is None:
+      return None
+    return _xheap_snapshot(self.__heap)
+
+  def restore(self, state):
+    if state is not None:
+      self.__sort_key = xbase.xsort_key(self.__comp, self.__key)
+      self.__heap = _xheap_restore(self.__in, self.__sort_key, state)
+    return self
+
+class xset_intersection_many (xbase.xbase):
+  """Intersects any number of sorted, unique sequences ("and").
+
+  Produces a sorted, unique sequence.  Optionally can take a
+  comparision object and/or a key function, as xmerge_many does.
+
+  The shortest input sequence (if the lengths are known) leads; every
+  other input is then advanced directly to the leading candidate.
+  Inputs that are sequences (support len() and indexing) are advanced
+  by galloping search, so a small input can be intersected with a
+  large one in O(m log(n/m)) comparisions.
+
+  Stability: All elements in the output sequence are copied
+  from the first input sequence.
+
+  Methods:
+    __init__(self, *inputs, comp = cmp, key = None)
+    set_inputs(self, *inputs),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xset_intersection_many([1, 4], [2, 3, 4], [0, 4])]
+    [4]
+  """
+
+  __slots__ = ('__in', '__cursors', '__comp', '__key', '__first')
+
+  def __init__(self, *inputs, comp = cmp, key = None):
+    self.__in = inputs
+    self.__comp, self.__key = comp, key
+    self.__cursors = None
+
+  def __start(self):
+    key = xbase.xsort_key(self.__comp, self.__key)
+    cursors = [_xcursor(x, key) for x in self.__in]
+    if cursors:
+      self.__first = cursors[0]
+    # Shortest known-length input first; streams keep their order.
+    sized = [(len(c), i, c) for i, c in enumerate(cursors)
+             if isinstance(c, _xsequence_cursor)]
+    sized.sort()
+    self.__cursors = [c for n, i, c in sized] + \
+        [c for c in cursors if not isinstance(c, _xsequence_cursor)]
+
+  def __next__(self):
+    if self.__cursors is None:
+      self.__start()
+    cursors = self.__cursors
+    n = len(cursors)
+    if n == 0:
+      raise StopIteration
+    k = cursors[0].get_key()
+    # Leapfrog: go around the inputs, seeking each to the candidate,
+    #  until all n of them agree on it.
+    i, matched = 1 % n, 1
+    while matched < n:
+      c = cursors[i].seek(k)
+      if c == k:
+        matched += 1
+      else:
+        k, matched = c, 1
+      i += 1
+      if i == n:
+        i = 0
+    ret = self.__first.get()
+    for c in cursors:
+      c.next()
+    return ret
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_intersection_many', tuple(self.__in), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__cursors is None:
+      return None
+    return [c.snapshot() for c in self.__cursors]
+
+  def restore(self, state):
+    if state is not None:
+      self.__start()
+      for c, pos in zip(self.__cursors, state):
+        c.restore(pos)
+    return self
+
+class xset_difference_many (xbase.xbase):
+  """Differences any number of sorted, unique sequences ("and not").
+
+  Produces a sorted, unique sequence: the elements of the first
+  input sequence that are in none of the other input sequences.
+  Optionally can take a comparision object and/or a key function,
+  as xmerge_many does.
+
+  Inputs other than the first that are sequences (support len() and
+  indexing) are advanced by galloping search.
+
+  Stability: All elements in the output sequence are copied
+  from the first input sequence.
+
+  Methods:
+    __init__(self, *inputs, comp = cmp, key = None)
+    set_inputs(self, *inputs),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xset_difference_many([1, 2, 3, 4], [2], [0, 4])]
+    [1, 3]
+  """
+
+  __slots__ = ('__in', '__in0', '__comp', '__key', '__others')
+
+  def __init__(self, *inputs, comp = cmp, key = None):
+    self.__in = inputs
+    self.__comp, self.__key = comp, key
+    self.__in0 = None
+
+  def __next__(self):
+    if self.__in0 is None:
+      if not self.__in:
+        raise StopIteration
+      key = xbase.xsort_key(self.__comp, self.__key)
+      self.__in0 = _xstream_cursor(self.__in[0], key)
+      self.__others = [_xcursor(x, key) for x in self.__in[1:]]
+    in0 = self.__in0
+    while 1:
+      k = in0.get_key()
+      ret = in0.consume()
+      found, done = 0, 0
+      for c in self.__others:
+        try:
+          if c.seek(k) == k:
+            found = 1
+            break
+        except StopIteration:
+          done = 1
+      if done:
+        self.__others = [c for c in self.__others if c]
+      if not found:
+        return ret
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_difference_many', tuple(self.__in), {'comp': self.__comp, 'key': self.__key})
+
+class xset_symmetric_difference_many (xbase.xbase):
+  """Calculates the symm. diff. of any number of sorted, unique sequences.
+
+  Produces a sorted, unique sequence of the elements that occur in
+  an odd number of the input sequences ("xor").  Optionally can take
+  a comparision object and/or a key function, as xmerge_many does.
+  The inputs are merged through a heap, as in xset_union_many.
+
+  Stability: Each element in the output sequence is copied from the
+  first input sequence that contains it.
+
+  Methods:
+    __init__(self, *inputs, comp = cmp, key = None)
+    set_inputs(self, *inputs),
+    set_comp(self, comp),
+    set_key(self, key) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+    snapshot(self),
+    restore(self, state) --
+      Checkpointing; see xbase.xbase.
+
+  Examples:
+    >>> [x for x in xset_symmetric_difference_many([1, 4], [2, 3, 4], [0, 4])]
+    [0, 1, 2, 3, 4]
+  """
+
+  __slots__ = ('__in', '__heap', '__comp', '__key', '__sort_key')
+
+  def __init__(self, *inputs, comp = cmp, key = None):
+    self.__in = inputs
+    self.__comp, self.__key = comp, key
+    self.__heap = None
+
+  def __next__(self):
+    heap = self.__heap
+    if heap is None:
+      self.__sort_key = xbase.xsort_key(self.__comp, self.__key)
+      heap = self.__heap = _xheap_start(self.__in, self.__sort_key)
+    while 1:
+      if not heap:
+        raise StopIteration
+      k, ret = heap[0][0], heap[0][2]
+      _xheap_advance(heap, self.__sort_key)
+      count = 1
+      while heap and heap[0][0] == k:
+        _xheap_advance(heap, self.__sort_key)
+        count += 1
+      if count & 1:
+        return ret
+
+  def set_inputs(self, *inputs):
+    self.__in = inputs
+    return self
+
+  def set_comp(self, comp):
+    self.__comp = comp
+    return self
+
+  def set_key(self, key):
+    self.__key = key
+    return self
+
+  def describe(self):
+    return ('xset_symmetric_difference_many', tuple(self.__in), {'comp': self.__comp, 'key': self.__key})
+
+  def snapshot(self):
+    if self.__heap is None:
+      return None
+    return _xheap_snapshot(self.__heap)
+
+  def restore(self, state):
+    if state is not None:
+      self.__sort_key = xbase.xsort_key(self.__comp, self.__key)
+      self.__heap = _xheap_restore(self.__in, self.__sort_key, state)
+    return self
+
+class xjoin (xbase.xbase):
+  """Joins two sorted sequences of records on their keys.
+
+  Takes two sequences of records, each sorted by key, and pairs the
+  records of input0 with the records of input1 that have equivalent
+  keys.  Optionally can take a comparision object and/or a key
+  function, as xmerge does; set_keys gives each input its own key
+  function, for joining records of different shapes.  Each key
+  function is called exactly once for each record.
+
+  The join mode is one of:
+    'inner' -- Outputs a pair (record0, record1) for each pair of
+      records with equivalent keys.
+    'left' -- As 'inner'; in addition, outputs (record0, fill) for
+      each record of input0 that has no match in input1.
+    'full' -- As 'left'; in addition, outputs (fill, record1) for
+      each record of input1 that has no match in input0.
+    'anti' -- Outputs record0 (not a pair) for each record of input0
+      that has no match in input1.
+  'fill' defaults to None.
+
+  Both inputs are read once, in step.  Only the records of input1
+  with the key currently being joined are buffered, so many-to-many
+  joins need memory for the largest such group, not for a whole
+  input.  If 'max_group' is not None, a group larger than that raises
+  ValueError instead.  An 'anti' join buffers no groups.
+
+  Stability: The output is in key order.  The pairs for one key are
+  in the order of their input0 records, and for one input0 record,
+  in the order of their input1 records.  Unmatched records appear
+  where their key falls in that order.
+
+  Methods:
+    __init__(self, input0 = None, input1 = None, comp = cmp, key = None,
+             mode = 'inner')
+    set_input0(self, input0),
+    set_input1(self, input1),
+    set_inputs(self, input0, input1),
+    set_comp(self, comp),
+    set_key(self, key),
+    set_keys(self, key0, key1),
+    set_mode(self, mode),
+    set_fill(self, fill),
+    set_max_group(self, max_group) --
+      Must be called before iteration begins.
+      Returns self.
+    describe(self) --
+      Returns (name, inputs, settings); see xbase.xbase.
+
+  Examples:
+    >>> import operator
+    >>> people = [(1, 'ann'), (2, 'bob'), (4, 'dee')]
+    >>> orders = [(1, 'tea'), (1, 'jam'), (3, 'egg')]
+    >>> [x[1] + '/' + y[1] for x, y in xjoin(people, orders, key = operator.itemgetter(0))]
+    ['ann/tea', 'ann/jam']
+    >>> [x for x in xjoin([1, 2, 4], [1, 1, 3], mode = 'full')]
+    [(1, 1), (1, 1), (2, None), (None, 3), (4, None)]
+    >>> [x for x in xjoin([1, 2, 4], [1, 1, 3], mode = 'anti')]
+    [2, 4]
+  """
+
+  __slots__ = ('__comp', '__key0', '__key1', '__mode', '__fill',
+               '__max_group', '__out', '__input0', '__input1')
+
+  def __init__(self, input0 = None, input1 = None, comp = cmp, key = None,
+               mode = 'inner'):
+    self.__input0, self.__input1 = input0, input1
+    self.__comp = comp
+    self.__key0 = self.__key1 = key
+    self.__mode = mode
+    self.__fill = None
+    self.__max_group = None
+    self.__out = None
+
+  def __join(self):
+    mode, fill = self.__mode, self.__fill
+    if mode not in ('inner', 'left', 'full', 'anti'):
+      raise ValueError('unknown join mode %r' % (mode,))
+    left, full, anti = mode in ('left', 'full'), mode == 'full', mode == 'anti'
+    in0 = xbase.xsingle_buffer(self.__input0, xbase.xsort_key(self.__comp, self.__key0))
+    in1 = xbase.xsingle_buffer(self.__input1, xbase.xsort_key(self.__comp, self.__key1))
+    while in0:
+      x = in0.get_key()
+      while in1 and in1.get_key() < x:
+        y = in1.consume()
+        if full:
+          yield (fill, y)
+      if not in1 or x < in1.get_key():
+        y = in0.consume()
+        if anti:
+          yield y
+        elif left:
+          yield (y, fill)
+        continue
+      if anti:
+        # Every input0 record with key x is matched; nothing is paired,
+        #  so skip both groups without buffering them.
+        while in1 and not x < in1.get_key():
+          in1.next()
+        while in0 and not x < in0.get_key():
+          in0.next()
+        continue
+      # Buffer the group of input1 records with key x, then pair it
+      #  with each input0 record with key x.
+      group = []
+      while in1 and not x < in1.get_key():
+        group.append(in1.consume())
+        if self.__max_group is not None and len(group) > self.__max_group:
+          raise ValueError('more than %d records of input1 share a key'
+                           % self.__max_group)
+      while in0 and not x < in0.get_key():
+        y = in0.consume()
+        for z in group:
+          yield (y, z)
+    if full:
+      while in1:
+        yield (fill, in1.consume())
+
+  def __next__(self):
+    if self.__out is None:
+      self.__out = self.__join()
+    return next(self.__out)
+
+  def set_input0(self, input0):
+    self.__input0 = input0
     return self
 
   def set_input1(self, input1):
-    self.__in1 = xbase.xsingle_buffer(input1)
+    self.__input1 = input1
     return self
 
   def set_inputs(self, input0, input1):
-    self.__in0, self.__in1 = xbase.xsingle_buffer(input0), xbase.xsingle_buffer(input1)
+    self.__input0, self.__input1 = input0, input1
     return self
 
   def set_comp(self, comp):
     self.__comp = comp
     return self
+
+  def set_key(self, key):
+    self.__key0 = self.__key1 = key
+    return self
+
+  def set_keys(self, key0, key1):
+    self.__key0, self.__key1 = key0, key1
+    return self
+
+  def set_mode(self, mode):
+    self.__mode = mode
+    return self
+
+  def set_fill(self, fill):
+    self.__fill = fill
+    return self
+
+  def set_max_group(self, max_group):
+    self.__max_group = max_group
+    return self
+
+  def describe(self):
+    return ('xjoin', (self.__input0, self.__input1),
+            {'comp': self.__comp, 'keys': (self.__key0, self.__key1), 'mode': self.__mode,
+             'fill': self.__fill, 'max_group': self.__max_group})
+
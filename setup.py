@@ -4,7 +4,10 @@
 # See the file 'COPYRIGHT' for copyright and disclaimer information
 
 import os.path
-from distutils.core import setup
+try:
+  from setuptools import setup
+except ImportError:
+  from distutils.core import setup
 
 setup(name = 'TBA',
       version = '1.0',
@@ -18,9 +21,17 @@ setup(name = 'TBA',
       py_modules = [
                     'TBA.__init__',
                     'TBA.algorithms.__init__',
+                    'TBA.algorithms.xasync',
                     'TBA.algorithms.xbase',
                     'TBA.algorithms.xbasic',
+                    'TBA.algorithms.xcolumnar',
                     'TBA.algorithms.xcompatibility',
+                    'TBA.algorithms.xfast',
+                    'TBA.algorithms.xmmap',
+                    'TBA.algorithms.xnumpy',
+                    'TBA.algorithms.xparallel',
+                    'TBA.algorithms.xpipeline',
+                    'TBA.algorithms.xprofile',
                     'TBA.algorithms.xsorted',
                 ],
       data_files = [
@@ -29,9 +40,22 @@ setup(name = 'TBA',
                       os.path.join('TBA', 'README'),
                      ]),
                     (os.path.join('TBA', 'algorithms', 'test'),
-                     [os.path.join('TBA', 'algorithms', 'test', 'test_xbasic.py'),
+                     [os.path.join('TBA', 'algorithms', 'test', 'test_xasync.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xbasic.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xcolumnar.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xfast.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xmmap.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xnumpy.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xparallel.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xpipeline.py'),
+                      os.path.join('TBA', 'algorithms', 'test', 'test_xprofile.py'),
                       os.path.join('TBA', 'algorithms', 'test', 'test_xsorted.py'),
                      ]),
+                    (os.path.join('TBA', 'algorithms', 'bench'),
+                     [os.path.join('TBA', 'algorithms', 'bench', 'bench_xbasic.py'),
+                      os.path.join('TBA', 'algorithms', 'bench', 'bench_xnumpy.py'),
+                      os.path.join('TBA', 'algorithms', 'bench', 'bench_xsorted.py'),
+                     ]),
                     (os.path.join('TBA', 'algorithms', 'examples'),
                      [os.path.join('TBA', 'algorithms', 'examples', 'xsoundex.py'),
                      ]),